@@ -5,6 +5,12 @@ from mixer.backend.django import mixer as _mixer
 from posts.models import Group, Post
 
 
+@pytest.fixture(autouse=True)
+def temp_media_root(settings, tmp_path):
+    """Файлы, которые создают тесты, не попадают в MEDIA_ROOT проекта."""
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
 @pytest.fixture()
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
@@ -0,0 +1,71 @@
+from urllib.parse import urlsplit
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from mixer.backend.django import mixer as _mixer
+
+from core.query_budget import get_query_budget
+from posts.models import Comment, Follow, Group, Post
+
+
+def format_queries(queries):
+    return '\n'.join(
+        f'{number}. {query["sql"]}'
+        for number, query in enumerate(queries, 1)
+    )
+
+
+@pytest.fixture
+def count_queries():
+    """Открывает страницу с пустым кэшем и возвращает выполненный SQL."""
+    def count(client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == 200, (
+            f'Страница `{url}` вернула код {response.status_code}'
+        )
+        return context.captured_queries
+    return count
+
+
+@pytest.fixture
+def assert_query_budget(count_queries):
+    """Проверяет, что страница укладывается в бюджет своей view."""
+    def check(client, url):
+        budget = get_query_budget(url)
+        view_name = resolve(urlsplit(url).path).view_name
+        assert budget is not None, (
+            f'Для `{view_name}` не объявлен бюджет запросов, '
+            'добавьте декоратор `query_budget`'
+        )
+        queries = count_queries(client, url)
+        assert len(queries) <= budget, (
+            f'`{view_name}` выполнила {len(queries)} запросов '
+            f'при бюджете {budget}:\n{format_queries(queries)}'
+        )
+        return queries
+    return check
+
+
+@pytest.fixture
+def seed_feed(user, another_user):
+    """Наполняет ленты: посты с группой, подписка и комментарии."""
+    group = Group.objects.create(
+        title='Группа для бюджета', slug='budget', description='Описание'
+    )
+    Follow.objects.create(user=user, author=another_user)
+    first_post = Post.objects.create(
+        text='Пост для бюджета', author=another_user, group=group
+    )
+
+    def seed(size):
+        _mixer.cycle(size).blend(
+            Post, author=another_user, group=group, image=''
+        )
+        _mixer.cycle(size).blend(Comment, post=first_post, author=user)
+        return first_post
+    return seed
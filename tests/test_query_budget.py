@@ -0,0 +1,46 @@
+import pytest
+from django.urls import reverse
+
+pytestmark = [pytest.mark.django_db]
+
+SMALL_DATASET = 1
+LARGE_DATASET = 25
+
+
+def budget_urls(post):
+    return [
+        reverse('posts:index'),
+        reverse('posts:group_list', args=(post.group.slug,)),
+        reverse('posts:profile', args=(post.author.username,)),
+        reverse('posts:post_detail', args=(post.id,)),
+        reverse('posts:post_comments', args=(post.id,)),
+        reverse('posts:follow_index'),
+        reverse('posts:post_create'),
+        reverse('posts:search') + (
+            f'?q=Пост&group={post.group.slug}'
+            f'&author={post.author.username}'
+        ),
+    ]
+
+
+class TestQueryBudget:
+
+    def test_views_within_budget(self, user_client, seed_feed,
+                                 assert_query_budget):
+        post = seed_feed(LARGE_DATASET)
+        for url in budget_urls(post):
+            assert_query_budget(user_client, url)
+
+    def test_queries_do_not_grow_with_dataset(self, user_client, seed_feed,
+                                              count_queries):
+        post = seed_feed(SMALL_DATASET)
+        small = {
+            url: count_queries(user_client, url) for url in budget_urls(post)
+        }
+        seed_feed(LARGE_DATASET)
+        for url in budget_urls(post):
+            large = count_queries(user_client, url)
+            assert len(large) == len(small[url]), (
+                f'Число запросов страницы `{url}` растёт вместе с данными: '
+                f'{len(small[url])} -> {len(large)}'
+            )
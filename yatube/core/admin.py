@@ -0,0 +1,144 @@
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from . import profiling
+from .models import QueryFingerprint, RequestProfile, SlowQuery
+
+
+class QueryFingerprintAdmin(admin.ModelAdmin):
+    list_display = (
+        'view',
+        'short_sql',
+        'count',
+        'total_ms',
+        'average_ms',
+        'max_ms',
+        'last_seen',
+    )
+    list_filter = ('view',)
+    search_fields = ('sql', 'view')
+    ordering = ('-total_time',)
+    readonly_fields = (
+        'view', 'fingerprint', 'sql', 'count', 'total_time', 'max_time',
+        'first_seen', 'last_seen',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def short_sql(self, entry):
+        return entry.sql[:120]
+    short_sql.short_description = 'SQL'
+
+    def total_ms(self, entry):
+        return f'{entry.total_time * 1000:.1f}'
+    total_ms.short_description = 'Всего, мс'
+    total_ms.admin_order_field = 'total_time'
+
+    def average_ms(self, entry):
+        return f'{entry.average_time * 1000:.2f}'
+    average_ms.short_description = 'Среднее, мс'
+
+    def max_ms(self, entry):
+        return f'{entry.max_time * 1000:.1f}'
+    max_ms.short_description = 'Максимум, мс'
+    max_ms.admin_order_field = 'max_time'
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('created', 'view', 'duration_ms', 'short_sql')
+    list_filter = ('view',)
+    search_fields = ('sql', 'view', 'fingerprint')
+    readonly_fields = (
+        'view', 'fingerprint', 'sql', 'params', 'duration', 'plan', 'stack',
+        'created',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def short_sql(self, entry):
+        return entry.sql[:120]
+    short_sql.short_description = 'SQL'
+
+    def duration_ms(self, entry):
+        return f'{entry.duration * 1000:.0f}'
+    duration_ms.short_description = 'Время, мс'
+    duration_ms.admin_order_field = 'duration'
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'created',
+        'method',
+        'path',
+        'view',
+        'status',
+        'duration_ms',
+        'queries',
+        'query_ms',
+        'user',
+    )
+    list_filter = ('view', 'status')
+    search_fields = ('path', 'view')
+    exclude = ('stats',)
+    readonly_fields = (
+        'method', 'path', 'view', 'status', 'user', 'duration', 'queries',
+        'query_time', 'created', 'download', 'top_functions',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='core_requestprofile_download',
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        """Профиль файлом .prof для snakeviz или ``python -m pstats``."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(
+            bytes(profile.stats), content_type='application/octet-stream'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="profile-{profile.pk}.prof"'
+        )
+        return response
+
+    def duration_ms(self, profile):
+        return f'{profile.duration * 1000:.0f}'
+    duration_ms.short_description = 'Время, мс'
+    duration_ms.admin_order_field = 'duration'
+
+    def query_ms(self, profile):
+        return f'{profile.query_time * 1000:.0f}'
+    query_ms.short_description = 'SQL, мс'
+    query_ms.admin_order_field = 'query_time'
+
+    def download(self, profile):
+        url = reverse('admin:core_requestprofile_download', args=(profile.pk,))
+        return format_html('<a href="{}">profile-{}.prof</a>', url, profile.pk)
+    download.short_description = 'Файл'
+
+    def top_functions(self, profile):
+        return format_html(
+            '<pre style="white-space: pre; overflow-x: auto">{}</pre>',
+            profiling.top_functions(profile),
+        )
+    top_functions.short_description = 'Функции по накопленному времени'
+
+
+admin.site.register(QueryFingerprint, QueryFingerprintAdmin)
+admin.site.register(SlowQuery, SlowQueryAdmin)
+admin.site.register(RequestProfile, RequestProfileAdmin)
@@ -0,0 +1,219 @@
+import json
+import time
+import tracemalloc
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from posts.models import Group, Post, User
+
+# Модули, все адреса которых проходит бенчмарк.
+URL_MODULES = ('posts.urls', 'users.urls', 'about.urls')
+
+# Адреса, которым нужна строка запроса.
+QUERY_STRINGS = {'posts:search': '?q={word}'}
+
+# Формы, которые замеряются ещё и отправкой.
+POST_DATA = {
+    'posts:post_create': {'text': 'Пост из бенчмарка'},
+    'posts:post_edit': {'text': 'Пост из бенчмарка, правка'},
+    'posts:add_comment': {'text': 'Комментарий из бенчмарка'},
+}
+
+PERCENTILES = (50, 95, 99)
+
+METRICS = tuple(f'p{rank}_ms' for rank in PERCENTILES) + (
+    'queries', 'bytes', 'alloc_kib',
+)
+
+
+def percentile(sorted_values, rank):
+    """Перцентиль по ближайшему рангу."""
+    index = max(0, -(-rank * len(sorted_values) // 100) - 1)
+    return sorted_values[index]
+
+
+def url_patterns():
+    """Пары (имя адреса, имена параметров) из URL_MODULES."""
+    for module_name in URL_MODULES:
+        module = import_module(module_name)
+        for pattern in module.urlpatterns:
+            if isinstance(pattern, URLPattern) and pattern.name:
+                yield (
+                    f'{module.app_name}:{pattern.name}',
+                    tuple(pattern.pattern.converters),
+                )
+
+
+def busiest(queryset, relation):
+    return queryset.annotate(
+        total=Count(relation)
+    ).order_by('-total', 'pk').first()
+
+
+def sample_objects():
+    """Самые нагруженные объекты набора данных для параметров адресов.
+
+    Читатель подписан на больше всех авторов, чтобы лента подписок
+    была полной; автор собрал больше всех подписчиков.
+    """
+    reader = busiest(User.objects, 'follower')
+    if reader is None:
+        raise ValueError('В базе нет пользователей.')
+    post = (
+        Post.objects.filter(author=reader).order_by('-pk').first()
+        or Post.objects.order_by('-pk').first()
+    )
+    return {
+        'reader': reader,
+        'author': busiest(User.objects, 'following'),
+        'post': post,
+        'group': busiest(Group.objects, 'posts'),
+    }
+
+
+def scenarios(objects):
+    """Запросы бенчмарка: (метка, метод, адрес, данные формы)."""
+    reader, post, group = objects['reader'], objects['post'], objects['group']
+    params = {
+        'slug': group.slug if group else 'missing',
+        'username': objects['author'].username,
+        'post_id': post.pk if post else 0,
+        'uidb64': urlsafe_base64_encode(force_bytes(reader.pk)),
+        'token': default_token_generator.make_token(reader),
+    }
+    word = post.text.split()[0] if post and post.text else 'пост'
+    for name, converters in url_patterns():
+        url = reverse(name, kwargs={key: params[key] for key in converters})
+        url += QUERY_STRINGS.get(name, '').format(word=word)
+        yield name, 'GET', url, None
+        if name in POST_DATA:
+            yield f'{name} POST', 'POST', url, POST_DATA[name]
+
+
+def measure(client, user, request, iterations, warmup, cold):
+    """Метрики одного адреса.
+
+    Задержки — по всем повторам после прогрева; запросы к базе и пик
+    выделенной памяти — отдельным проходом, чтобы трассировка не
+    искажала время. Вход в систему выполняется перед каждым запросом
+    и в замеры не попадает: среди адресов есть выход.
+    """
+    method, url, data = request
+    send = client.post if method == 'POST' else client.get
+
+    def call():
+        client.force_login(user)
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        response = send(url, data)
+        return response, time.perf_counter() - started
+
+    for _ in range(warmup):
+        call()
+    latencies = sorted(call()[1] for _ in range(iterations))
+    client.force_login(user)
+    if cold:
+        cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        response = send(url, data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    result = {
+        f'p{rank}_ms': round(percentile(latencies, rank) * 1000, 3)
+        for rank in PERCENTILES
+    }
+    result.update(
+        status=response.status_code,
+        queries=len(queries),
+        bytes=len(response.content),
+        alloc_kib=round(peak / 1024, 1),
+    )
+    return result
+
+
+def run(iterations=20, warmup=2, cold=False, only=None):
+    """Прогоняет адреса под самым активным читателем.
+
+    Возвращает словарь метка → метрики; ``only`` ограничивает прогон
+    метками, начинающимися с одного из префиксов.
+    """
+    objects = sample_objects()
+    results = {}
+    for label, *request in scenarios(objects):
+        if only and not label.startswith(tuple(only)):
+            continue
+        results[label] = measure(
+            Client(), objects['reader'], request, iterations, warmup, cold
+        )
+    return results
+
+
+def middleware_overhead(middleware, iterations=20, warmup=2, only=None):
+    """Метрики каждого адреса без middleware и с ним.
+
+    Замеры идут парами по каждому адресу, чтобы дрейф машины за время
+    прогона одинаково сказывался на обеих половинах пары.
+    """
+    objects = sample_objects()
+    without = [name for name in settings.MIDDLEWARE if name != middleware]
+    results = {}
+    for label, *request in scenarios(objects):
+        if only and not label.startswith(tuple(only)):
+            continue
+        with override_settings(MIDDLEWARE=without):
+            bare = measure(
+                Client(), objects['reader'], request, iterations, warmup,
+                False,
+            )
+        results[label] = bare, measure(
+            Client(), objects['reader'], request, iterations, warmup, False
+        )
+    return results
+
+
+def compare(results, baseline, metric='p50_ms', threshold=0.2):
+    """Регрессии относительно базовой линии.
+
+    Регрессия — ``metric`` больше базы более чем на ``threshold`` или
+    больше запросов к базе, чем в базе; новые адреса не сравниваются.
+    С ``metric=None`` сравнивается только число запросов.
+    """
+    regressions = []
+    for label, current in results.items():
+        base = baseline.get(label)
+        if base is None:
+            continue
+        if metric and current[metric] > base[metric] * (1 + threshold):
+            regressions.append(
+                f'{label}: {metric} {base[metric]} -> {current[metric]}'
+            )
+        if current['queries'] > base['queries']:
+            regressions.append(
+                f'{label}: queries {base["queries"]} -> '
+                f'{current["queries"]}'
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(results, stream, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+        stream.write('\n')
@@ -0,0 +1,266 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entry ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_entry_accessed '
+    'ON cache_entry (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_entry_expires '
+    'ON cache_entry (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_stats ('
+    'id INTEGER PRIMARY KEY CHECK (id = 1), bytes INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_stats (id, bytes) VALUES (1, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_ai AFTER INSERT ON cache_entry '
+    'BEGIN UPDATE cache_stats SET bytes = bytes + new.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_ad AFTER DELETE ON cache_entry '
+    'BEGIN UPDATE cache_stats SET bytes = bytes - old.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_au '
+    'AFTER UPDATE OF size ON cache_entry '
+    'BEGIN UPDATE cache_stats SET bytes = bytes - old.size + new.size; END',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов на одном хосте.
+
+    ``LocMemCache`` у каждого воркера свой: кэш греется заново в каждом
+    процессе, а сброс в одном воркере не виден остальным. Здесь записи
+    лежат в одном файле в режиме WAL, так что читатели не блокируют
+    друг друга и единственного писателя.
+
+    Объём ограничен ``OPTIONS['MAX_BYTES']``: при переполнении сначала
+    удаляются просроченные записи, затем давно не читанные (LRU).
+    Время чтения обновляется не чаще раза в ``ACCESS_RESOLUTION``
+    секунд, чтобы горячие ключи не превращали каждое чтение в запись.
+
+    Пример настройки::
+
+        CACHES = {
+            'default': {
+                'BACKEND': 'core.cache_backends.SQLiteCache',
+                'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+                'OPTIONS': {'MAX_BYTES': 64 * 1024 * 1024},
+            }
+        }
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self.access_resolution = float(options.get('ACCESS_RESOLUTION', 1))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self.cull_ratio = float(options.get('CULL_RATIO', 0.1))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        """Соединение текущего потока; после fork открывается заново."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.db = self._connect()
+            local.pid = os.getpid()
+        return local.db
+
+    def _connect(self):
+        db = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None
+        )
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        with _write(db):
+            for statement in SCHEMA:
+                db.execute(statement)
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self._db.execute(
+            'SELECT key, value, expires, accessed FROM cache_entry '
+            f'WHERE key IN ({", ".join("?" * len(keys))})',
+            list(keys),
+        ).fetchall()
+        found = {}
+        expired = []
+        stale = []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                expired.append(key)
+                continue
+            found[keys[key]] = pickle.loads(value)
+            if accessed < now - self.access_resolution:
+                stale.append(key)
+        if expired or stale:
+            with _write(self._db) as db:
+                db.executemany(
+                    'DELETE FROM cache_entry WHERE key = ? AND expires <= ?',
+                    [(key, now) for key in expired],
+                )
+                db.executemany(
+                    'UPDATE cache_entry SET accessed = ? WHERE key = ?',
+                    [(now, key) for key in stale],
+                )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = []
+        for key, value in data.items():
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            rows.append(
+                (self._key(key, version), value, len(value), expires, now)
+            )
+        with _write(self._db) as db:
+            db.executemany(
+                'INSERT INTO cache_entry '
+                '(key, value, size, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                'value = excluded.value, size = excluded.size, '
+                'expires = excluded.expires, accessed = excluded.accessed',
+                rows,
+            )
+            self._evict(db, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        with _write(self._db) as db:
+            db.execute(
+                'DELETE FROM cache_entry WHERE key = ? AND expires <= ?',
+                (key, now),
+            )
+            added = db.execute(
+                'INSERT OR IGNORE INTO cache_entry '
+                '(key, value, size, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), expires, now),
+            ).rowcount == 1
+            if added:
+                self._evict(db, now)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with _write(self._db) as db:
+            return db.execute(
+                'UPDATE cache_entry SET expires = ?, accessed = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, key, now),
+            ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно в пределах хоста: чтение и запись в одной транзакции."""
+        key = self._key(key, version)
+        now = time.time()
+        with _write(self._db) as db:
+            row = db.execute(
+                'SELECT value FROM cache_entry '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache_entry SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?',
+                (pickled, len(pickled), now, key),
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            'SELECT 1 FROM cache_entry '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        with _write(self._db) as db:
+            db.executemany('DELETE FROM cache_entry WHERE key = ?', keys)
+
+    def clear(self):
+        with _write(self._db) as db:
+            db.execute('DELETE FROM cache_entry')
+
+    def size(self):
+        """Сколько байт занимают значения всех записей."""
+        return self._db.execute(
+            'SELECT bytes FROM cache_stats WHERE id = 1'
+        ).fetchone()[0]
+
+    def _excess(self, db):
+        return db.execute(
+            'SELECT bytes FROM cache_stats WHERE id = 1'
+        ).fetchone()[0] - self.max_bytes
+
+    def _evict(self, db, now):
+        """Укладывает кэш в MAX_BYTES: сперва просроченные, затем LRU.
+
+        Вытеснение освобождает ещё и CULL_RATIO бюджета про запас, чтобы
+        не запускаться на каждой следующей записи.
+        """
+        if self._excess(db) <= 0:
+            return
+        db.execute('DELETE FROM cache_entry WHERE expires <= ?', (now,))
+        excess = self._excess(db)
+        if excess <= 0:
+            return
+        db.execute(
+            'DELETE FROM cache_entry WHERE key IN ('
+            'SELECT key FROM (SELECT key, SUM(size) OVER '
+            '(ORDER BY accessed, key) - size AS freed FROM cache_entry) '
+            'WHERE freed < ?)',
+            (excess + int(self.max_bytes * self.cull_ratio),),
+        )
+
+
+class _write:
+    """Транзакция записи, сразу берущая блокировку (BEGIN IMMEDIATE).
+
+    Так два процесса не упираются в SQLITE_BUSY при повышении блокировки
+    с чтения до записи посреди транзакции.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+
+def create_cache(config):
+    params = dict(config)
+    return import_string(params.pop('BACKEND'))(
+        params.get('LOCATION', ''), params
+    )
+
+
+def run_worker(config, options, seed, results):
+    """Смесь чтений со сквозной записью при промахе и прямых записей."""
+    cache = create_cache(config)
+    rng = random.Random(seed)
+    keys = [f'bench:{number}' for number in range(options['keys'])]
+    weights = [
+        1 / (rank + 1) ** options['alpha'] for rank in range(len(keys))
+    ]
+    value = os.urandom(options['value_size'])
+    hits = misses = 0
+    latencies = []
+    started = time.perf_counter()
+    for key in rng.choices(keys, weights, k=options['ops']):
+        op_started = time.perf_counter()
+        if rng.random() < options['read_ratio']:
+            if cache.get(key) is None:
+                misses += 1
+                cache.set(key, value)
+            else:
+                hits += 1
+        else:
+            cache.set(key, value)
+        latencies.append(time.perf_counter() - op_started)
+    results.put((hits, misses, time.perf_counter() - started, latencies))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает бэкенды кэша под нагрузкой из нескольких процессов: '
+        'пропускную способность, долю попаданий и задержки операций.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends', nargs='+', default=list(settings.CACHE_BACKENDS),
+            help='Имена из settings.CACHE_BACKENDS.',
+        )
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--ops', type=int, default=20000,
+            help='Операций на один процесс.',
+        )
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--value-size', type=int, default=2048)
+        parser.add_argument('--read-ratio', type=float, default=0.9)
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель закона Ципфа для популярности ключей.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        unknown = set(options['backends']) - set(settings.CACHE_BACKENDS)
+        if unknown:
+            raise CommandError(
+                f'Нет таких бэкендов кэша: {", ".join(sorted(unknown))}'
+            )
+        self.stdout.write(
+            'backend   workers     ops/s   hit rate   p50 us   p99 us'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options['backends']:
+                config = dict(settings.CACHE_BACKENDS[name])
+                if 'LOCATION' in config and name != 'locmem':
+                    config['LOCATION'] = os.path.join(
+                        directory, f'{name}.sqlite3'
+                    )
+                self.report(name, config, options)
+
+    def report(self, name, config, options):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(config, options, options['seed'] + number, results),
+            )
+            for number in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        collected = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        hits = sum(result[0] for result in collected)
+        misses = sum(result[1] for result in collected)
+        elapsed = max(result[2] for result in collected)
+        latencies = sorted(
+            latency for result in collected for latency in result[3]
+        )
+        ops = len(latencies)
+        self.stdout.write(
+            f'{name:<8}  {options["workers"]:>7}  {ops / elapsed:>8.0f}  '
+            f'{hits / max(hits + misses, 1):>9.1%}  '
+            f'{latencies[ops // 2] * 1e6:>7.1f}  '
+            f'{latencies[int(ops * 0.99)] * 1e6:>7.1f}'
+        )
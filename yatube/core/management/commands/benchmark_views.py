@@ -0,0 +1,180 @@
+import os
+import tempfile
+from io import StringIO
+from statistics import median
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все адреса posts, users и about через тестовый клиент '
+        'на синтетических данных и печатает p50/p95/p99, число запросов, '
+        'размер ответа и пик памяти. С --baseline сравнивает с сохранённым '
+        'прогоном и завершается ошибкой при регрессии. Данные создаются '
+        'в отдельной временной базе; с --use-existing замер идёт на '
+        'текущей базе, и все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--only', nargs='+',
+            help='Префиксы меток, например posts:index users:.',
+        )
+        parser.add_argument(
+            '--use-existing', action='store_true',
+            help='Не создавать временную базу, а мерить на текущей.',
+        )
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=4000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', help='JSON для сравнения.')
+        parser.add_argument(
+            '--save-baseline', help='Куда записать результаты в JSON.'
+        )
+        parser.add_argument(
+            '--metric', choices=benchmarks.METRICS[:3], default='p50_ms',
+            help='Метрика задержки для сравнения с базой.',
+        )
+        parser.add_argument(
+            '--queries-only', action='store_true',
+            help='Сравнивать с базой только число запросов: задержки '
+                 'на чужом железе с базой несравнимы.',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост метрики, доля от базы.',
+        )
+        parser.add_argument(
+            '--middleware-overhead', metavar='PATH',
+            help='Сравнить p50 без этого middleware и с ним.',
+        )
+        parser.add_argument(
+            '--max-overhead', type=float, default=0.05,
+            help='Допустимая медиана доли, которую middleware добавляет '
+                 'к p50 адреса.',
+        )
+
+    def handle(self, *args, **options):
+        if options['middleware_overhead']:
+            if options['middleware_overhead'] not in settings.MIDDLEWARE:
+                raise CommandError(
+                    f'{options["middleware_overhead"]} нет в MIDDLEWARE'
+                )
+            options['cold'] = False
+        baseline = None
+        if options['baseline']:
+            if not os.path.exists(options['baseline']):
+                raise CommandError(f'Нет файла {options["baseline"]}')
+            baseline = benchmarks.load_baseline(options['baseline'])
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                if options['use_existing']:
+                    results = self.measure(options)
+                else:
+                    results = self.measure_seeded(options)
+        if options['middleware_overhead']:
+            self.check_overhead(results, options['max_overhead'])
+            return
+        self.print_table(results)
+        if options['save_baseline']:
+            benchmarks.save_baseline(options['save_baseline'], results)
+        if baseline is not None:
+            self.check_baseline(results, baseline, options)
+
+    def measure_seeded(self, options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            call_command(
+                'seed', stdout=StringIO(),
+                users=options['users'],
+                groups=max(options['users'] // 20, 1),
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=10,
+                images=4,
+                seed=options['seed'],
+            )
+            return self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def measure(self, options):
+        cache.clear()
+        try:
+            with transaction.atomic():
+                results = self.run(options)
+                transaction.set_rollback(True)
+        finally:
+            cache.clear()
+        return results
+
+    def run(self, options):
+        if options['middleware_overhead']:
+            return benchmarks.middleware_overhead(
+                options['middleware_overhead'], options['iterations'],
+                options['warmup'], only=options['only'],
+            )
+        return benchmarks.run(
+            options['iterations'], options['warmup'],
+            cold=options['cold'], only=options['only'],
+        )
+
+    def print_table(self, results):
+        self.stdout.write(
+            f'{"view":<34} status   p50 ms   p95 ms   p99 ms  queries'
+            '     bytes  alloc KiB'
+        )
+        for label, row in results.items():
+            self.stdout.write(
+                f'{label:<34} {row["status"]:>6} {row["p50_ms"]:>8.2f} '
+                f'{row["p95_ms"]:>8.2f} {row["p99_ms"]:>8.2f} '
+                f'{row["queries"]:>8} {row["bytes"]:>9} '
+                f'{row["alloc_kib"]:>10.1f}'
+            )
+
+    def check_baseline(self, results, baseline, options):
+        metric = None if options['queries_only'] else options['metric']
+        regressions = benchmarks.compare(
+            results, baseline, metric, options['threshold']
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базы:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write('Регрессий относительно базы нет.')
+
+    def check_overhead(self, results, max_overhead):
+        self.stdout.write(
+            f'{"view":<34}  bare ms  with ms  delta ms'
+        )
+        for label, (bare, measured) in results.items():
+            self.stdout.write(
+                f'{label:<34} {bare["p50_ms"]:>8.2f} '
+                f'{measured["p50_ms"]:>8.2f} '
+                f'{measured["p50_ms"] - bare["p50_ms"]:>9.3f}'
+            )
+        overhead = median(
+            measured['p50_ms'] / bare['p50_ms'] - 1
+            for bare, measured in results.values()
+        )
+        self.stdout.write(f'Медиана накладных расходов: {overhead:.1%}')
+        if overhead > max_overhead:
+            raise CommandError(
+                f'Накладные расходы {overhead:.1%} больше {max_overhead:.0%}'
+            )
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from core.models import QueryFingerprint, SlowQuery
+
+ORDERINGS = {
+    'total': '-total_time',
+    'count': '-count',
+    'max': '-max_time',
+    'avg': F('total_time') / F('count'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает самые дорогие виды SQL-запросов по view из сводки '
+        'QueryStatsMiddleware, а с --slow — медленные запросы с планом '
+        'и местом вызова.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Только эта view, например '
+                                           'posts:follow_index.')
+        parser.add_argument(
+            '--order', choices=ORDERINGS, default='total',
+            help='Сортировка: суммарное, число, максимум или среднее.',
+        )
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--slow', action='store_true',
+            help='Вывести последние медленные запросы.',
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Удалить накопленную сводку и медленные запросы.',
+        )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            QueryFingerprint.objects.all().delete()
+            SlowQuery.objects.all().delete()
+            self.stdout.write('Сводка очищена.')
+            return
+        if options['slow']:
+            self.print_slow(options)
+        else:
+            self.print_fingerprints(options)
+
+    def print_fingerprints(self, options):
+        entries = QueryFingerprint.objects.all()
+        if options['view']:
+            entries = entries.filter(view=options['view'])
+        ordering = ORDERINGS[options['order']]
+        if options['order'] == 'avg':
+            ordering = ordering.desc()
+        self.stdout.write(
+            '  total ms   count   avg ms   max ms  view / sql'
+        )
+        for entry in entries.order_by(ordering)[:options['limit']]:
+            self.stdout.write(
+                f'{entry.total_time * 1000:>10.1f} {entry.count:>7} '
+                f'{entry.average_time * 1000:>8.2f} '
+                f'{entry.max_time * 1000:>8.1f}  {entry.view}\n'
+                f'{"":>37}{entry.sql[:200]}'
+            )
+
+    def print_slow(self, options):
+        queries = SlowQuery.objects.all()
+        if options['view']:
+            queries = queries.filter(view=options['view'])
+        for query in queries[:options['limit']]:
+            self.stdout.write(
+                f'{query.created:%Y-%m-%d %H:%M:%S}  {query.view}  '
+                f'{query.duration * 1000:.0f} мс\n{query.sql}\n'
+                f'Параметры: {query.params}\nПлан:\n{query.plan}\n'
+                f'Вызов:\n{query.stack}'
+            )
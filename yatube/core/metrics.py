@@ -0,0 +1,366 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.template.base import Template
+
+from .cache_backends import _write
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = tuple(2 ** power for power in range(10, 22, 2))
+
+# Семейства метрик: тип и описание для HELP.
+FAMILIES = {
+    'yatube_http_requests_total': (
+        'counter', 'Ответы по view, методу и коду.'
+    ),
+    'yatube_http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса.'
+    ),
+    'yatube_http_response_size_bytes': (
+        'histogram', 'Размер тела ответа без потоковых ответов.'
+    ),
+    'yatube_db_queries_per_request': (
+        'histogram', 'SQL-запросов за один запрос.'
+    ),
+    'yatube_db_query_seconds_total': (
+        'counter', 'Суммарное время SQL-запросов.'
+    ),
+    'yatube_template_render_seconds': (
+        'histogram', 'Время рендеринга шаблонов за один запрос.'
+    ),
+    'yatube_cache_requests_total': (
+        'counter', 'Чтения кэша по области ключа: попадания и промахи.'
+    ),
+}
+
+INF = float('inf')
+_MISSING = object()
+_local = threading.local()
+
+
+@lru_cache(maxsize=4096)
+def label_string(**labels):
+    return ','.join(
+        f'{name}="{escape(value)}"' for name, value in sorted(labels.items())
+    )
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n'
+    )
+
+
+def cache_area(key):
+    """Область ключа кэша: префикс до двоеточия или имя фрагмента.
+
+    Ключи без двоеточия попадают в общую область ``other``, иначе
+    каждый такой ключ стал бы отдельным значением метки.
+    """
+    if key.startswith('template.cache.'):
+        return key.rsplit('.', 1)[0]
+    area, colon, _ = key.partition(':')
+    return area if colon else 'other'
+
+
+class RequestStats:
+    """Счётчики одного запроса: их пополняют обёртки БД, кэша, шаблонов."""
+
+    __slots__ = (
+        'queries', 'query_time', 'template_time', 'cache', 'active',
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.cache = defaultdict(int)
+        self.active = set()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def current_stats():
+    return getattr(_local, 'stats', None)
+
+
+def start_request():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def end_request():
+    _local.stats = None
+
+
+class Registry:
+    """Метрики процесса, время от времени сливаемые в общий файл.
+
+    Наблюдение — это несколько операций со словарями под блокировкой;
+    раз в METRICS_FLUSH_INTERVAL секунд накопленные приращения одной
+    транзакцией прибавляются к строкам в SQLite, общем для всех
+    воркеров хоста. После fork унаследованные приращения отбрасываются:
+    их сольёт родитель.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed = time.monotonic()
+
+    def _check_pid(self):
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.counters = defaultdict(float)
+            self.histograms = {}
+
+    def record(self, counters, observations):
+        """Приращения и наблюдения одного запроса под одной блокировкой."""
+        with self.lock:
+            self._check_pid()
+            for name, labels, value in counters:
+                self.counters[name, labels] += value
+            for name, labels, value, buckets in observations:
+                series = self.histograms.get((name, labels))
+                if series is None:
+                    series = self.histograms[name, labels] = [
+                        buckets, [0] * (len(buckets) + 1), 0.0,
+                    ]
+                series[1][bisect_left(buckets, value)] += 1
+                series[2] += value
+
+    def take(self):
+        """Забирает накопленные приращения строками для хранилища."""
+        with self.lock:
+            self._check_pid()
+            counters, self.counters = self.counters, defaultdict(float)
+            histograms, self.histograms = self.histograms, {}
+            self.flushed = time.monotonic()
+        rows = [
+            (name, labels, 0, value)
+            for (name, labels), value in counters.items()
+        ]
+        for (name, labels), (buckets, counts, total) in histograms.items():
+            cumulative = 0
+            for bound, count in zip(buckets + (INF,), counts):
+                cumulative += count
+                rows.append((f'{name}_bucket', labels, bound, cumulative))
+            rows.append((f'{name}_sum', labels, 0, total))
+            rows.append((f'{name}_count', labels, 0, cumulative))
+        return rows
+
+    def flush(self):
+        rows = self.take()
+        if rows:
+            store().add(rows)
+
+    def flush_if_due(self):
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if time.monotonic() - self.flushed >= interval:
+            self.flush()
+
+
+class MetricStore:
+    """Сумма приращений всех процессов в одном файле SQLite."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.db = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            local.db.execute('PRAGMA journal_mode=WAL')
+            local.db.execute(
+                'CREATE TABLE IF NOT EXISTS metric ('
+                'name TEXT NOT NULL, labels TEXT NOT NULL, le REAL NOT NULL, '
+                'value REAL NOT NULL, PRIMARY KEY (name, labels, le)) '
+                'WITHOUT ROWID'
+            )
+            local.pid = os.getpid()
+        return local.db
+
+    def add(self, rows):
+        with _write(self._db) as db:
+            db.executemany(
+                'INSERT INTO metric (name, labels, le, value) '
+                'VALUES (?, ?, ?, ?) ON CONFLICT (name, labels, le) '
+                'DO UPDATE SET value = value + excluded.value',
+                rows,
+            )
+
+    def rows(self):
+        return self._db.execute(
+            'SELECT name, labels, le, value FROM metric '
+            'ORDER BY name, labels, le'
+        ).fetchall()
+
+    def clear(self):
+        with _write(self._db) as db:
+            db.execute('DELETE FROM metric')
+
+
+_store = None
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def store():
+    global _store
+    if _store is None or _store.path != settings.METRICS_LOCATION:
+        _store = MetricStore(settings.METRICS_LOCATION)
+    return _store
+
+
+def family(name):
+    """Семейство строки: у гистограмм без суффикса _bucket/_sum/_count."""
+    base, _, suffix = name.rpartition('_')
+    if suffix in ('bucket', 'sum', 'count') and base in FAMILIES:
+        return base
+    return name
+
+
+def series(name, labels, le):
+    if name.endswith('_bucket'):
+        bound = '+Inf' if le == INF else f'{le:g}'
+        labels = f'{labels},le="{bound}"' if labels else f'le="{bound}"'
+    return f'{name}{{{labels}}}' if labels else name
+
+
+def render():
+    """Все метрики хоста в текстовом формате Prometheus."""
+    registry.flush()
+    lines = []
+    described = set()
+    for name, labels, le, value in store().rows():
+        base = family(name)
+        if base not in described and base in FAMILIES:
+            kind, description = FAMILIES[base]
+            lines.append(f'# HELP {base} {description}')
+            lines.append(f'# TYPE {base} {kind}')
+            described.add(base)
+        lines.append(f'{series(name, labels, le)} {value!r}')
+    return '\n'.join(lines) + '\n'
+
+
+def record_request(view, method, status, duration, size, stats):
+    """Итог запроса: счётчики и гистограммы с метками его view."""
+    labels = label_string(view=view, method=method)
+    view_labels = label_string(view=view)
+    counters = [
+        (
+            'yatube_http_requests_total',
+            label_string(view=view, method=method, status=status), 1,
+        ),
+        ('yatube_db_query_seconds_total', view_labels, stats.query_time),
+    ]
+    counters.extend(
+        (
+            'yatube_cache_requests_total',
+            label_string(area=area, result=result), count,
+        )
+        for (area, result), count in stats.cache.items()
+    )
+    observations = [
+        (
+            'yatube_http_request_duration_seconds', labels, duration,
+            LATENCY_BUCKETS,
+        ),
+        (
+            'yatube_db_queries_per_request', view_labels, stats.queries,
+            QUERY_BUCKETS,
+        ),
+        (
+            'yatube_template_render_seconds', view_labels,
+            stats.template_time, LATENCY_BUCKETS,
+        ),
+    ]
+    if size is not None:
+        observations.append((
+            'yatube_http_response_size_bytes', labels, size, SIZE_BUCKETS
+        ))
+    registry.record(counters, observations)
+    registry.flush_if_due()
+
+
+def _cache_get(stats, get, cache, key, default=None, version=None):
+    value = get(cache, key, _MISSING, version=version)
+    hit = value is not _MISSING
+    stats.cache[cache_area(key), 'hit' if hit else 'miss'] += 1
+    return value if hit else default
+
+
+def _cache_get_many(stats, get_many, cache, keys, version=None):
+    keys = list(keys)
+    found = get_many(cache, keys, version=version)
+    for key in keys:
+        stats.cache[cache_area(key), 'hit' if key in found else 'miss'] += 1
+    return found
+
+
+def _template_render(stats, render, template, context):
+    started = time.perf_counter()
+    try:
+        return render(template, context)
+    finally:
+        stats.template_time += time.perf_counter() - started
+
+
+def _patch(cls, name, kind, measure):
+    """Подменяет метод обёрткой, которая учитывает только внешний вызов.
+
+    ``get`` одних бэкендов вызывает ``get_many`` и наоборот, шаблон
+    рендерит вложенные шаблоны: вложенные вызовы того же вида
+    пропускаются без учёта.
+    """
+    method = getattr(cls, name)
+    if hasattr(method, 'measured'):
+        return
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = current_stats()
+        if stats is None or kind in stats.active:
+            return method(self, *args, **kwargs)
+        stats.active.add(kind)
+        try:
+            return measure(stats, method, self, *args, **kwargs)
+        finally:
+            stats.active.discard(kind)
+
+    wrapper.measured = True
+    setattr(cls, name, wrapper)
+
+
+def install(cache_classes):
+    """Оборачивает чтения кэша и рендеринг шаблонов; повторно — no-op.
+
+    Пока запрос не начал сбор (``start_request``), обёртки сразу
+    вызывают исходный метод.
+    """
+    for cls in cache_classes:
+        _patch(cls, 'get', 'cache', _cache_get)
+        _patch(cls, 'get_many', 'cache', _cache_get_many)
+    _patch(Template, 'render', 'template', _template_render)
@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_finished
+from django.db import connection
+
+from . import metrics, profiling, querystats
+
+
+class MetricsMiddleware:
+    """Собирает метрики каждого запроса для ``/metrics/``.
+
+    Время, SQL-запросы, чтения кэша и рендеринг шаблонов копятся в
+    ``RequestStats`` текущего потока и после ответа одной записью
+    попадают в реестр процесса. Ставится в начало MIDDLEWARE, чтобы
+    учитывать и работу остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        metrics.install(
+            {type(caches[alias]) for alias in settings.CACHES}
+        )
+
+    def __call__(self, request):
+        stats = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats.record_query):
+                response = self.get_response(request)
+            duration = time.perf_counter() - started
+        finally:
+            metrics.end_request()
+        match = request.resolver_match
+        metrics.record_request(
+            match.view_name if match else 'unresolved',
+            request.method,
+            response.status_code,
+            duration,
+            None if response.streaming else len(response.content),
+            stats,
+        )
+        return response
+
+
+class QueryStatsMiddleware:
+    """Сводка SQL-запросов по отпечаткам для ``manage.py querystats``.
+
+    Работает и без DEBUG: запросы перехватывает ``execute_wrapper``,
+    а не ``connection.queries``. Сводка запроса приписывается view,
+    в которую разрешился адрес. В базу сводка сливается по сигналу
+    ``request_finished``, когда ответ уже отдан клиенту, и там же
+    снимаются планы медленных запросов.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERYSTATS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        request_finished.connect(
+            querystats.flush_after_response,
+            dispatch_uid='querystats_flush_after_response',
+        )
+
+    def __call__(self, request):
+        queries = querystats.RequestQueries()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        match = request.resolver_match
+        querystats.aggregator.add(
+            match.view_name if match else 'unresolved', queries
+        )
+        return response
+
+
+class ProfileMiddleware:
+    """Профилирует запрос под cProfile по просьбе персонала.
+
+    Включается параметром PROFILE_PARAM в адресе или заголовком
+    PROFILE_HEADER и работает без DEBUG и INTERNAL_IPS. Стоит после
+    AuthenticationMiddleware, чтобы знать пользователя.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if profiling.requested(request):
+            return profiling.profile_request(request, self.get_response)
+        return self.get_response(request)
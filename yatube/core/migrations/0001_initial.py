@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=200, verbose_name='View')),
+                ('fingerprint', models.CharField(max_length=32, verbose_name='Отпечаток')),
+                ('sql', models.TextField(help_text='Запрос с литералами, заменёнными на ?', verbose_name='SQL')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Выполнений')),
+                ('total_time', models.FloatField(default=0, verbose_name='Всего, с')),
+                ('max_time', models.FloatField(default=0, verbose_name='Максимум, с')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Впервые')),
+                ('last_seen', models.DateTimeField(auto_now=True, verbose_name='Последний раз')),
+            ],
+            options={
+                'verbose_name': 'query fingerprint',
+                'verbose_name_plural': 'query fingerprints',
+                'ordering': ('-total_time',),
+            },
+        ),
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=200, verbose_name='View')),
+                ('fingerprint', models.CharField(max_length=32, verbose_name='Отпечаток')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params', models.TextField(blank=True, verbose_name='Параметры')),
+                ('duration', models.FloatField(verbose_name='Время, с')),
+                ('plan', models.TextField(blank=True, verbose_name='План')),
+                ('stack', models.TextField(blank=True, verbose_name='Место вызова')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Записан')),
+            ],
+            options={
+                'verbose_name': 'slow query',
+                'verbose_name_plural': 'slow queries',
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='queryfingerprint',
+            constraint=models.UniqueConstraint(fields=('view', 'fingerprint'), name='core_queryfingerprint_unique'),
+        ),
+    ]
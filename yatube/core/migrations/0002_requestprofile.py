@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.TextField(verbose_name='Адрес')),
+                ('view', models.CharField(max_length=200, verbose_name='View')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('duration', models.FloatField(verbose_name='Время, с')),
+                ('queries', models.PositiveIntegerField(verbose_name='SQL-запросов')),
+                ('query_time', models.FloatField(verbose_name='Время SQL, с')),
+                ('stats', models.BinaryField(help_text='Статистика pstats в формате marshal, как в .prof', verbose_name='Профиль')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Снят')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Кто снял')),
+            ],
+            options={
+                'verbose_name': 'request profile',
+                'verbose_name_plural': 'request profiles',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.db import models
+
+
+def keep_latest(model, count):
+    """Удаляет все строки модели, кроме ``count`` последних."""
+    oldest = list(model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    )[count:count + 1])
+    if oldest:
+        model.objects.filter(pk__lte=oldest[0]).delete()
+
+
+class QueryFingerprint(models.Model):
+    """Сводка по одному виду SQL-запроса в одном view."""
+
+    view = models.CharField('View', max_length=200)
+    fingerprint = models.CharField('Отпечаток', max_length=32)
+    sql = models.TextField(
+        'SQL',
+        help_text='Запрос с литералами, заменёнными на ?'
+    )
+    count = models.PositiveIntegerField('Выполнений', default=0)
+    total_time = models.FloatField('Всего, с', default=0)
+    max_time = models.FloatField('Максимум, с', default=0)
+    first_seen = models.DateTimeField('Впервые', auto_now_add=True)
+    last_seen = models.DateTimeField('Последний раз', auto_now=True)
+
+    class Meta:
+        ordering = ('-total_time',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['view', 'fingerprint'],
+                name='core_queryfingerprint_unique'
+            ),
+        ]
+        verbose_name = 'query fingerprint'
+        verbose_name_plural = 'query fingerprints'
+
+    def __str__(self):
+        return f'{self.view}: {self.sql[:60]}'
+
+    @property
+    def average_time(self):
+        return self.total_time / self.count if self.count else 0
+
+
+class SlowQuery(models.Model):
+    """Запрос дольше QUERYSTATS_SLOW_THRESHOLD с планом и местом вызова."""
+
+    view = models.CharField('View', max_length=200)
+    fingerprint = models.CharField('Отпечаток', max_length=32)
+    sql = models.TextField('SQL')
+    params = models.TextField('Параметры', blank=True)
+    duration = models.FloatField('Время, с')
+    plan = models.TextField('План', blank=True)
+    stack = models.TextField('Место вызова', blank=True)
+    created = models.DateTimeField('Записан', auto_now_add=True)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'slow query'
+        verbose_name_plural = 'slow queries'
+
+    def __str__(self):
+        return f'{self.view}: {self.duration * 1000:.0f} мс'
+
+
+class RequestProfile(models.Model):
+    """Профиль cProfile одного запроса, снятый по просьбе персонала."""
+
+    method = models.CharField('Метод', max_length=10)
+    path = models.TextField('Адрес')
+    view = models.CharField('View', max_length=200)
+    status = models.PositiveSmallIntegerField('Код ответа')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name='Кто снял'
+    )
+    duration = models.FloatField('Время, с')
+    queries = models.PositiveIntegerField('SQL-запросов')
+    query_time = models.FloatField('Время SQL, с')
+    stats = models.BinaryField(
+        'Профиль',
+        help_text='Статистика pstats в формате marshal, как в .prof'
+    )
+    created = models.DateTimeField('Снят', auto_now_add=True)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'request profile'
+        verbose_name_plural = 'request profiles'
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
@@ -0,0 +1,86 @@
+import cProfile
+import marshal
+import pstats
+import time
+from contextlib import contextmanager
+from io import StringIO
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import RequestStats
+from .models import RequestProfile, keep_latest
+
+# Сколько функций показывает страница профиля в админке.
+TOP_FUNCTIONS = 40
+
+
+def requested(request):
+    """Просит ли персонал профилировать этот запрос."""
+    flag = request.GET.get(settings.PROFILE_PARAM) or request.META.get(
+        settings.PROFILE_HEADER
+    )
+    return bool(flag) and request.user.is_staff
+
+
+@contextmanager
+def unobserved():
+    """Запросы в обход ``execute_wrapper`` внешних middleware.
+
+    Запись профиля — служебная, её не должны видеть ни метрики, ни
+    сводка SQL-запросов.
+    """
+    wrappers = connection.execute_wrappers
+    connection.execute_wrappers = []
+    try:
+        yield
+    finally:
+        connection.execute_wrappers = wrappers
+
+
+def profile_request(request, get_response):
+    """Выполняет запрос под cProfile и сохраняет профиль.
+
+    Возвращает ответ с заголовком ``X-Profile-Id``, по которому профиль
+    находится в админке.
+    """
+    # Запомнен заранее: выход из системы заменит request.user.
+    user = request.user
+    profiler = cProfile.Profile()
+    stats = RequestStats()
+    started = time.perf_counter()
+    with connection.execute_wrapper(stats.record_query):
+        response = profiler.runcall(get_response, request)
+    duration = time.perf_counter() - started
+    profiler.create_stats()
+    match = request.resolver_match
+    with unobserved():
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path(),
+            view=match.view_name if match else 'unresolved',
+            status=response.status_code,
+            user=user,
+            duration=duration,
+            queries=stats.queries,
+            query_time=stats.query_time,
+            stats=marshal.dumps(profiler.stats),
+        )
+        keep_latest(RequestProfile, settings.PROFILE_KEEP)
+    response['X-Profile-Id'] = str(profile.pk)
+    return response
+
+
+def load_stats(data, stream):
+    """``pstats.Stats`` из сохранённого профиля."""
+    stats = pstats.Stats(stream=stream)
+    stats.stats = marshal.loads(bytes(data))
+    stats.get_top_level_stats()
+    return stats
+
+
+def top_functions(profile, sort='cumulative', limit=TOP_FUNCTIONS):
+    """Текстовая таблица самых дорогих функций, как у ``pstats``."""
+    out = StringIO()
+    load_stats(profile.stats, out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,24 @@
+from urllib.parse import urlsplit
+
+from django.urls import Resolver404, resolve
+
+
+def query_budget(max_queries):
+    """Объявляет, сколько SQL-запросов может выполнить view.
+
+    Бюджет хранится атрибутом функции и переживает обёртки вроде
+    ``login_required``, которые копируют ``__dict__`` через ``wraps``.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_query_budget(path):
+    """Возвращает бюджет запросов view, обслуживающей адрес."""
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return None
+    return getattr(match.func, 'query_budget', None)
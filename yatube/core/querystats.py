@@ -0,0 +1,235 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import traceback
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import QueryFingerprint, SlowQuery, keep_latest
+
+LITERALS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r'%s|\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE), 'IN (...)'),
+    (
+        re.compile(r'\bVALUES \([^()]*\)(?:, \([^()]*\))*', re.IGNORECASE),
+        'VALUES (...)',
+    ),
+    (
+        re.compile(r'\bSELECT (?:\?, )*\?(?: UNION ALL SELECT (?:\?, )*\?)+'),
+        'SELECT ... UNION ALL ...',
+    ),
+)
+
+# Сколько кадров кода проекта сохраняется у медленного запроса.
+STACK_DEPTH = 5
+
+
+@lru_cache(maxsize=4096)
+def normalize(sql):
+    """Запрос без литералов: одинаков у запросов с разными значениями.
+
+    Списки ``IN``, ``VALUES`` и вставки пачкой через ``UNION ALL``
+    сворачиваются, иначе каждый размер пачки давал бы свой отпечаток.
+    """
+    for pattern, replacement in LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Отпечаток и нормализованный текст запроса."""
+    normalized = normalize(sql)
+    return hashlib.md5(normalized.encode()).hexdigest()[:16], normalized
+
+
+def explain(sql, params, many):
+    """План запроса; выполняется в обход execute_wrapper, без учёта."""
+    if many:
+        params = next(iter(params), None)
+    sqlite = connection.vendor == 'sqlite'
+    prefix = 'EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.cursor.execute(prefix + sql, params)
+            rows = cursor.cursor.fetchall()
+    except Exception as error:
+        return f'EXPLAIN не выполнен: {error}'
+    if sqlite:
+        # Строки плана SQLite: id, parent, notused, detail.
+        return '\n'.join(row[-1] for row in rows)
+    return '\n'.join(' '.join(str(part) for part in row) for row in rows)
+
+
+def project_stack():
+    """Несколько внутренних кадров кода проекта, откуда пришёл запрос."""
+    skip = (__file__, os.path.join(settings.BASE_DIR, 'core', 'middleware'))
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(settings.BASE_DIR)
+        and not frame.filename.startswith(skip)
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_DEPTH:]))
+
+
+class RequestQueries:
+    """Запросы одного HTTP-запроса, сгруппированные по отпечаткам."""
+
+    def __init__(self):
+        self.fingerprints = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, params, many, time.perf_counter() - started)
+
+    def record(self, sql, params, many, duration):
+        key, normalized = fingerprint(sql)
+        entry = self.fingerprints.get(key)
+        if entry is None:
+            entry = self.fingerprints[key] = [normalized, 0, 0.0, 0.0]
+        entry[1] += 1
+        entry[2] += duration
+        entry[3] = max(entry[3], duration)
+        if duration >= settings.QUERYSTATS_SLOW_THRESHOLD:
+            slow = SlowQuery(
+                fingerprint=key,
+                sql=sql,
+                params=repr(params)[:1000],
+                duration=duration,
+                stack=project_stack(),
+            )
+            # План снимается при слиянии сводки, уже после ответа.
+            slow.explain_args = (sql, params, many)
+            self.slow.append(slow)
+
+
+class Aggregator:
+    """Сводка процесса по (view, отпечаток), сливаемая в базу.
+
+    Раз в QUERYSTATS_FLUSH_INTERVAL секунд накопленное прибавляется к
+    строкам ``QueryFingerprint`` одним UPSERT в одной транзакции, так
+    что воркеры не перетирают приращения друг друга. Медленные запросы
+    сохраняются по одному самому долгому на отпечаток за интервал, план
+    для них снимается тут же, а не во время запроса.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.entries = {}
+        self.slow = {}
+        self.flushed = time.monotonic()
+
+    def add(self, view, queries):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.entries = {}
+                self.slow = {}
+            for key, (sql, count, total, longest) in (
+                queries.fingerprints.items()
+            ):
+                entry = self.entries.get((view, key))
+                if entry is None:
+                    self.entries[view, key] = [sql, count, total, longest]
+                    continue
+                entry[1] += count
+                entry[2] += total
+                entry[3] = max(entry[3], longest)
+            for slow in queries.slow:
+                known = self.slow.get((view, slow.fingerprint))
+                if known is None or known.duration < slow.duration:
+                    slow.view = view
+                    self.slow[view, slow.fingerprint] = slow
+
+    def take(self):
+        with self.lock:
+            entries, self.entries = self.entries, {}
+            slow, self.slow = self.slow, {}
+            self.flushed = time.monotonic()
+        return entries, list(slow.values())
+
+    def flush(self):
+        entries, slow = self.take()
+        if not entries and not slow:
+            return
+        for query in slow:
+            query.plan = explain(*query.explain_args)
+        with transaction.atomic():
+            save_entries(entries)
+            SlowQuery.objects.bulk_create(slow)
+        if slow:
+            keep_latest(SlowQuery, settings.QUERYSTATS_KEEP_SLOW)
+
+    def flush_if_due(self):
+        """Сливает сводку, если пора и нет внешней транзакции.
+
+        Внутри чужой транзакции запись продлила бы её блокировку, а
+        откат потерял бы сводку за весь интервал.
+        """
+        interval = settings.QUERYSTATS_FLUSH_INTERVAL
+        if connection.in_atomic_block:
+            return False
+        if time.monotonic() - self.flushed >= interval:
+            self.flush()
+            return True
+        return False
+
+
+def save_entries(entries):
+    """Прибавляет сводку к ``QueryFingerprint`` одним INSERT ... ON CONFLICT.
+
+    Строки, которых ещё нет, создаются, у остальных растут счётчики;
+    запрос один на все отпечатки интервала.
+    """
+    if not entries:
+        return
+    quote = connection.ops.quote_name
+    table = quote(QueryFingerprint._meta.db_table)
+    columns = (
+        'view', 'fingerprint', 'sql', 'count', 'total_time', 'max_time',
+        'first_seen', 'last_seen',
+    )
+    count, total, longest, last_seen = map(
+        quote, ('count', 'total_time', 'max_time', 'last_seen')
+    )
+    greatest = 'MAX' if connection.vendor == 'sqlite' else 'GREATEST'
+    sql = (
+        f'INSERT INTO {table} ({", ".join(map(quote, columns))}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({quote("view")}, {quote("fingerprint")}) DO UPDATE SET '
+        f'{count} = {table}.{count} + excluded.{count}, '
+        f'{total} = {table}.{total} + excluded.{total}, '
+        f'{longest} = {greatest}({table}.{longest}, excluded.{longest}), '
+        f'{last_seen} = excluded.{last_seen}'
+    )
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    rows = [
+        (view, key, normalized, calls, spent, slowest, now, now)
+        for (view, key), (normalized, calls, spent, slowest)
+        in entries.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def flush_after_response(**kwargs):
+    """Сливает сводку по сигналу ``request_finished``, когда ответ отдан."""
+    if aggregator.flush_if_due():
+        # Django уже закрыл соединение этого запроса, слияние открыло его
+        # заново.
+        close_old_connections()
+
+
+aggregator = Aggregator()
@@ -6,3 +6,15 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **params):
+    """Строка запроса текущей страницы с другими параметрами пагинации."""
+    query = context['request'].GET.copy()
+    for name in ('page', 'after', 'before'):
+        query.pop(name, None)
+    for name, value in params.items():
+        if value:
+            query[name] = value
+    return query.urlencode()
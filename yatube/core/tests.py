@@ -1,6 +1,20 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core import benchmarks, metrics, profiling, querystats
+from core.cache_backends import SQLiteCache
+from core.models import QueryFingerprint, RequestProfile, SlowQuery
+from posts.models import User
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +22,409 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.create_cache()
+
+    def create_cache(self, **options):
+        options.setdefault('ACCESS_RESOLUTION', 0)
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """Кэш поддерживает операции BaseCache."""
+        cache = self.cache
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertTrue(cache.add('new', 1))
+        self.assertEqual(cache.incr('new', 5), 6)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        cache.delete_many(['a', 'b'])
+        self.assertIsNone(cache.get('a'))
+        cache.set('short', 1, timeout=-1)
+        self.assertFalse(cache.has_key('short'))
+        self.assertEqual(cache.get('short', 'default'), 'default')
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+
+    def test_lru_eviction_keeps_byte_budget(self):
+        """Сверх бюджета вытесняются давно не читанные записи."""
+        cache = self.create_cache(MAX_BYTES=10000, CULL_RATIO=0)
+        value = 'x' * 1000
+        for number in range(9):
+            cache.set(f'key{number}', value)
+        cache.get('key0')
+        for number in range(9, 12):
+            cache.set(f'key{number}', value)
+        self.assertLessEqual(cache.size(), 10000)
+        self.assertIsNotNone(cache.get('key0'))
+        self.assertIsNone(cache.get('key1'))
+        self.assertIsNotNone(cache.get('key11'))
+
+    def test_entries_are_shared_between_processes(self):
+        """Запись из другого процесса сразу видна в этом."""
+        self.cache.set('generation', 1)
+        context = multiprocessing.get_context('fork')
+        process = context.Process(
+            target=lambda: self.create_cache().set('generation', 2)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.cache.get('generation'), 2)
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command(
+            'seed', stdout=StringIO(), users=20, groups=2, posts=60,
+            comments=40, follows=4, images=1,
+        )
+
+    def test_every_view_is_measured(self):
+        results = benchmarks.run(iterations=2, warmup=0)
+        expected = {name for name, _ in benchmarks.url_patterns()}
+        self.assertTrue(expected <= set(results))
+        self.assertIn('posts:post_create POST', results)
+        for label, row in results.items():
+            with self.subTest(label=label):
+                self.assertLess(row['status'], 400)
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+                self.assertGreater(row['queries'], 0)
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmarks.percentile(values, 50), 50)
+        self.assertEqual(benchmarks.percentile(values, 99), 99)
+        self.assertEqual(benchmarks.percentile([7], 95), 7)
+
+    def test_regression_fails_command(self):
+        """Рост задержки или числа запросов сверх базы — ошибка."""
+        row = {'p50_ms': 10, 'queries': 3}
+        self.assertEqual(benchmarks.compare(
+            {'view': {'p50_ms': 11.9, 'queries': 3}}, {'view': row}
+        ), [])
+        self.assertEqual(len(benchmarks.compare(
+            {'view': {'p50_ms': 13, 'queries': 4}}, {'view': row}
+        )), 2)
+        self.assertEqual(benchmarks.compare(
+            {'view': {'p50_ms': 50, 'queries': 3}}, {'view': row},
+            metric=None,
+        ), [])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            options = {
+                'use_existing': True, 'iterations': 1, 'warmup': 0,
+                'only': ['about:'], 'stdout': StringIO(),
+            }
+            call_command('benchmark_views', save_baseline=path, **options)
+            baseline = benchmarks.load_baseline(path)
+            baseline['about:tech']['queries'] = 0
+            benchmarks.save_baseline(path, baseline)
+            with self.assertRaisesRegex(CommandError, 'about:tech'):
+                call_command('benchmark_views', baseline=path,
+                             queries_only=True, **options)
+
+    def test_middleware_overhead_mode(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(metrics.registry.take)
+        out = StringIO()
+        with override_settings(
+            METRICS_ENABLED=True,
+            METRICS_LOCATION=os.path.join(directory.name, 'metrics.sqlite3'),
+        ):
+            call_command(
+                'benchmark_views', use_existing=True, iterations=1,
+                warmup=0, only=['about:'], stdout=out, max_overhead=100,
+                middleware_overhead='core.middleware.MetricsMiddleware',
+            )
+        self.assertIn('about:tech', out.getvalue())
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(METRICS_LOCATION=os.path.join(
+            directory.name, 'metrics.sqlite3'
+        ))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics.registry.take()
+        # несброшенное не должно уйти при выходе в настоящий файл
+        self.addCleanup(metrics.registry.take)
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def scrape(self):
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return dict(
+            line.rsplit(' ', 1)
+            for line in response.content.decode().splitlines()
+            if not line.startswith('#')
+        )
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(
+            self.client.get('/metrics/').status_code, HTTPStatus.FORBIDDEN
+        )
+        self.client.force_login(User.objects.create_user('reader'))
+        self.assertEqual(
+            self.client.get('/metrics/').status_code, HTTPStatus.FORBIDDEN
+        )
+
+    def test_request_metrics(self):
+        self.client.get('/')
+        self.client.get('/')
+        self.client.get('/nonexist-page/')
+        scraped = self.scrape()
+        view = 'view="posts:index"'
+        self.assertEqual(scraped[
+            f'yatube_http_requests_total{{method="GET",status="200",{view}}}'
+        ], '2.0')
+        self.assertEqual(scraped[
+            'yatube_http_requests_total'
+            '{method="GET",status="404",view="unresolved"}'
+        ], '1.0')
+        self.assertEqual(scraped[
+            f'yatube_db_queries_per_request_count{{{view}}}'
+        ], '2.0')
+        self.assertGreater(
+            float(scraped[f'yatube_db_queries_per_request_sum{{{view}}}']),
+            0,
+        )
+        self.assertEqual(scraped[
+            'yatube_http_request_duration_seconds_bucket'
+            f'{{method="GET",{view},le="+Inf"}}'
+        ], '2.0')
+        self.assertGreater(float(scraped[
+            f'yatube_template_render_seconds_sum{{{view}}}'
+        ]), 0)
+        self.assertEqual(scraped[
+            'yatube_cache_requests_total'
+            '{area="template.cache.index_page",result="hit"}'
+        ], '1.0')
+
+    def test_cache_area(self):
+        self.assertEqual(metrics.cache_area('feed:index:1'), 'feed')
+        self.assertEqual(
+            metrics.cache_area('template.cache.index_page.d41d8'),
+            'template.cache.index_page',
+        )
+        self.assertEqual(metrics.cache_area('ratelimit-1.2.3.4'), 'other')
+
+    def test_workers_share_totals(self):
+        """Приращения другого процесса складываются с приращениями этого."""
+        stats = metrics.RequestStats()
+
+        def child():
+            metrics.record_request('about:tech', 'GET', 200, 0.01, 10, stats)
+            metrics.registry.flush()
+
+        context = multiprocessing.get_context('fork')
+        process = context.Process(target=child)
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        metrics.record_request('about:tech', 'GET', 200, 0.2, 10, stats)
+        scraped = self.scrape()
+        prefix = 'yatube_http_request_duration_seconds_bucket{method="GET",'
+        self.assertEqual(
+            scraped[prefix + 'view="about:tech",le="0.01"}'], '1.0'
+        )
+        self.assertEqual(
+            scraped[prefix + 'view="about:tech",le="+Inf"}'], '2.0'
+        )
+
+
+@override_settings(QUERYSTATS_ENABLED=True)
+class QueryStatsTests(TestCase):
+    def setUp(self):
+        querystats.aggregator.take()
+        self.user = User.objects.create_user('reader')
+        self.client.force_login(self.user)
+
+    def test_fingerprint_ignores_literals(self):
+        first = querystats.fingerprint(
+            "SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s) LIMIT 10"
+        )
+        second = querystats.fingerprint(
+            "SELECT *  FROM t WHERE a = 'it''s'\n AND b IN (%s) LIMIT 20"
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(
+            first[1], 'SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?'
+        )
+        self.assertEqual(
+            querystats.normalize('INSERT INTO t (a, b) VALUES (%s, %s), '
+                                 '(%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (...)',
+        )
+
+    def test_aggregates_per_view_across_flushes(self):
+        self.client.get('/')
+        querystats.aggregator.flush()
+        self.client.get('/')
+        self.client.get('/about/tech/')
+        querystats.aggregator.flush()
+        views = set(QueryFingerprint.objects.values_list('view', flat=True))
+        self.assertIn('posts:index', views)
+        self.assertIn('about:tech', views)
+        posts = QueryFingerprint.objects.get(
+            view='posts:index', sql__startswith='SELECT "posts_post"'
+        )
+        self.assertEqual(posts.count, 2)
+        self.assertGreaterEqual(posts.total_time, posts.max_time)
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_flush_is_one_upsert(self):
+        """Сводка любого числа отпечатков пишется одним запросом."""
+        for view in ('posts:index', 'about:tech', 'about:author'):
+            queries = querystats.RequestQueries()
+            queries.record('SELECT a FROM t', (), False, 0.01)
+            queries.record('SELECT b FROM t', (), False, 0.03)
+            querystats.aggregator.add(view, queries)
+        # SAVEPOINT, INSERT ... ON CONFLICT и RELEASE SAVEPOINT
+        with self.assertNumQueries(3):
+            querystats.aggregator.flush()
+        queries = querystats.RequestQueries()
+        queries.record('SELECT b FROM t', (), False, 0.05)
+        querystats.aggregator.add('about:tech', queries)
+        querystats.aggregator.flush()
+        self.assertEqual(QueryFingerprint.objects.count(), 6)
+        entry = QueryFingerprint.objects.get(
+            view='about:tech', sql='SELECT b FROM t'
+        )
+        self.assertEqual(entry.count, 2)
+        self.assertAlmostEqual(entry.total_time, 0.08)
+        self.assertEqual(entry.max_time, 0.05)
+
+    @override_settings(QUERYSTATS_SLOW_THRESHOLD=0)
+    def test_plans_are_taken_after_response(self):
+        with mock.patch.object(
+            querystats, 'explain', return_value='SCAN'
+        ) as explain:
+            self.client.get('/')
+            explain.assert_not_called()
+            querystats.aggregator.flush()
+        self.assertTrue(explain.called)
+        self.assertEqual(
+            set(SlowQuery.objects.values_list('plan', flat=True)), {'SCAN'}
+        )
+
+    def test_flush_runs_when_request_finishes(self):
+        with mock.patch.object(
+            querystats.aggregator, 'flush_if_due', return_value=False
+        ) as flush_if_due:
+            self.client.get('/about/tech/')
+        flush_if_due.assert_called_once_with()
+
+    @override_settings(QUERYSTATS_SLOW_THRESHOLD=0)
+    def test_slow_queries_keep_plan_and_caller(self):
+        self.client.get('/')
+        self.client.get('/')
+        querystats.aggregator.flush()
+        slow = SlowQuery.objects.filter(
+            view='posts:index', sql__startswith='SELECT "posts_post"'
+        )
+        self.assertEqual(slow.count(), 1)
+        query = slow.get()
+        self.assertRegex(query.plan, 'SCAN|SEARCH')
+        self.assertIn('posts/views.py', query.stack)
+
+    @override_settings(QUERYSTATS_SLOW_THRESHOLD=0, QUERYSTATS_KEEP_SLOW=3)
+    def test_old_slow_queries_are_pruned(self):
+        self.client.get('/')
+        querystats.aggregator.flush()
+        self.assertEqual(SlowQuery.objects.count(), 3)
+
+    def test_command(self):
+        self.client.get('/')
+        querystats.aggregator.flush()
+        out = StringIO()
+        call_command('querystats', view='posts:index', stdout=out)
+        self.assertIn('posts_post', out.getvalue())
+        call_command('querystats', order='avg', stdout=StringIO())
+        call_command('querystats', reset=True, stdout=StringIO())
+        self.assertFalse(QueryFingerprint.objects.exists())
+
+
+class ProfileTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(self.staff)
+
+    def test_staff_profiles_request(self):
+        response = self.client.get('/?_profile=1')
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.pk))
+        self.assertEqual(profile.view, 'posts:index')
+        self.assertEqual(profile.status, HTTPStatus.OK)
+        self.assertEqual(profile.user, self.staff)
+        self.assertGreater(profile.queries, 0)
+        self.assertGreaterEqual(profile.duration, profile.query_time)
+        self.client.get('/about/tech/', HTTP_X_PROFILE='1')
+        self.client.get('/auth/logout/?_profile=1')
+        self.assertEqual(RequestProfile.objects.count(), 3)
+
+    def test_profile_is_saved_unobserved(self):
+        """Запись профиля не попадает ни в метрики, ни в сводку."""
+        stats = metrics.RequestStats()
+        queries = querystats.RequestQueries()
+        with connection.execute_wrapper(queries):
+            with connection.execute_wrapper(stats.record_query):
+                self.client.get('/?_profile=1')
+        self.assertTrue(RequestProfile.objects.exists())
+        recorded = queries.fingerprints.values()
+        self.assertFalse(
+            [sql for sql, *_ in recorded if 'core_requestprofile' in sql]
+        )
+        self.assertEqual(
+            stats.queries, sum(count for _, count, *_ in recorded)
+        )
+
+    def test_others_are_not_profiled(self):
+        self.client.force_login(User.objects.create_user('reader'))
+        response = self.client.get('/?_profile=1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.client.logout()
+        self.client.get('/?_profile=1')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILE_KEEP=2)
+    def test_keeps_latest_profiles(self):
+        for _ in range(3):
+            self.client.get('/about/tech/?_profile=1')
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+    def test_admin_shows_top_functions(self):
+        pk = self.client.get('/?_profile=1')['X-Profile-Id']
+        response = self.client.get(f'/admin/core/requestprofile/{pk}/change/')
+        self.assertContains(response, 'cumulative')
+        self.assertContains(response, 'posts/views.py')
+        response = self.client.get(
+            f'/admin/core/requestprofile/{pk}/download/'
+        )
+        stats = profiling.load_stats(response.content, StringIO())
+        self.assertTrue(any(
+            function.endswith('index') for _, _, function in stats.stats
+        ))
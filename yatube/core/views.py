@@ -1,7 +1,11 @@
 from http import HTTPStatus
 
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import metrics as request_metrics
+
 
 def page_not_found(request, exception):
     return render(
@@ -20,3 +24,13 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики всех воркеров хоста для Prometheus, только персоналу."""
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(
+        request_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,35 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'task',
+        'status',
+        'priority',
+        'attempts',
+        'max_attempts',
+        'run_at',
+        'finished',
+    )
+    list_filter = ('status', 'task')
+    search_fields = ('task',)
+    readonly_fields = ('created', 'finished', 'locked_by', 'locked_until')
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        retried = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED,
+            attempts=0,
+            run_at=timezone.now(),
+            finished=None,
+            last_error='',
+        )
+        self.message_user(request, f'Поставлено в очередь задач: {retried}')
+    retry.short_description = 'Выполнить заново'
+
+
+admin.site.register(Job, JobAdmin)
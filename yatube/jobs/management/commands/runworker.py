@@ -0,0 +1,45 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает воркер фоновых задач: берёт задачи из очереди в '
+        'порядке приоритета и выполняет их в пуле потоков или процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JOBS_WORKERS,
+            help='Сколько задач выполнять одновременно.',
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Пул процессов вместо потоков, для задач на CPU.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда в очереди не останется готовых задач.',
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            options['concurrency'],
+            processes=options['processes'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+        )
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(f'Воркер {worker.name} запущен.')
+        processed = worker.run()
+        self.stdout.write(f'Выполнено задач: {processed}')
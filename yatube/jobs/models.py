@@ -0,0 +1,82 @@
+from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+class JobQuerySet(models.QuerySet):
+    def claimable(self, now=None):
+        """Задачи, которые воркер может взять прямо сейчас.
+
+        Это задачи в очереди, чьё время пришло, и задачи, взятые
+        воркером, который не уложился в таймаут видимости: скорее всего,
+        он упал, и задачу нужно выполнить ещё раз.
+        """
+        now = now or timezone.now()
+        return self.filter(
+            Q(status=Job.QUEUED, run_at__lte=now)
+            | Q(status=Job.RUNNING, locked_until__lt=now),
+            attempts__lt=F('max_attempts'),
+        ).order_by('-priority', 'run_at', 'pk')
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    task = models.CharField(
+        'Задача',
+        max_length=200,
+        help_text='Путь к функции уровня модуля'
+    )
+    payload = models.TextField(
+        'Аргументы',
+        default='{"args":[],"kwargs":{}}',
+        help_text='JSON с позиционными и именованными аргументами'
+    )
+    priority = models.SmallIntegerField(
+        'Приоритет',
+        default=0,
+        help_text='Задачи с большим приоритетом берутся раньше'
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Предел попыток')
+    run_at = models.DateTimeField('Выполнить после', default=timezone.now)
+    locked_until = models.DateTimeField(
+        'Занята до',
+        null=True,
+        blank=True
+    )
+    locked_by = models.CharField('Воркер', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-priority', 'run_at', 'pk')
+        indexes = [
+            models.Index(
+                fields=['status', '-priority', 'run_at'],
+                name='jobs_job_ready_idx'
+            ),
+        ]
+        verbose_name = 'job'
+        verbose_name_plural = 'jobs'
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
@@ -0,0 +1,185 @@
+import json
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+EAGER_WORKER = 'eager'
+
+# Сколько раз записывается исход задачи, если база занята.
+RECORD_ATTEMPTS = 5
+RECORD_RETRY_DELAY = 0.05
+
+
+def task_name(task):
+    """Путь к задаче: строка остаётся как есть, у функции берётся её имя."""
+    if isinstance(task, str):
+        return task
+    return f'{task.__module__}.{task.__qualname__}'
+
+
+def enqueue(task, args=(), kwargs=None, priority=0, delay=0,
+            max_attempts=None):
+    """Ставит задачу в очередь и возвращает созданную Job.
+
+    Задача — функция уровня модуля или путь к ней, аргументы должны
+    сериализоваться в JSON. Запись создаётся в текущей транзакции:
+    если транзакция откатится, задачи тоже не будет, а после коммита
+    она переживёт перезапуск любого процесса.
+
+    При ``JOBS_EAGER`` задача выполняется в этом же процессе сразу
+    после коммита — удобно для разработки без запущенного воркера.
+    """
+    job = Job.objects.create(
+        task=task_name(task),
+        payload=json.dumps(
+            {'args': list(args), 'kwargs': kwargs or {}},
+            separators=(',', ':'),
+        ),
+        priority=priority,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: run_claimed(claim_job(job.pk)))
+    return job
+
+
+def claim_job(pk, worker=EAGER_WORKER, now=None):
+    """Забирает задачу воркеру условным UPDATE; None, если не вышло.
+
+    UPDATE атомарен, поэтому из нескольких воркеров, выбравших одну
+    и ту же задачу, её получит ровно один.
+    """
+    now = now or timezone.now()
+    claimed = Job.objects.claimable(now).filter(pk=pk).update(
+        status=Job.RUNNING,
+        locked_by=worker,
+        locked_until=now + timedelta(
+            seconds=settings.JOBS_VISIBILITY_TIMEOUT
+        ),
+        attempts=F('attempts') + 1,
+    )
+    return Job.objects.get(pk=pk) if claimed else None
+
+
+def claim(worker, limit):
+    """Забирает до ``limit`` готовых задач в порядке приоритета."""
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    expire_abandoned(now)
+    candidates = Job.objects.claimable(now).values_list('pk', flat=True)
+    jobs = []
+    for pk in candidates[:limit * 2]:
+        job = claim_job(pk, worker, now)
+        if job is not None:
+            jobs.append(job)
+            if len(jobs) == limit:
+                break
+    return jobs
+
+
+def expire_abandoned(now=None):
+    """Помечает невыполненными брошенные задачи без оставшихся попыток."""
+    now = now or timezone.now()
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Job.FAILED,
+        finished=now,
+        locked_until=None,
+        last_error='Воркер не уложился в таймаут видимости.',
+    )
+
+
+def retry_delay(attempt):
+    """Экспоненциальная пауза перед повтором со случайным разбросом.
+
+    Разброс не даёт задачам, упавшим разом, разом же и вернуться.
+    """
+    delay = min(
+        settings.JOBS_RETRY_BACKOFF * 2 ** (attempt - 1),
+        settings.JOBS_RETRY_BACKOFF_MAX,
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def run_claimed(job):
+    """Выполняет взятую задачу и записывает исход; True при успехе."""
+    if job is None:
+        return False
+    try:
+        payload = json.loads(job.payload)
+        import_string(job.task)(*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s упала', job)
+        _fail(job, traceback.format_exc())
+        return False
+    _record(job, status=Job.DONE, finished=timezone.now(), locked_until=None)
+    return True
+
+
+def _record(job, **fields):
+    """Записывает исход попытки, повторяя запись, пока база занята.
+
+    Потерянный исход оставил бы задачу взятой до таймаута видимости,
+    и её выполнили бы второй раз. Если база так и не освободилась,
+    ошибка поднимается дальше и попадает в лог воркера.
+    """
+    for attempt in range(1, RECORD_ATTEMPTS + 1):
+        try:
+            return _owned(job).update(**fields)
+        except OperationalError:
+            if attempt == RECORD_ATTEMPTS:
+                raise
+            time.sleep(RECORD_RETRY_DELAY * attempt)
+
+
+def _owned(job):
+    """Задача, пока она всё ещё за этой попыткой.
+
+    Если воркер не уложился в таймаут и задачу взял другой, исход
+    устаревшей попытки не должен перезаписать новую.
+    """
+    return Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, attempts=job.attempts
+    )
+
+
+def _fail(job, error):
+    now = timezone.now()
+    if job.attempts >= job.max_attempts:
+        _record(
+            job, status=Job.FAILED, finished=now, locked_until=None,
+            last_error=error,
+        )
+        return
+    _record(
+        job,
+        status=Job.QUEUED,
+        run_at=now + retry_delay(job.attempts),
+        locked_until=None,
+        last_error=error,
+    )
+
+
+def prune(older_than):
+    """Удаляет выполненные задачи, завершённые раньше ``older_than``."""
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE, finished__lt=older_than
+    ).delete()
+    return deleted
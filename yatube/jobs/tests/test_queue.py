@@ -0,0 +1,185 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+
+User = get_user_model()
+
+CALLS = []
+
+
+def record(*args, **kwargs):
+    CALLS.append((args, kwargs))
+
+
+def explode():
+    raise RuntimeError('сбой')
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_stores_task_and_arguments(self):
+        """Функция сохраняется путём, аргументы — компактным JSON."""
+        job = queue.enqueue(record, args=(1, 'a'), kwargs={'b': None})
+        self.assertEqual(job.task, 'jobs.tests.test_queue.record')
+        self.assertEqual(job.payload, '{"args":[1,"a"],"kwargs":{"b":null}}')
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertTrue(queue.run_claimed(queue.claim_job(job.pk, 'w')))
+        self.assertEqual(CALLS, [((1, 'a'), {'b': None})])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNotNone(job.finished)
+
+    def test_claim_order_and_limit(self):
+        """Сначала высокий приоритет, отложенные задачи не берутся."""
+        low = queue.enqueue(record)
+        high = queue.enqueue(record, priority=5)
+        queue.enqueue(record, priority=9, delay=60)
+        self.assertEqual(queue.claim('w', 1), [high])
+        self.assertEqual(queue.claim('w', 5), [low])
+        self.assertEqual(queue.claim('w', 5), [])
+
+    def test_job_is_claimed_once(self):
+        """Задачу, взятую одним воркером, второй не получит."""
+        job = queue.enqueue(record)
+        self.assertIsNotNone(queue.claim_job(job.pk, 'first'))
+        self.assertIsNone(queue.claim_job(job.pk, 'second'))
+
+    @override_settings(JOBS_RETRY_BACKOFF=10)
+    def test_failed_job_is_retried_with_backoff(self):
+        """Упавшая задача возвращается в очередь с растущей паузой."""
+        job = queue.enqueue(explode, max_attempts=2)
+        started = timezone.now()
+        self.assertFalse(queue.run_claimed(queue.claim_job(job.pk, 'w')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('RuntimeError: сбой', job.last_error)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=5))
+        self.assertEqual(queue.claim('w', 1), [])
+        job = queue.claim_job(job.pk, 'w', now=job.run_at)
+        queue.run_claimed(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_retry_delay_grows_and_is_capped(self):
+        with self.settings(JOBS_RETRY_BACKOFF=10, JOBS_RETRY_BACKOFF_MAX=60):
+            self.assertLessEqual(queue.retry_delay(1).total_seconds(), 10)
+            self.assertGreaterEqual(queue.retry_delay(3).total_seconds(), 20)
+            self.assertLessEqual(queue.retry_delay(10).total_seconds(), 60)
+
+    def test_visibility_timeout(self):
+        """Задача зависшего воркера достаётся другому, а исход старой
+        попытки новую не перезаписывает."""
+        job = queue.enqueue(record, max_attempts=2)
+        stale = queue.claim_job(job.pk, 'stuck')
+        later = stale.locked_until + timedelta(seconds=1)
+        fresh = queue.claim_job(job.pk, 'other', now=later)
+        self.assertEqual(fresh.attempts, 2)
+        queue.run_claimed(stale)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        queue.run_claimed(fresh)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_abandoned_job_without_attempts_fails(self):
+        job = queue.enqueue(record, max_attempts=1)
+        job = queue.claim_job(job.pk, 'stuck')
+        later = job.locked_until + timedelta(seconds=1)
+        self.assertEqual(queue.expire_abandoned(later), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_prune_keeps_recent_and_pending(self):
+        done = queue.enqueue(record)
+        queue.run_claimed(queue.claim_job(done.pk))
+        pending = queue.enqueue(record)
+        self.assertEqual(queue.prune(timezone.now() - timedelta(hours=1)), 0)
+        self.assertEqual(queue.prune(timezone.now() + timedelta(hours=1)), 1)
+        self.assertEqual(list(Job.objects.all()), [pending])
+
+
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_runworker_burst(self):
+        """Воркер выполняет все готовые задачи и выходит."""
+        for number in range(5):
+            queue.enqueue(record, args=(number,))
+        queue.enqueue(explode, max_attempts=1)
+        out = StringIO()
+        call_command('runworker', concurrency=2, burst=True,
+                     poll_interval=0.01, stdout=out)
+        self.assertIn('Выполнено задач: 6', out.getvalue())
+        self.assertEqual(
+            sorted(args[0] for args, _ in CALLS), [0, 1, 2, 3, 4]
+        )
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 5)
+        self.assertEqual(Job.objects.filter(status=Job.FAILED).count(), 1)
+
+    def test_busy_database_does_not_lose_outcome(self):
+        """Исход задачи записывается повторно, пока база занята."""
+        job = queue.enqueue(record, args=(1,))
+        owned = queue._owned
+        failures = [OperationalError('database is locked')] * 2
+
+        def busy(job):
+            if failures:
+                raise failures.pop()
+            return owned(job)
+
+        with mock.patch('jobs.queue._owned', side_effect=busy), \
+                mock.patch('jobs.queue.time.sleep'):
+            call_command('runworker', concurrency=2, burst=True,
+                         poll_interval=0.01, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(CALLS, [((1,), {})])
+
+    def test_unrecorded_outcome_is_logged(self):
+        """Ошибка записи исхода не теряется в пуле, а попадает в лог."""
+        queue.enqueue(record, args=(1,))
+        with mock.patch(
+            'jobs.queue._owned',
+            side_effect=OperationalError('database is locked'),
+        ), mock.patch('jobs.queue.time.sleep'), \
+                self.assertLogs('jobs.worker', 'ERROR') as logs:
+            call_command('runworker', concurrency=2, burst=True,
+                         poll_interval=0.01, stdout=StringIO())
+        self.assertIn('database is locked', logs.output[0])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_runs_after_commit(self):
+        job = queue.enqueue(record, args=('now',))
+        self.assertEqual(CALLS, [(('now',), {})])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_password_reset_email_is_queued(self):
+        """Письмо сброса пароля уходит из воркера, а не из запроса."""
+        User.objects.create_user(
+            username='user', email='user@example.com', password='pass'
+        )
+        self.client.post(
+            reverse('users:password_reset_form'),
+            {'email': 'user@example.com'},
+        )
+        self.assertEqual(mail.outbox, [])
+        job = Job.objects.get()
+        self.assertEqual(job.task, 'django.core.mail.send_mail')
+        call_command('runworker', burst=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
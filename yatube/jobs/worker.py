@@ -0,0 +1,111 @@
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from . import queue
+
+logger = logging.getLogger(__name__)
+
+
+def execute(job):
+    """Выполняет задачу в потоке или процессе пула."""
+    try:
+        return queue.run_claimed(job)
+    finally:
+        close_old_connections()
+
+
+class Worker:
+    """Забирает задачи из очереди и выполняет их в пуле.
+
+    Основной цикл берёт ровно столько задач, сколько в пуле свободных
+    мест, так что задачи не простаивают взятыми, пока воркер занят:
+    остальные воркеры могут забрать их себе. Задачи в процессах
+    нужны для тяжёлой работы на CPU, в потоках — для ввода-вывода.
+    """
+
+    def __init__(self, concurrency, processes=False, poll_interval=1,
+                 burst=False):
+        self.concurrency = concurrency
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        self.processed = 0
+        self.pruned_at = 0
+
+    def stop(self, *args):
+        """Дорабатывает начатые задачи и выходит; годится для сигналов."""
+        self.stopping = True
+
+    def create_pool(self):
+        if not self.processes:
+            return ThreadPoolExecutor(
+                self.concurrency, thread_name_prefix='jobs'
+            )
+        # Дочерние процессы не должны делить соединение с родителем.
+        connections.close_all()
+        return ProcessPoolExecutor(
+            self.concurrency, mp_context=multiprocessing.get_context('fork')
+        )
+
+    def run(self):
+        running = set()
+        with self.create_pool() as pool:
+            while not self.stopping:
+                jobs = queue.claim(
+                    self.name, self.concurrency - len(running)
+                )
+                running.update(pool.submit(execute, job) for job in jobs)
+                if not running and self.burst:
+                    break
+                if jobs:
+                    continue
+                self.prune()
+                running = self.wait(running)
+            self.collect(wait(running).done)
+        return self.processed
+
+    def wait(self, running):
+        """Ждёт освобождения места в пуле или новых задач в очереди."""
+        if not running:
+            time.sleep(self.poll_interval)
+            return running
+        done, running = wait(
+            running, timeout=self.poll_interval, return_when=FIRST_COMPLETED
+        )
+        self.collect(done)
+        return running
+
+    def collect(self, done):
+        """Учитывает завершённые задачи и логирует ошибки их пула.
+
+        Ошибки самих задач ``run_claimed`` записывает в задачу; сюда
+        доходит только то, что помешало записать исход.
+        """
+        for future in done:
+            error = future.exception()
+            if error is not None:
+                logger.error('Исход задачи не записан', exc_info=error)
+        self.processed += len(done)
+
+    def prune(self):
+        """Не чаще раза в минуту удаляет старые выполненные задачи."""
+        if time.monotonic() - self.pruned_at < 60:
+            return
+        self.pruned_at = time.monotonic()
+        deleted = queue.prune(
+            timezone.now() - timedelta(seconds=settings.JOBS_KEEP_DONE)
+        )
+        if deleted:
+            logger.info('Удалено выполненных задач: %s', deleted)
@@ -1,9 +1,12 @@
 from django.contrib import admin
 
+from . import search
+from .forms import PostImageForm
 from .models import Group, Post
 
 
 class PostAdmin(admin.ModelAdmin):
+    form = PostImageForm
     list_display = (
         'pk',
         'text',
@@ -16,6 +19,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_supported():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return search.filter_matching(queryset, search_term), False
+
 
 admin.site.register(Post, PostAdmin)
 
@@ -0,0 +1,67 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'posts/includes/post_content.html'
+
+# Меняется вместе с разметкой карточки, чтобы не отдавать старый HTML.
+CARD_TEMPLATE_VERSION = 3
+
+
+def card_version(post):
+    """Версия карточки — хэш всех полей, которые попадают в разметку.
+
+    Правка поста, смена или переименование группы, смена имени автора
+    и новый комментарий дают новую версию, поэтому инвалидировать кэш
+    при записи не нужно: устаревшая карточка просто перестаёт читаться.
+    """
+    author = post.author
+    group = post.group
+    parts = (
+        CARD_TEMPLATE_VERSION,
+        post.text,
+        post.pub_date.isoformat(),
+        post.image.name or '',
+        post.image_placeholder,
+        post.image_variants,
+        post.comments_count,
+        author.username,
+        author.first_name,
+        author.last_name,
+        group.slug if group else '',
+        group.title if group else '',
+    )
+    raw = '\x1f'.join(str(part) for part in parts).encode()
+    return hashlib.md5(raw).hexdigest()[:12]
+
+
+def card_key(post):
+    return f'post_card:{post.pk}:{card_version(post)}'
+
+
+def render_card(post):
+    return render_to_string(CARD_TEMPLATE, {'post': post})
+
+
+def render_cards(posts):
+    """Возвращает пары (пост, HTML карточки) для страницы ленты.
+
+    Карточки всей страницы читаются одним ``get_many``, заново
+    рендерятся и записываются одним ``set_many`` только промахи.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cached = cache.get_many(keys)
+    missed = {}
+    cards = []
+    for post, key in zip(posts, keys):
+        html = cached.get(key)
+        if html is None:
+            html = missed[key] = render_card(post)
+        cards.append((post, mark_safe(html)))
+    if missed:
+        cache.set_many(missed, settings.POST_CARD_TIMEOUT)
+    return cards
@@ -0,0 +1,73 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _count(queryset, field, outer):
+    """Подзапрос с числом строк выборки на каждый внешний id."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(outer)}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def user_counts(outer='pk'):
+    """Выражения для счётчиков пользователя с id в поле ``outer``."""
+    return {
+        'posts_count': _count(Post.objects, 'author', outer),
+        'followers_count': _count(Follow.objects, 'author', outer),
+        'following_count': _count(Follow.objects, 'user', outer),
+    }
+
+
+def comment_counts(outer='pk'):
+    """Выражение для числа комментариев поста с id в поле ``outer``."""
+    return {'comments_count': _count(Comment.objects, 'post', outer)}
+
+
+def recount_user(user_id):
+    """Пересчитывает счётчики пользователя по таблицам."""
+    counts = User.objects.filter(pk=user_id).values(**user_counts()).get()
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id, defaults=counts
+    )
+    return stats
+
+
+def get_user_stats(user):
+    """Счётчики пользователя; недостающая строка создаётся пересчётом."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def increment_user(user_id, field):
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + 1}
+    )
+    if not updated:
+        recount_user(user_id)
+
+
+def decrement_user(user_id, field):
+    UserStats.objects.filter(
+        user_id=user_id, **{f'{field}__gt': 0}
+    ).update(**{field: F(field) - 1})
+
+
+def increment_comments(post_id):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + 1
+    )
+
+
+def decrement_comments(post_id):
+    Post.objects.filter(pk=post_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1
+    )
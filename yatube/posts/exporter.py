@@ -0,0 +1,158 @@
+import csv
+import json
+import os
+
+from .importer import RECORD_TYPES, open_text
+from .models import Comment, Follow, Group, Post, User
+
+# Поля выгрузки и соответствующие им колонки запроса; первая колонка —
+# первичный ключ, по нему идут пачки. Формат совпадает с тем, что
+# читает import_yatube.
+EXPORTS = {
+    'user': (
+        User.objects,
+        ('id', 'username', 'first_name', 'last_name', 'email'),
+        ('pk', 'username', 'first_name', 'last_name', 'email'),
+    ),
+    'group': (
+        Group.objects,
+        ('id', 'slug', 'title', 'description'),
+        ('pk', 'slug', 'title', 'description'),
+    ),
+    'post': (
+        Post.objects,
+        ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+        ('pk', 'author__username', 'group__slug', 'text', 'pub_date',
+         'image'),
+    ),
+    'comment': (
+        Comment.objects,
+        ('id', 'post', 'author', 'text', 'created'),
+        ('pk', 'post_id', 'author__username', 'text', 'created'),
+    ),
+    'follow': (
+        Follow.objects,
+        ('id', 'user', 'author'),
+        ('pk', 'user__username', 'author__username'),
+    ),
+}
+
+# Поле даты, по которому работает инкрементальная выгрузка.
+WATERMARK_FIELDS = {'post': 'pub_date', 'comment': 'created'}
+
+
+def keyset_rows(queryset, columns, batch_size):
+    """Строки в порядке первичного ключа пачками ``pk > последний``.
+
+    В отличие от OFFSET каждая пачка — короткий запрос по индексу, а
+    в памяти лежит не больше одной пачки на любом бэкенде.
+    """
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch.values_list(*columns)[:batch_size])
+        if not batch:
+            return
+        yield from batch
+        last_pk = batch[-1][0]
+
+
+def _serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class ShardWriter:
+    """Пишет записи в файлы ``<тип>[-NNNNN].<формат>[.gz]``.
+
+    С ``shard_size`` новый файл начинается, когда в текущий записано
+    столько байт несжатых данных; у CSV в каждом файле свой заголовок.
+    """
+
+    def __init__(self, directory, record_type, fields, output_format='jsonl',
+                 compress=False, shard_size=None):
+        self.directory = directory
+        self.record_type = record_type
+        self.fields = fields
+        self.output_format = output_format
+        self.compress = compress
+        self.shard_size = shard_size
+        self.paths = []
+        self.stream = None
+        self.written = 0
+
+    def path(self):
+        suffix = f'-{len(self.paths) + 1:05d}' if self.shard_size else ''
+        extension = '.gz' if self.compress else ''
+        return os.path.join(
+            self.directory,
+            f'{self.record_type}{suffix}.{self.output_format}{extension}',
+        )
+
+    def write(self, text):
+        self.stream.write(text)
+        self.written += len(text.encode())
+
+    def open(self):
+        self.close()
+        self.paths.append(self.path())
+        self.stream = open_text(self.paths[-1], 'wt')
+        self.written = 0
+        if self.output_format == 'csv':
+            self.csv = csv.writer(self)
+            self.csv.writerow(self.fields)
+
+    def write_record(self, values):
+        full = self.shard_size and self.written >= self.shard_size
+        if self.stream is None or full:
+            self.open()
+        values = [_serialize(value) for value in values]
+        if self.output_format == 'csv':
+            self.csv.writerow(values)
+            return
+        record = dict(zip(self.fields, values), type=self.record_type)
+        self.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+def export_type(record_type, directory, since=None, batch_size=2000,
+                **writer_options):
+    """Выгружает записи одного типа; возвращает (число, файлы, новая метка).
+
+    ``since`` оставляет посты и комментарии не старше метки; новая
+    метка — самая поздняя выгруженная дата. Граница включается, так что
+    строки с той же датой, что и метка, попадут в обе выгрузки.
+    """
+    queryset, fields, columns = EXPORTS[record_type]
+    date_field = WATERMARK_FIELDS.get(record_type)
+    if since is not None and date_field:
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    date_index = columns.index(date_field) if date_field else None
+    writer = ShardWriter(directory, record_type, fields, **writer_options)
+    exported = 0
+    watermark = since
+    try:
+        for row in keyset_rows(queryset, columns, batch_size):
+            writer.write_record(row)
+            exported += 1
+            if date_index is not None and (
+                watermark is None or row[date_index] > watermark
+            ):
+                watermark = row[date_index]
+    finally:
+        writer.close()
+    return exported, writer.paths, watermark
+
+
+def ordered_types(types):
+    """Типы в порядке, в котором их потом загрузит import_yatube."""
+    return [
+        record_type for record_type in RECORD_TYPES if record_type in types
+    ]
@@ -0,0 +1,112 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Follow
+from .timeline import pull_authors
+
+# Общая область всех лент: меняется при переименовании группы или
+# автора, которые видны в карточках любой ленты.
+ALL_FEEDS = 'all'
+# Посты популярных авторов подмешиваются в ленты подписок при чтении,
+# поэтому их появление сбрасывает все такие ленты разом.
+PULL_FEEDS = 'follow:pull'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def _generation_key(scope):
+    return f'feed_generation:{scope}'
+
+
+def _new_generation():
+    """Новое значение генерации.
+
+    Берётся время, а не ``incr``: вытесненный из кэша счётчик не начнёт
+    заново с уже выданного значения и не оживит старые фрагменты.
+    """
+    return time.time_ns()
+
+
+def _reset(keys):
+    cache.set_many({key: _new_generation() for key in keys}, None)
+
+
+def bump(*scopes):
+    """Сбрасывает закэшированные фрагменты лент указанных областей.
+
+    Внутри транзакции генерации сбрасываются ещё раз после коммита:
+    иначе параллельный запрос успел бы закэшировать ленту без новых
+    данных под уже новой генерацией.
+    """
+    keys = [_generation_key(scope) for scope in scopes]
+    _reset(keys)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _reset(keys))
+
+
+def feed_version(*scopes):
+    """Версия ленты для ключа кэша: генерации всех её областей."""
+    keys = [_generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    missing = {
+        key: _new_generation() for key in keys if key not in generations
+    }
+    if missing:
+        cache.set_many(missing, None)
+        generations.update(missing)
+    return '.'.join(str(generations[key]) for key in keys)
+
+
+def comments_version(page_obj):
+    """Хэш числа комментариев у постов страницы.
+
+    Счётчики комментариев видны в карточках, но входят в ключ фрагмента
+    через саму страницу: комментарий не сбрасывает генерации лент всех
+    подписчиков автора, а меняет ключ только у страниц с этим постом.
+    """
+    raw = ','.join(f'{post.pk}:{post.comments_count}' for post in page_obj)
+    return hashlib.md5(raw.encode()).hexdigest()[:12]
+
+
+def feed_cache_context(page_obj, *scopes):
+    """Переменные шаблона для тега ``{% cache %}`` вокруг ленты."""
+    return {
+        'feed_version': '.'.join((
+            feed_version(ALL_FEEDS, *scopes), comments_version(page_obj)
+        )),
+        'feed_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def follow_feed_context(user, page_obj):
+    return feed_cache_context(page_obj, PULL_FEEDS, follow_scope(user.pk))
+
+
+def group_feed_context(group, page_obj):
+    return feed_cache_context(page_obj, group_scope(group.pk))
+
+
+def bump_post_feeds(author_id, group_ids):
+    """Сбрасывает ленты, в которых виден пост автора из этих групп."""
+    scopes = [group_scope(group_id) for group_id in group_ids if group_id]
+    if author_id in pull_authors():
+        scopes.append(PULL_FEEDS)
+    else:
+        scopes.extend(
+            follow_scope(user_id)
+            for user_id in Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user_id', flat=True)
+        )
+    if scopes:
+        bump(*scopes)
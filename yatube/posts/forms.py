@@ -1,9 +1,22 @@
+from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
-from .models import Comment, Post
+from .images import normalize_image
+from .models import Comment, Group, Post, User
 
 
-class PostForm(ModelForm):
+class PostImageForm(ModelForm):
+    """Нормализует новую картинку поста до сохранения в MEDIA_ROOT."""
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return normalize_image(image)
+        return image
+
+
+class PostForm(PostImageForm):
     class Meta:
         model = Post
         fields = ('group', 'text', 'image')
@@ -13,3 +26,23 @@ class CommentForm(ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Запрос', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        label='Группа',
+        to_field_name='slug',
+        required=False,
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise forms.ValidationError('Такого автора нет')
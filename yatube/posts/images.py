@@ -0,0 +1,72 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def normalize_image(upload):
+    """Приводит загруженное изображение к формату хранения.
+
+    Размер в пикселях проверяется по заголовку, до декодирования.
+    JPEG декодируется сразу в уменьшенном масштабе (``draft``), затем
+    картинка поворачивается по EXIF, вписывается в IMAGE_MAX_SIDE и
+    пересохраняется без метаданных: в JPEG с качеством IMAGE_QUALITY,
+    а с прозрачностью — в PNG. Цветовой профиль сохраняется.
+    Анимированные изображения в пределах лимитов хранятся как есть.
+    """
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise ValidationError('Слишком большое изображение.')
+    except OSError:
+        raise ValidationError('Файл не похож на изображение.')
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Изображение {width}×{height} больше '
+            f'{settings.IMAGE_MAX_PIXELS // 10 ** 6} мегапикселей.'
+        )
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return upload
+    try:
+        return _reencode(image, upload.name)
+    except OSError:
+        # Обрезанный или битый файл проходит проверку заголовка,
+        # а ошибка всплывает только при декодировании.
+        raise ValidationError('Изображение повреждено.')
+
+
+def _reencode(image, name):
+    max_side = settings.IMAGE_MAX_SIDE
+    image.draft('RGB', (max_side, max_side))
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    output = BytesIO()
+    if _has_alpha(image):
+        image.convert('RGBA').save(
+            output, 'PNG', optimize=True, icc_profile=icc_profile, exif=b''
+        )
+        extension, content_type = 'png', 'image/png'
+    else:
+        image.convert('RGB').save(
+            output, 'JPEG',
+            quality=settings.IMAGE_QUALITY,
+            optimize=True,
+            progressive=True,
+            icc_profile=icc_profile,
+        )
+        extension, content_type = 'jpg', 'image/jpeg'
+    name = f'{os.path.splitext(os.path.basename(name))[0]}.{extension}'
+    return SimpleUploadedFile(name, output.getvalue(), content_type)
@@ -0,0 +1,326 @@
+import csv
+import gzip
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import feed_cache
+from .media import recount_blobs
+from .models import Comment, Follow, Group, ImportCheckpoint, Post, User
+from .timeline import PULL_AUTHORS_KEY
+
+# Порядок, в котором пачка записывается в базу: сначала то, на что
+# ссылаются остальные записи.
+RECORD_TYPES = ('user', 'group', 'post', 'comment', 'follow')
+
+
+class RecordError(ValueError):
+    """Запись не загружается: нет поля, битая дата, неизвестная ссылка."""
+
+
+def input_format(path):
+    """Формат файла по расширению; ``.gz`` читается на лету."""
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    raise ValueError(f'Неизвестный формат файла: {path}')
+
+
+def open_text(path, mode='rt'):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8', newline='')
+    return open(path, mode[0], encoding='utf-8', newline='')
+
+
+def read_records(path, skip=0):
+    """Поток пар (номер записи, запись) без чтения файла целиком.
+
+    Первые ``skip`` записей пропускаются без разбора. Строку JSONL,
+    которая не разбирается, вместо записи заменяет RecordError.
+    """
+    with open_text(path) as stream:
+        if input_format(path) == 'csv':
+            rows = csv.DictReader(stream)
+            for number, row in enumerate(rows, 1):
+                if number > skip:
+                    yield number, {
+                        key: value for key, value in row.items() if value
+                    }
+            return
+        for number, line in enumerate(stream, 1):
+            if number <= skip or not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as error:
+                yield number, RecordError(f'битый JSON: {error}')
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise RecordError(f'не дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+@contextmanager
+def explicit_dates():
+    """Отключает auto_now_add, чтобы сохранить даты из источника."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def rebuild_derived(stdout, images=False):
+    """Пересчитывает всё, что bulk_create обходит вместе с сигналами.
+
+    Счётчики и ленты подписок пересобираются пачками. Индекс поиска
+    здесь не трогается: его пересобирает ``search.bulk_load``.
+    """
+    call_command('reconcile_counters', stdout=stdout)
+    cache.delete(PULL_AUTHORS_KEY)
+    call_command('rebuild_timelines', stdout=stdout)
+    if images:
+        recount_blobs()
+        stdout.write('Для картинок запустите generate_thumbnails --missing')
+    feed_cache.bump(feed_cache.ALL_FEEDS)
+
+
+class Importer:
+    """Загружает записи пачками через ``bulk_create``.
+
+    Пользователи и группы ищутся по словарям username → id и
+    slug → id, которые держатся в памяти; посты, комментарии и
+    подписки не запоминаются, так что память ограничена размером
+    пачки и числом пользователей и групп. Каждая пачка вместе с
+    позицией в источнике записывается одной транзакцией.
+    """
+
+    def __init__(self, chunk_size=5000, default_type=None, report=None,
+                 reject=None):
+        self.chunk_size = chunk_size
+        self.default_type = default_type
+        self.report = report or (lambda *args: None)
+        self.reject = reject or (lambda message: None)
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.created = Counter()
+        self.rejected = 0
+        self.skipped = 0
+        self.images = False
+
+    def load(self, path, source=None):
+        """Загружает файл, продолжая с сохранённой позиции источника."""
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=source or path
+        )
+        started = time.monotonic()
+        loaded = 0
+        chunk = defaultdict(list)
+        pending = 0
+        for number, record in read_records(path, checkpoint.position):
+            self.add(chunk, path, number, record)
+            pending += 1
+            if pending == self.chunk_size:
+                self.flush(chunk, checkpoint, number)
+                loaded += pending
+                self.report(path, number, loaded, started)
+                chunk, pending = defaultdict(list), 0
+        if pending:
+            self.flush(chunk, checkpoint, number)
+            loaded += pending
+            self.report(path, number, loaded, started)
+        return loaded
+
+    def add(self, chunk, path, number, record):
+        if isinstance(record, RecordError):
+            self.rejected += 1
+            self.reject(f'{path}:{number}: {record}')
+            return
+        record_type = record.get('type', self.default_type)
+        if record_type not in RECORD_TYPES:
+            self.rejected += 1
+            self.reject(f'{path}:{number}: неизвестный тип {record_type}')
+            return
+        chunk[record_type].append((f'{path}:{number}', record))
+
+    def flush(self, chunk, checkpoint, position):
+        with transaction.atomic(), explicit_dates():
+            for record_type in RECORD_TYPES:
+                if chunk[record_type]:
+                    getattr(self, f'create_{record_type}s')(
+                        self.build(record_type, chunk[record_type])
+                    )
+            checkpoint.position = position
+            checkpoint.save(update_fields=('position', 'updated'))
+
+    def build(self, record_type, records):
+        """Объекты пачки; записи с ошибками отбрасываются с сообщением."""
+        builder = getattr(self, f'build_{record_type}')
+        objects = []
+        for where, record in records:
+            try:
+                objects.append(builder(record))
+            except (KeyError, ValueError) as error:
+                self.rejected += 1
+                self.reject(f'{where}: {type(error).__name__} {error}')
+        return objects
+
+    def user_id(self, username):
+        try:
+            return self.users[username]
+        except KeyError:
+            raise RecordError(f'нет пользователя {username}')
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        try:
+            return self.groups[slug]
+        except KeyError:
+            raise RecordError(f'нет группы {slug}')
+
+    def build_user(self, record):
+        return User(
+            username=record['username'],
+            first_name=record.get('first_name', ''),
+            last_name=record.get('last_name', ''),
+            email=record.get('email', ''),
+            password=make_password(None),
+        )
+
+    def build_group(self, record):
+        return Group(
+            slug=record['slug'],
+            title=record['title'],
+            description=record.get('description', ''),
+        )
+
+    def build_post(self, record):
+        self.images = self.images or bool(record.get('image'))
+        return Post(
+            pk=int(record['id']) if record.get('id') else None,
+            author_id=self.user_id(record['author']),
+            group_id=self.group_id(record.get('group')),
+            text=record['text'],
+            pub_date=parse_date(record.get('pub_date')),
+            image=record.get('image', ''),
+        )
+
+    def build_comment(self, record):
+        return Comment(
+            pk=int(record['id']) if record.get('id') else None,
+            post_id=int(record['post']),
+            author_id=self.user_id(record['author']),
+            text=record['text'],
+            created=parse_date(record.get('created')),
+        )
+
+    def build_follow(self, record):
+        user_id = self.user_id(record['user'])
+        author_id = self.user_id(record['author'])
+        if user_id == author_id:
+            raise RecordError('подписка на самого себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def bulk_create(self, model, objects, **options):
+        """``bulk_create`` пачками не больше, чем принимает база.
+
+        Django 2.2 не урезает явный ``batch_size`` до лимита бэкенда, а
+        SQLite не примет больше 999 параметров в одном INSERT.
+        """
+        limit = connection.ops.bulk_batch_size(
+            model._meta.concrete_fields, objects
+        )
+        model.objects.bulk_create(
+            objects, batch_size=max(min(self.chunk_size, limit), 1),
+            **options
+        )
+
+    def create_users(self, users):
+        self.bulk_create(User, users, ignore_conflicts=True)
+        self.users.update(
+            User.objects.filter(
+                username__in=[user.username for user in users]
+            ).values_list('username', 'pk')
+        )
+        self.created['user'] += len(users)
+
+    def create_groups(self, groups):
+        self.bulk_create(Group, groups, ignore_conflicts=True)
+        self.groups.update(
+            Group.objects.filter(
+                slug__in=[group.slug for group in groups]
+            ).values_list('slug', 'pk')
+        )
+        self.created['group'] += len(groups)
+
+    def new_only(self, model, objects):
+        """Объекты без первичного ключа и с ключом, которого нет в базе.
+
+        Инкрементальные выгрузки пересекаются на границе метки, так что
+        уже загруженные записи приходят повторно и пропускаются.
+        """
+        existing = set(
+            model.objects.filter(
+                pk__in={obj.pk for obj in objects if obj.pk is not None}
+            ).values_list('pk', flat=True)
+        )
+        fresh = []
+        for obj in objects:
+            if obj.pk is not None:
+                if obj.pk in existing:
+                    continue
+                existing.add(obj.pk)
+            fresh.append(obj)
+        self.skipped += len(objects) - len(fresh)
+        return fresh
+
+    def create_posts(self, posts):
+        posts = self.new_only(Post, posts)
+        self.bulk_create(Post, posts)
+        self.created['post'] += len(posts)
+
+    def create_comments(self, comments):
+        """Комментарии к постам, которых нет в базе, отбрасываются."""
+        existing = set(
+            Post.objects.filter(
+                pk__in={comment.post_id for comment in comments}
+            ).values_list('pk', flat=True)
+        )
+        valid = self.new_only(
+            Comment, [c for c in comments if c.post_id in existing]
+        )
+        for comment in comments:
+            if comment.post_id not in existing:
+                self.rejected += 1
+                self.reject(f'комментарий к несуществующему посту '
+                            f'{comment.post_id}')
+        self.bulk_create(Comment, valid)
+        self.created['comment'] += len(valid)
+
+    def create_follows(self, follows):
+        self.bulk_create(Follow, follows, ignore_conflicts=True)
+        self.created['follow'] += len(follows)
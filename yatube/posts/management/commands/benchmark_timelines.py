@@ -0,0 +1,150 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from posts.models import Follow, Post, TimelineEntry, User
+from posts.timeline import (MERGE_STRATEGIES, PULL_AUTHORS_KEY,
+                            follow_paginator, rebuild_timeline)
+
+PER_PAGE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает порог популярности и стратегии слияния ленты подписок '
+        'на синтетическом графе подписчиков. Данные создаются в транзакции '
+        'и откатываются после замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--readers', type=int, default=2000)
+        parser.add_argument(
+            '--follows', type=int, default=30,
+            help='Подписок у одного читателя.',
+        )
+        parser.add_argument(
+            '--posts', type=int, default=20,
+            help='Постов у одного автора до замеров.',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Показатель закона Ципфа для популярности авторов.',
+        )
+        parser.add_argument(
+            '--thresholds', type=int, nargs='+',
+            default=[50, 200, 1000, 10 ** 9],
+        )
+        parser.add_argument('--sample', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            authors, readers = self.populate(rng, options)
+            sample = rng.sample(readers, min(options['sample'], len(readers)))
+            self.stdout.write(
+                'threshold  timelines  strategy    rows/post  write ms  '
+                'read ms  queries'
+            )
+            # В полных лентах TIMELINE_LENGTH равна числу постов автора:
+            # после пересборки каждая новая запись вытесняет самую старую,
+            # и в замер записи входит обрезка лент.
+            fills = (
+                ('partial', settings.TIMELINE_LENGTH, sample),
+                ('full', options['posts'], readers),
+            )
+            for threshold in options['thresholds']:
+                for fill, length, rebuilt in fills:
+                    with override_settings(
+                        TIMELINE_PULL_THRESHOLD=threshold,
+                        TIMELINE_LENGTH=length,
+                    ):
+                        self.report(
+                            threshold, fill, authors, rebuilt, sample
+                        )
+            transaction.set_rollback(True)
+
+    def populate(self, rng, options):
+        prefix = f'bench{options["seed"]}_'
+        User.objects.bulk_create(
+            User(username=f'{prefix}author{i}')
+            for i in range(options['authors'])
+        )
+        User.objects.bulk_create(
+            User(username=f'{prefix}reader{i}')
+            for i in range(options['readers'])
+        )
+        authors = list(
+            User.objects.filter(
+                username__startswith=f'{prefix}author'
+            ).values_list('pk', flat=True)
+        )
+        readers = list(
+            User.objects.filter(
+                username__startswith=f'{prefix}reader'
+            ).values_list('pk', flat=True)
+        )
+        weights = [
+            1 / (rank + 1) ** options['alpha'] for rank in range(len(authors))
+        ]
+        follows = []
+        for reader in readers:
+            followed = set(
+                rng.choices(authors, weights, k=options['follows'])
+            )
+            follows.extend(
+                Follow(user_id=reader, author_id=author)
+                for author in followed
+            )
+        Follow.objects.bulk_create(follows)
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author_id=author)
+            for author in authors
+            for i in range(options['posts'])
+        )
+        self.stdout.write(
+            f'Авторов: {len(authors)}, читателей: {len(readers)}, '
+            f'подписок: {len(follows)}'
+        )
+        return authors, readers
+
+    def report(self, threshold, fill, authors, rebuilt, sample):
+        cache.delete(PULL_AUTHORS_KEY)
+        for reader in rebuilt:
+            rebuild_timeline(reader)
+        # Записанные строки считаются по id: в полных лентах обрезка
+        # удаляет столько же, сколько добавлено.
+        rows_before = self.last_entry_id()
+        started = time.perf_counter()
+        for author in authors:
+            Post.objects.create(text='Новый пост', author_id=author)
+        write_ms = (time.perf_counter() - started) * 1000 / len(authors)
+        rows = (self.last_entry_id() - rows_before) / len(authors)
+        users = list(User.objects.filter(pk__in=sample))
+        for strategy in MERGE_STRATEGIES:
+            with override_settings(TIMELINE_MERGE_STRATEGY=strategy):
+                read_ms, queries = self.measure_reads(users)
+            self.stdout.write(
+                f'{threshold:>9}  {fill:<9}  {strategy:<10}  {rows:>9.1f}  '
+                f'{write_ms:>8.2f}  {read_ms:>7.2f}  {queries:>7.1f}'
+            )
+
+    def last_entry_id(self):
+        return TimelineEntry.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def measure_reads(self, users):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as context:
+            for user in users:
+                paginator = follow_paginator(user, PER_PAGE)
+                page = paginator.get_page()
+                paginator.get_page(after=page.next_cursor)
+        elapsed = (time.perf_counter() - started) * 1000
+        return elapsed / len(users), len(context) / len(users)
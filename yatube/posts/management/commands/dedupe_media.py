@@ -0,0 +1,81 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import media
+from posts.models import Post
+from posts.storage import is_content_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в хранилище по хэшу содержимого: '
+        'одинаковые файлы схлопываются в один, старые копии и их '
+        'миниатюры удаляются. Посты обходятся пачками по первичному ключу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        self.storage = media.image_storage()
+        self.dry_run = options['dry_run']
+        self.seen = set()
+        self.stats = dict.fromkeys(
+            ('moved', 'duplicates', 'missing', 'removed', 'freed'), 0
+        )
+        posts = Post.objects.exclude(image='').order_by('pk').values_list(
+            'pk', 'image'
+        )
+        last_pk = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            for pk, name in batch:
+                if not is_content_name(name):
+                    self.move(pk, name)
+        if not self.dry_run:
+            media.recount_blobs()
+        self.stdout.write(
+            'Перенесено: {moved}, из них дубликатов: {duplicates}, '
+            'файлов нет: {missing}, удалено старых файлов: {removed}, '
+            'освобождено байт: {freed}'.format(**self.stats)
+        )
+
+    def move(self, pk, name):
+        storage = self.storage
+        try:
+            exists = storage.exists(name)
+        except SuspiciousFileOperation:
+            exists = False
+        if not exists:
+            self.stats['missing'] += 1
+            return
+        with storage.open(name) as content:
+            target = storage.content_name(name, content)
+            duplicate = target in self.seen or storage.exists(target)
+            self.seen.add(target)
+            self.stats['moved'] += 1
+            self.stats['duplicates'] += duplicate
+            if self.dry_run:
+                return
+            # Файл и ссылка на него учитываются под одной блокировкой.
+            with transaction.atomic():
+                target = storage.save(name, content)
+                Post.objects.filter(pk=pk, image=name).update(image=target)
+                media.retain(target)
+        if not Post.objects.filter(image=name).exists():
+            self.stats['freed'] += storage.size(name)
+            default.kvstore.delete(ImageFile(name, storage))
+            storage.delete(name)
+            self.stats['removed'] += 1
@@ -0,0 +1,60 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.media import image_storage
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+def regenerate(name, force):
+    if force:
+        default.kvstore.delete_thumbnails(ImageFile(name, image_storage()))
+    return generate_thumbnails(name)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее создаёт миниатюры всех размеров для изображений '
+        'существующих постов в нескольких процессах и записывает в посты '
+        'их размеры, заглушку и манифест вариантов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число процессов; 0 — рендерить в текущем процессе.',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Удалить уже созданные миниатюры и отрендерить заново.',
+        )
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Только изображения постов без манифеста вариантов.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if options['missing']:
+            posts = posts.filter(image_variants='')
+        names = list(
+            posts.order_by().values_list('image', flat=True).distinct()
+        )
+        task = partial(regenerate, force=options['force'])
+        if not options['workers']:
+            generated = sum(map(task, names))
+        else:
+            # Дочерние процессы не должны делить соединение с родителем.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                options['workers'],
+                mp_context=multiprocessing.get_context('fork'),
+            ) as pool:
+                generated = sum(pool.map(task, names, chunksize=16))
+        self.stdout.write(f'Обработано изображений: {generated}')
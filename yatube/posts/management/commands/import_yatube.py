@@ -0,0 +1,84 @@
+import os
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+from posts.importer import (RECORD_TYPES, Importer, input_format,
+                            rebuild_derived)
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает пользователей, группы, посты, комментарии и '
+        'подписки из JSONL или CSV (можно .gz) пачками bulk_create. '
+        'Индекс поиска, счётчики и ленты пересобираются один раз в конце; '
+        'прерванная загрузка продолжается с сохранённой позиции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument(
+            '--type', choices=RECORD_TYPES,
+            help='Тип записей без поля type, например для CSV.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Записей в одной транзакции.',
+        )
+        parser.add_argument(
+            '--keep-indexes', action='store_true',
+            help='Не отключать индекс поиска: дешевле для малых загрузок. '
+                 'Без этого флага индекс пересобирается после загрузки, '
+                 'даже если она прервалась.',
+        )
+        parser.add_argument(
+            '--skip-finalize', action='store_true',
+            help='Не пересчитывать счётчики и ленты после загрузки.',
+        )
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            try:
+                input_format(path)
+            except ValueError as error:
+                raise CommandError(error)
+            if not os.path.exists(path):
+                raise CommandError(f'Нет файла {path}')
+        importer = Importer(
+            options['chunk_size'],
+            default_type=options['type'],
+            report=self.report,
+            reject=self.stderr.write,
+        )
+        loading = (
+            nullcontext() if options['keep_indexes'] else search.bulk_load()
+        )
+        with loading:
+            for path in options['paths']:
+                importer.load(path, source=os.path.abspath(path))
+        if not options['skip_finalize']:
+            self.finalize(importer, options)
+        created = ', '.join(
+            f'{record_type} {importer.created[record_type]}'
+            for record_type in RECORD_TYPES
+        )
+        self.stdout.write(
+            f'Загружено: {created}; отклонено записей: {importer.rejected}; '
+            f'уже были в базе: {importer.skipped}'
+        )
+
+    def report(self, path, position, loaded, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{path}: позиция {position}, загружено {loaded}, '
+            f'{loaded / max(elapsed, 1e-6):.0f} записей/с'
+        )
+
+    def finalize(self, importer, options):
+        started = time.monotonic()
+        rebuild_derived(self.stdout, images=importer.images)
+        self.stdout.write(
+            f'Пересчёт занял {time.monotonic() - started:.1f} с'
+        )
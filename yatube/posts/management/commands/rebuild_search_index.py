@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import install, is_supported, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError('Полнотекстовый индекс требует SQLite FTS5.')
+        install()
+        indexed = rebuild_index(options['batch_size'])
+        self.stdout.write(f'Проиндексировано постов: {indexed}')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import User
+from posts.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пересобрать ленты только этих пользователей.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        rebuilt = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            rebuild_timeline(user_id)
+            rebuilt += 1
+        self.stdout.write(f'Пересобрано лент: {rebuilt}')
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from posts.counters import comment_counts, user_counts
+from posts.models import Post, User, UserStats
+
+
+def drifted(queryset, counts):
+    """Сколько строк выборки расходится с пересчитанными значениями."""
+    actual = {f'actual_{field}': count for field, count in counts.items()}
+    matches = Q()
+    for field in counts:
+        matches &= Q(**{field: F(f'actual_{field}')})
+    return queryset.annotate(**actual).exclude(matches).count()
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики постов, комментариев и подписок с таблицами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = self.reconcile_users(batch_size)
+        posts = self.reconcile_posts(batch_size)
+        self.stdout.write(
+            f'Исправлено счётчиков: пользователей {users}, постов {posts}'
+        )
+
+    def batches(self, queryset, batch_size):
+        """Границы пачек по первичному ключу, без OFFSET."""
+        last_pk = 0
+        while True:
+            pks = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', flat=True
+                )[:batch_size]
+            )
+            if not pks:
+                return
+            yield pks[0], pks[-1]
+            last_pk = pks[-1]
+
+    def reconcile_users(self, batch_size):
+        repaired = 0
+        for first, last in self.batches(User.objects.all(), batch_size):
+            with transaction.atomic():
+                UserStats.objects.bulk_create(
+                    UserStats(user_id=pk)
+                    for pk in User.objects.filter(
+                        pk__range=(first, last), stats__isnull=True
+                    ).values_list('pk', flat=True)
+                )
+                stats = UserStats.objects.filter(
+                    user__pk__range=(first, last)
+                )
+                repaired += drifted(stats, user_counts('user_id'))
+                stats.update(**user_counts('user_id'))
+        return repaired
+
+    def reconcile_posts(self, batch_size):
+        repaired = 0
+        for first, last in self.batches(Post.objects.all(), batch_size):
+            with transaction.atomic():
+                posts = Post.objects.filter(pk__range=(first, last))
+                repaired += drifted(posts, comment_counts())
+                posts.update(**comment_counts())
+        return repaired
@@ -0,0 +1,99 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts import search
+from posts.importer import rebuild_derived
+from posts.models import User
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, группами, постами '
+        'с картинками, комментариями и графом подписок со степенным '
+        'распределением. При одном --seed данные получаются одинаковыми.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок одного пользователя.',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель закона Ципфа для популярности пользователей.',
+        )
+        parser.add_argument('--group-ratio', type=float, default=0.7)
+        parser.add_argument('--image-ratio', type=float, default=0.2)
+        parser.add_argument(
+            '--images', type=int, default=12,
+            help='Сколько разных картинок делят между собой посты.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до --until распределены посты.',
+        )
+        parser.add_argument(
+            '--until', default='2024-01-01',
+            help='Дата последнего поста, чтобы данные не зависели от дня.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересчитывать счётчики и ленты; индекс поиска '
+                 'пересобирается всегда.',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        tag = f'_seed{options["seed"]}_'
+        if User.objects.filter(username__contains=tag).exists():
+            raise CommandError(
+                f'Данные с --seed {options["seed"]} уже созданы.'
+            )
+        until = timezone.make_aware(
+            datetime.fromisoformat(options['until']), timezone.utc
+        )
+        seeder = Seeder(
+            options['seed'],
+            batch_size=options['batch_size'],
+            alpha=options['alpha'],
+            until=until,
+            days=options['days'],
+            report=self.report,
+        )
+        started = time.monotonic()
+        with search.bulk_load():
+            self.populate(seeder, options)
+        if not options['skip_rebuild']:
+            rebuild_derived(self.stdout, images=bool(seeder.images))
+        self.stdout.write(f'Готово за {time.monotonic() - started:.1f} с')
+
+    def populate(self, seeder, options):
+        seeder.create_users(options['users'])
+        seeder.create_groups(options['groups'])
+        if options['image_ratio'] > 0:
+            seeder.create_images(options['images'])
+        seeder.create_posts(
+            options['posts'],
+            group_ratio=options['group_ratio'],
+            image_ratio=options['image_ratio'],
+        )
+        if options['posts']:
+            seeder.create_comments(options['comments'])
+        seeder.create_follows(options['follows'])
+
+    def report(self, record_type, count, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'{record_type}: {count} строк, {count / elapsed:.0f} строк/с'
+        )
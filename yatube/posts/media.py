@@ -0,0 +1,96 @@
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .models import MediaBlob, Post
+from .storage import CONTENT_NAME_RE, is_content_name
+
+
+def image_storage():
+    return Post._meta.get_field('image').storage
+
+
+def lock_blob(name):
+    """Блокирует строку файла до конца транзакции, создавая её при нужде.
+
+    Блокировку берёт пустой ``UPDATE``: ``select_for_update`` на SQLite
+    не действует, а запись занимает базу до коммита. ``delete_file``
+    удаляет строку и файл в своей транзакции, поэтому после блокировки
+    проверка существования файла уже не устареет.
+    """
+    if not MediaBlob.objects.filter(name=name).update(
+        refcount=F('refcount')
+    ):
+        MediaBlob.objects.get_or_create(name=name)
+
+
+def retain(name):
+    """Учитывает ещё один пост, ссылающийся на файл."""
+    if not name or not is_content_name(name):
+        return
+    lock_blob(name)
+    MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """Снимает ссылку; файл без ссылок удаляется после коммита.
+
+    Файлы со старыми именами не по хэшу не учитываются и не удаляются,
+    их переносит команда dedupe_media.
+    """
+    if not name or not is_content_name(name):
+        return
+    MediaBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1
+    )
+    if MediaBlob.objects.filter(name=name, refcount=0).exists():
+        transaction.on_commit(lambda: delete_file(name))
+
+
+def delete_file(name):
+    """Удаляет файл и его миниатюры, если на него снова не сослались.
+
+    Строка удаляется, только если ссылок так и нет, а файл — в той же
+    транзакции, пока строка заблокирована: загрузка того же файла ждёт
+    в ``lock_blob`` и затем записывает файл заново.
+    """
+    with transaction.atomic():
+        deleted, _ = MediaBlob.objects.filter(name=name, refcount=0).delete()
+        if not deleted:
+            return
+        storage = image_storage()
+        default.kvstore.delete(ImageFile(name, storage))
+        storage.delete(name)
+
+
+def recount_blobs():
+    """Пересчитывает ссылки на файлы по постам запросами над множествами.
+
+    Недостающие строки добавляются одним ``INSERT ... SELECT``, счётчики
+    обновляются одним ``UPDATE`` с подзапросом, строки без ссылок
+    удаляются одним ``DELETE`` — имена не проходят через Python.
+    """
+    content_images = Post.objects.filter(image__regex=CONTENT_NAME_RE.pattern)
+    missing = content_images.exclude(
+        image__in=MediaBlob.objects.values('name')
+    ).order_by().values('image').distinct()
+    sql, params = missing.query.sql_with_params()
+    table = connection.ops.quote_name(MediaBlob._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, refcount) '
+                f'SELECT image, 0 FROM ({sql}) AS missing',
+                params,
+            )
+        MediaBlob.objects.update(refcount=Coalesce(
+            Subquery(
+                content_images.filter(image=OuterRef('name')).order_by(
+                ).values('image').annotate(total=Count('pk')).values('total')
+            ),
+            0,
+        ))
+        MediaBlob.objects.filter(refcount=0).delete()
+    return MediaBlob.objects.count()
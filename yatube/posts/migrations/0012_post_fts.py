@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# SQL зафиксирован здесь, а не берётся из posts.search: миграция должна
+# выполняться одинаково, как бы ни менялся модуль поиска.
+CREATE_INDEX = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5('
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER IF NOT EXISTS posts_post_fts_ai '
+    'AFTER INSERT ON posts_post BEGIN '
+    'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS posts_post_fts_ad '
+    'AFTER DELETE ON posts_post BEGIN '
+    'INSERT INTO posts_post_fts(posts_post_fts, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS posts_post_fts_au '
+    'AFTER UPDATE OF text ON posts_post BEGIN '
+    'INSERT INTO posts_post_fts(posts_post_fts, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+    'END',
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+)
+
+DROP_INDEX = (
+    'DROP TRIGGER IF EXISTS posts_post_fts_ai',
+    'DROP TRIGGER IF EXISTS posts_post_fts_ad',
+    'DROP TRIGGER IF EXISTS posts_post_fts_au',
+    'DROP TABLE IF EXISTS posts_post_fts',
+)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_comments_count_userstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_INDEX), run(DROP_INDEX)),
+    ]
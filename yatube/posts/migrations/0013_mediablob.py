@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:59
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='file')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='references')),
+            ],
+            options={
+                'verbose_name': 'media blob',
+                'verbose_name_plural': 'media blobs',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_image_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='source')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='records')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+            ],
+            options={
+                'verbose_name': 'import checkpoint',
+                'verbose_name_plural': 'import checkpoints',
+            },
+        ),
+    ]
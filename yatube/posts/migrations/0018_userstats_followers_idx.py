@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['followers_count', 'user'], name='userstats_followers_idx'),
+        ),
+    ]
@@ -1,5 +1,9 @@
+import json
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -15,6 +19,32 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Карточки ленты: автор и группа одним запросом."""
+        return self.select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'image',
+            'image_width',
+            'image_height',
+            'image_placeholder',
+            'image_variants',
+            'author',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group',
+            'group__title',
+            'group__slug',
+            'comments_count',
+        )
+
+    def for_detail(self):
+        """Страница поста: автор, его счётчики и группа одним запросом."""
+        return self.select_related('author', 'author__stats', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -24,7 +54,8 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         verbose_name='author',
-        related_name='posts'
+        related_name='posts',
+        db_index=False
     )
     pub_date = models.DateTimeField(
         auto_now_add=True,
@@ -37,23 +68,94 @@ class Post(models.Model):
         related_name='posts',
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='group',
         help_text='Группа, к которой будет относиться пост'
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        editable=False,
+        help_text='Размытая копия картинки 16px в виде data URI'
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='JSON: {"webp"|"img": [[ширина, высота, url], ...]}'
+    )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'post'
         verbose_name_plural = 'posts'
+        # Ленты автора и группы идут по дате: индекс отдаёт строки уже
+        # упорядоченными (pk добавляется к ключу как rowid) и заменяет
+        # одиночные индексы внешних ключей.
+        indexes = (
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_pub_date_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:LENGTH_TEXT]
 
+    def save(self, *args, **kwargs):
+        # Файл картинки сохраняется и учитывается в MediaBlob одной
+        # транзакцией: блокировка строки файла держится до учёта ссылки.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    @property
+    def image_manifest(self):
+        """Разобранный манифест вариантов картинки или пустой словарь."""
+        return json.loads(self.image_variants) if self.image_variants else {}
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_detail(self):
+        """Комментарии вместе с авторами одним запросом."""
+        return self.select_related('author').only(
+            'post',
+            'text',
+            'created',
+            'author',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+        )
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -61,6 +163,7 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments',
         verbose_name='post',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -78,10 +181,18 @@ class Comment(models.Model):
         db_index=True
     )
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'comment'
         verbose_name_plural = 'comments'
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:LENGTH_TEXT]
@@ -99,12 +210,20 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
         verbose_name='author',
+        db_index=False,
     )
 
     class Meta:
         verbose_name = 'following'
         verbose_name_plural = 'followings'
         ordering = ('author',)
+        # Подписчики автора читаются из индекса, без обращения к таблице.
+        indexes = (
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx',
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'author'),
@@ -115,3 +234,133 @@ class Follow(models.Model):
                 name='user_author_unique'
             ),
         )
+
+
+class TimelineQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Записи ленты вместе с постами, авторами и группами."""
+        return self.select_related(
+            'post', 'post__author', 'post__group'
+        ).only(
+            'user',
+            'pub_date',
+            'post',
+            'post__text',
+            'post__pub_date',
+            'post__image',
+            'post__image_width',
+            'post__image_height',
+            'post__image_placeholder',
+            'post__image_variants',
+            'post__author',
+            'post__author__username',
+            'post__author__first_name',
+            'post__author__last_name',
+            'post__group',
+            'post__group__title',
+            'post__group__slug',
+            'post__comments_count',
+        )
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='reader',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='post',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='author',
+    )
+    pub_date = models.DateTimeField(verbose_name='publish date')
+
+    objects = TimelineQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'timeline entry'
+        verbose_name_plural = 'timeline entries'
+        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date', 'post'),
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx',
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='timeline_user_post_unique',
+            ),
+        )
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые обновляются при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='user',
+    )
+    posts_count = models.PositiveIntegerField('posts', default=0)
+    followers_count = models.PositiveIntegerField('followers', default=0)
+    following_count = models.PositiveIntegerField('following', default=0)
+
+    class Meta:
+        verbose_name = 'user stats'
+        verbose_name_plural = 'user stats'
+        indexes = (
+            models.Index(
+                fields=('followers_count', 'user'),
+                name='userstats_followers_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}'
+
+
+class MediaBlob(models.Model):
+    """Файл в хранилище по хэшу и число постов, которые на него ссылаются."""
+    name = models.CharField('file', max_length=100, unique=True)
+    refcount = models.PositiveIntegerField('references', default=0)
+
+    class Meta:
+        verbose_name = 'media blob'
+        verbose_name_plural = 'media blobs'
+
+    def __str__(self):
+        return f'{self.name}: {self.refcount}'
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько записей источника уже загружено командой import_yatube.
+
+    Позиция сохраняется в той же транзакции, что и загруженная пачка,
+    поэтому повторный запуск продолжает ровно с места остановки.
+    """
+    source = models.CharField('source', max_length=255, unique=True)
+    position = models.PositiveIntegerField('records', default=0)
+    updated = models.DateTimeField('updated', auto_now=True)
+
+    class Meta:
+        verbose_name = 'import checkpoint'
+        verbose_name_plural = 'import checkpoints'
+
+    def __str__(self):
+        return f'{self.source}: {self.position}'
@@ -0,0 +1,177 @@
+import base64
+import binascii
+import heapq
+from operator import itemgetter
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(value, pk):
+    """Кодирует ключ (значение, id) в непрозрачный токен для URL."""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f'{value}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, parse=parse_datetime):
+    """Раскодирует токен; для битого токена возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit('|', 1)
+        value = parse(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (дата, id) вместо COUNT и OFFSET.
+
+    Страница выбирается одним запросом по диапазону ключа:
+    ``after`` — записи старше курсора, ``before`` — новее.
+    Старые ссылки вида ``?page=N`` продолжают работать через OFFSET.
+
+    Общее число страниц не считается: ``num_pages`` известно только
+    относительно последней выданной страницы, а номер курсорной
+    страницы условный — 1 для первой и 2 для всех остальных.
+    """
+
+    parse_value = staticmethod(parse_datetime)
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 key_field='pk'):
+        super().__init__(object_list, per_page)
+        self.date_field = date_field
+        self.key_field = key_field
+
+    def key(self, obj):
+        return getattr(obj, self.date_field), getattr(obj, self.key_field)
+
+    def item(self, obj):
+        """Превращает строку выборки в объект страницы."""
+        return obj
+
+    def cursor_for(self, obj):
+        return encode_cursor(*self.key(obj))
+
+    def decode(self, cursor):
+        return decode_cursor(cursor, self.parse_value)
+
+    def get_page(self, number=None, after=None, before=None):
+        """Возвращает страницу по курсору или по старому номеру."""
+        if after and self.decode(after):
+            return self.page_after(after)
+        if before and self.decode(before):
+            return self.page_before(before)
+        try:
+            number = self.validate_number(number)
+        except (TypeError, ValueError):
+            number = 1
+        return self.page(number)
+
+    def validate_number(self, number):
+        number = int(number)
+        if number < 1:
+            raise ValueError('Номер страницы меньше 1')
+        return number
+
+    def fetch(self, limit, key=None, older=True, offset=0):
+        """Строки от курсора в порядке обхода: к старым или к новым."""
+        queryset = self._ordered(descending=older)
+        if key is not None:
+            queryset = queryset.filter(self._range(key, older))
+        return list(queryset[offset:offset + limit])
+
+    def page(self, number):
+        number = self.validate_number(number)
+        rows = self.fetch(
+            self.per_page + 1, offset=(number - 1) * self.per_page
+        )
+        return self._build_page(
+            rows[:self.per_page], number,
+            has_next=len(rows) > self.per_page,
+        )
+
+    def page_after(self, cursor):
+        rows = self.fetch(self.per_page + 1, self.decode(cursor))
+        return self._build_page(
+            rows[:self.per_page], 2,
+            has_next=len(rows) > self.per_page,
+            cursor=cursor, direction='after',
+        )
+
+    def page_before(self, cursor):
+        rows = self.fetch(
+            self.per_page + 1, self.decode(cursor), older=False
+        )
+        has_previous = len(rows) > self.per_page
+        return self._build_page(
+            rows[:self.per_page][::-1], 2 if has_previous else 1,
+            has_next=True,
+            cursor=cursor, direction='before',
+        )
+
+    def _ordered(self, descending=True):
+        sign = '-' if descending else ''
+        return self.object_list.order_by(
+            f'{sign}{self.date_field}', f'{sign}{self.key_field}'
+        )
+
+    def _range(self, key, older):
+        value, pk = key
+        lookup = 'lt' if older else 'gt'
+        return Q(**{f'{self.date_field}__{lookup}': value}) | Q(
+            **{self.date_field: value, f'{self.key_field}__{lookup}': pk}
+        )
+
+    def _build_page(self, rows, number, has_next, cursor=None,
+                    direction=None):
+        """Страница с курсорами соседних страниц.
+
+        ``cache_key`` различает страницы для кэша фрагментов: после
+        курсора и до него — разные страницы с одним токеном.
+        """
+        self.num_pages = number + 1 if has_next else number
+        page = Page([self.item(row) for row in rows], number, self)
+        page.cursor = cursor
+        page.direction = direction
+        page.cache_key = (
+            f'{direction}:{cursor}' if direction else f'page:{number}'
+        )
+        page.next_cursor = self.cursor_for(rows[-1]) if rows else cursor
+        page.previous_cursor = self.cursor_for(rows[0]) if rows else cursor
+        return page
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорная пагинация по нескольким источникам сразу.
+
+    Каждый источник — ``CursorPaginator`` над своей выборкой; страница
+    собирается k-путевым слиянием их отсортированных срезов. Ключи
+    источников должны совпадать с ключом объектов страницы (дата, id):
+    одинаковые объекты из разных источников схлопываются.
+    """
+
+    def fetch(self, limit, key=None, older=True, offset=0):
+        streams = [
+            [
+                (source.key(row), source.item(row))
+                for row in source.fetch(limit + offset, key, older)
+            ]
+            for source in self.object_list
+        ]
+        merged = heapq.merge(*streams, key=itemgetter(0), reverse=older)
+        rows = []
+        previous = None
+        for row_key, row in merged:
+            if row_key != previous:
+                rows.append(row)
+            previous = row_key
+        return rows[offset:offset + limit]
@@ -0,0 +1,222 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+from .models import Post
+from .paginator import CursorPaginator
+
+FTS_TABLE = 'posts_post_fts'
+
+FTS_SCHEMA = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai '
+    'AFTER INSERT ON posts_post BEGIN '
+    f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); '
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad '
+    'AFTER DELETE ON posts_post BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au '
+    'AFTER UPDATE OF text ON posts_post BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); '
+    'END',
+)
+
+FTS_DROP_TRIGGERS = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+)
+
+FTS_DROP = FTS_DROP_TRIGGERS + (f'DROP TABLE IF EXISTS {FTS_TABLE}',)
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создаёт индекс FTS5 и триггеры, если их ещё нет.
+
+    SQLite пересоздаёт таблицу при изменении полей в миграциях и теряет
+    её триггеры, поэтому установка повторяется после каждого migrate.
+    """
+    if not is_supported(using):
+        return
+    if 'posts_post' not in using.introspection.table_names():
+        return
+    with using.cursor() as cursor:
+        for statement in FTS_SCHEMA:
+            cursor.execute(statement)
+
+
+def uninstall(using=connection):
+    _execute(FTS_DROP, using)
+
+
+def drop_triggers(using=connection):
+    """Отключает обновление индекса на время массовой загрузки.
+
+    Таблица индекса остаётся, так что поиск работает по старым данным;
+    после загрузки нужны ``rebuild_index`` и ``install`` — их выполняет
+    ``bulk_load``.
+    """
+    _execute(FTS_DROP_TRIGGERS, using)
+
+
+@contextmanager
+def bulk_load(using=connection):
+    """Массовая загрузка постов без триггеров индекса.
+
+    На выходе, и после ошибки тоже, индекс пересобирается до того, как
+    вернуть триггеры: иначе триггер правки удалял бы из индекса строки,
+    которых там нет, и портил бы таблицу FTS5.
+    """
+    drop_triggers(using)
+    try:
+        yield
+    finally:
+        if is_supported(using):
+            rebuild_index()
+        install(using)
+
+
+def _execute(statements, using):
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def rebuild_index(batch_size=1000):
+    """Заново наполняет индекс постами, пачками по первичному ключу."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+        )
+    indexed = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not pks:
+            return indexed
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                'SELECT id, text FROM posts_post WHERE id BETWEEN %s AND %s',
+                [pks[0], pks[-1]],
+            )
+        indexed += len(pks)
+        last_pk = pks[-1]
+
+
+def match_query(text):
+    """Превращает ввод пользователя в безопасный запрос MATCH.
+
+    Каждое слово берётся в кавычки, так что синтаксис FTS5 во вводе
+    не интерпретируется; слова объединяются через AND.
+    """
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', text))
+
+
+def filter_matching(queryset, text):
+    """Оставляет в выборке постов только подходящие под запрос."""
+    query = match_query(text)
+    if not query:
+        return queryset.none()
+    return queryset.extra(
+        where=[
+            f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[query],
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Выдача поиска в порядке релевантности bm25.
+
+    Курсор хранит позицию поста в выдаче, а не его rank: bm25 зависит
+    от статистики всего индекса и меняется с каждым новым постом, так
+    что курсор по значению rank пропускал бы или повторял посты.
+    Страница собирается двумя запросами: id из индекса по LIMIT/OFFSET
+    и сами посты по этим id.
+    """
+
+    parse_value = int
+
+    def __init__(self, text, per_page, group=None, author=None):
+        super().__init__(Post.objects.for_feed(), per_page)
+        self.match = match_query(text)
+        self.group = group
+        self.author = author
+
+    def key(self, post):
+        return post.position, post.pk
+
+    def decode(self, cursor):
+        key = super().decode(cursor)
+        if key is None or key[0] < 0:
+            return None
+        return key
+
+    def fetch(self, limit, key=None, older=True, offset=0):
+        if not self.match:
+            return []
+        if key is None:
+            start = offset
+        elif older:
+            start = key[0] + 1 + offset
+        else:
+            start = max(key[0] - limit, 0)
+            limit = key[0] - start
+        where = [f'{FTS_TABLE} MATCH %s']
+        params = [self.match]
+        if self.group is not None:
+            where.append('posts_post.group_id = %s')
+            params.append(self.group.pk)
+        if self.author is not None:
+            where.append('posts_post.author_id = %s')
+            params.append(self.author.pk)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} '
+                f'JOIN posts_post ON posts_post.id = {FTS_TABLE}.rowid '
+                f'WHERE {" AND ".join(where)} '
+                f'ORDER BY rank, {FTS_TABLE}.rowid '
+                'LIMIT %s OFFSET %s',
+                params + [limit, start],
+            )
+            pks = [row[0] for row in cursor.fetchall()]
+        posts = self.object_list.in_bulk(pks)
+        found = []
+        for position, pk in enumerate(pks, start):
+            if pk in posts:
+                posts[pk].position = position
+                found.append(posts[pk])
+        # К новым страницам строки идут от ближайшей к курсору.
+        return found if older or key is None else found[::-1]
+
+
+def search_paginator(text, per_page, group=None, author=None):
+    """Пагинатор выдачи; без FTS5 — простой поиск по вхождению."""
+    if is_supported():
+        return SearchPaginator(text, per_page, group=group, author=author)
+    posts = Post.objects.for_feed().filter(text__icontains=text)
+    if group is not None:
+        posts = posts.filter(group=group)
+    if author is not None:
+        posts = posts.filter(author=author)
+    return CursorPaginator(posts, per_page)
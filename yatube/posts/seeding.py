@@ -0,0 +1,216 @@
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from mixer.backend.django import Mixer
+from PIL import Image, ImageDraw
+
+from .importer import explicit_dates
+from .media import image_storage
+from .models import Comment, Follow, Group, Post, User
+
+# Сколько разных текстов генерирует Faker: тексты постов и комментариев
+# выбираются из этого набора, иначе генерация текста дороже вставки.
+TEXT_POOL_SIZE = 1000
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def popularity(count, alpha):
+    """Накопленные веса закона Ципфа для ``random.choices``."""
+    return list(accumulate(1 / (rank + 1) ** alpha for rank in range(count)))
+
+
+class Seeder:
+    """Синтетические данные заданного объёма, одинаковые при одном seed.
+
+    Пользователей и группы заполняют mixer и Faker; посты, комментарии
+    и подписки собираются пачками прямо из ``random.Random(seed)``, так
+    что миллионы строк не проходят через построитель объектов mixer.
+    Популярность пользователей следует закону Ципфа: самые популярные
+    и пишут больше всех, и собирают большинство подписчиков.
+    """
+
+    def __init__(self, seed=0, batch_size=5000, alpha=1.1, until=None,
+                 days=365, report=None):
+        # mixer берёт случайные значения из глобального random.
+        random.seed(seed)
+        self.rng = random.Random(seed)
+        self.mixer = Mixer(commit=False, locale='ru')
+        self.mixer.faker.seed_instance(seed)
+        self.tag = f'seed{seed}'
+        self.batch_size = batch_size
+        self.alpha = alpha
+        self.until = until
+        self.span = timedelta(days=days)
+        self.report = report or (lambda *args: None)
+        self.users = []
+        self.ranked = []
+        self.groups = []
+        self.images = []
+        self.posts = range(0)
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def insert(self, model, objects):
+        with transaction.atomic(), explicit_dates():
+            model.objects.bulk_create(objects)
+
+    def create_users(self, count):
+        first = next_pk(User)
+        password = make_password(None)
+        faker = self.mixer.faker
+        started = time.monotonic()
+        for start, size in self.batches(count):
+            pks = range(first + start, first + start + size)
+            self.insert(User, self.mixer.cycle(size).blend(
+                User,
+                pk=(pk for pk in pks),
+                username=(
+                    f'{faker.user_name()}_{self.tag}_{number}'
+                    for number in range(start, start + size)
+                ),
+                first_name=faker.first_name,
+                last_name=faker.last_name,
+                email=faker.email,
+                password=password,
+                date_joined=self.until - self.span,
+            ))
+        self.users = range(first, first + count)
+        self.ranked = list(self.users)
+        self.rng.shuffle(self.ranked)
+        self.weights = popularity(count, self.alpha)
+        self.report('user', count, started)
+
+    def create_groups(self, count):
+        first = next_pk(Group)
+        started = time.monotonic()
+        self.insert(Group, self.mixer.cycle(count).blend(
+            Group,
+            pk=(pk for pk in range(first, first + count)),
+            slug=(f'{self.tag}-{number}' for number in range(count)),
+            description=self.mixer.faker.paragraph,
+        ))
+        self.groups = range(first, first + count)
+        self.report('group', count, started)
+
+    def create_images(self, count):
+        """Несколько картинок в хранилище, общих для многих постов."""
+        storage = image_storage()
+        for number in range(count):
+            width = self.rng.randrange(640, 1921, 16)
+            height = self.rng.randrange(480, 1081, 16)
+            image = Image.new('RGB', (width, height), self.color())
+            draw = ImageDraw.Draw(image)
+            for _ in range(8):
+                box = sorted(self.rng.sample(range(width), 2)) + sorted(
+                    self.rng.sample(range(height), 2)
+                )
+                draw.ellipse(
+                    (box[0], box[2], box[1], box[3]), fill=self.color()
+                )
+            content = BytesIO()
+            image.save(content, 'JPEG', quality=80)
+            name = storage.save(
+                f'posts/{self.tag}-{number}.jpg',
+                ContentFile(content.getvalue()),
+            )
+            self.images.append((name, width, height))
+
+    def color(self):
+        return tuple(self.rng.randrange(256) for _ in range(3))
+
+    def texts(self, nb_sentences):
+        return [
+            self.mixer.faker.paragraph(nb_sentences=nb_sentences)
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+
+    def date(self, position, total):
+        """Даты идут по возрастанию первичного ключа, до ``until``."""
+        return self.until - self.span + self.span * position / max(total, 1)
+
+    def create_posts(self, count, group_ratio=0.7, image_ratio=0.2):
+        first = next_pk(Post)
+        texts = self.texts(4)
+        started = time.monotonic()
+        for start, size in self.batches(count):
+            authors = self.rng.choices(
+                self.ranked, cum_weights=self.weights, k=size
+            )
+            self.insert(Post, [
+                self.build_post(
+                    first + start + offset, author, texts,
+                    self.date(start + offset, count),
+                    group_ratio, image_ratio,
+                )
+                for offset, author in enumerate(authors)
+            ])
+        self.posts = range(first, first + count)
+        self.report('post', count, started)
+
+    def build_post(self, pk, author, texts, pub_date, group_ratio,
+                   image_ratio):
+        rng = self.rng
+        post = Post(
+            pk=pk, author_id=author, text=rng.choice(texts),
+            pub_date=pub_date,
+        )
+        if self.groups and rng.random() < group_ratio:
+            post.group_id = rng.choice(self.groups)
+        if self.images and rng.random() < image_ratio:
+            post.image, post.image_width, post.image_height = rng.choice(
+                self.images
+            )
+        return post
+
+    def create_comments(self, count):
+        texts = self.texts(1)
+        started = time.monotonic()
+        for start, size in self.batches(count):
+            comments = []
+            for _ in range(size):
+                index = self.rng.randrange(len(self.posts))
+                created = self.date(index, len(self.posts)) + timedelta(
+                    hours=self.rng.random() * 24
+                )
+                comments.append(Comment(
+                    post_id=self.posts[index],
+                    author_id=self.rng.choice(self.users),
+                    text=self.rng.choice(texts),
+                    created=min(created, self.until),
+                ))
+            self.insert(Comment, comments)
+        self.report('comment', count, started)
+
+    def create_follows(self, mean):
+        """Подписки: у каждого от 0 до 2·mean, авторы — по Ципфу."""
+        started = time.monotonic()
+        follows = []
+        created = 0
+        for user in self.users:
+            authors = set(self.rng.choices(
+                self.ranked, cum_weights=self.weights,
+                k=self.rng.randint(0, 2 * mean),
+            ))
+            authors.discard(user)
+            follows.extend(
+                Follow(user_id=user, author_id=author)
+                for author in sorted(authors)
+            )
+            if len(follows) >= self.batch_size:
+                self.insert(Follow, follows)
+                created += len(follows)
+                follows = []
+        self.insert(Follow, follows)
+        self.report('follow', created + len(follows), started)
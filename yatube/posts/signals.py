@@ -0,0 +1,175 @@
+from django.db import connections, transaction
+from django.contrib.auth import get_user_model
+from django.core.files.images import get_image_dimensions
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import counters, feed_cache, media, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Поля, которые видны в карточках любой ленты.
+FEED_FIELDS = {
+    Group: ('title', 'slug'),
+    User: ('username', 'first_name', 'last_name'),
+}
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_followed_author(sender, instance, created, raw=False,
+                             **kwargs):
+    if created and not raw:
+        timeline.backfill_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_unfollowed_author(sender, instance, **kwargs):
+    timeline.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment_user(instance.author_id, 'posts_count')
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.decrement_user(instance.author_id, 'posts_count')
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment_comments(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.decrement_comments(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        with transaction.atomic():
+            counters.increment_user(instance.author_id, 'followers_count')
+            counters.increment_user(instance.user_id, 'following_count')
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    with transaction.atomic():
+        counters.decrement_user(instance.author_id, 'followers_count')
+        counters.decrement_user(instance.user_id, 'following_count')
+
+
+@receiver(post_save, sender=Post)
+def schedule_post_thumbnails(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if instance.image and instance.image.name != previous and not raw:
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        previous = Post.objects.filter(pk=instance.pk).values(
+            'group_id', 'image'
+        ).first() or {}
+        instance._previous_group_id = previous.get('group_id')
+        instance._previous_image = previous.get('image')
+
+
+@receiver(pre_save, sender=Post)
+def measure_new_image(sender, instance, raw=False, **kwargs):
+    """Размеры новой картинки берутся из заголовка файла при загрузке.
+
+    Заглушка и манифест вариантов старой картинки сбрасываются: их
+    заполнит фоновый воркер, когда отрендерит варианты новой.
+    """
+    if raw or (instance.image and instance.image._committed):
+        return
+    instance.image_width = instance.image_height = None
+    instance.image_placeholder = instance.image_variants = ''
+    if instance.image:
+        instance.image_width, instance.image_height = get_image_dimensions(
+            instance.image.file
+        )
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_image', None)
+    if instance.image.name != previous:
+        with transaction.atomic():
+            media.retain(instance.image.name)
+            media.release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def reset_post_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        feed_cache.bump_post_feeds(instance.author_id, {
+            instance.group_id,
+            getattr(instance, '_previous_group_id', None),
+        })
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reset_follow_feed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        feed_cache.bump(feed_cache.follow_scope(instance.user_id))
+
+
+@receiver(pre_save, sender=Group)
+@receiver(pre_save, sender=User)
+def remember_feed_fields(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    fields = FEED_FIELDS[sender]
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return
+    instance._previous_feed_fields = sender.objects.filter(
+        pk=instance.pk
+    ).values_list(*fields).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=User)
+def reset_all_feeds(sender, instance, raw=False, **kwargs):
+    """Название группы и имя автора видны в карточках любой ленты.
+
+    Остальные поля, например пароль или дата входа, в лентах не видны
+    и закэшированные ленты не сбрасывают.
+    """
+    previous = instance.__dict__.pop('_previous_feed_fields', None)
+    if raw or previous is None:
+        return
+    current = tuple(getattr(instance, field) for field in FEED_FIELDS[sender])
+    if current != previous:
+        feed_cache.bump(feed_cache.ALL_FEEDS)
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.install(connections[using])
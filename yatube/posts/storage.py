@@ -0,0 +1,59 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+CONTENT_NAME_RE = re.compile(
+    r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$'
+)
+
+
+def content_hash(content):
+    """SHA-256 содержимого файла, прочитанного по частям."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_name(name):
+    return bool(CONTENT_NAME_RE.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — хэш его содержимого.
+
+    Файл ``posts/meme.jpg`` сохраняется как ``posts/ab/cd/abcd….jpg``:
+    две первые пары символов хэша дают каталоги, чтобы в одном каталоге
+    не копились миллионы файлов. Одинаковые загрузки попадают в одно
+    имя и пишутся на диск один раз, а миниатюры sorl, которые строятся
+    по имени исходника, становятся общими для всех таких постов.
+    """
+
+    def content_name(self, name, content):
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(
+            directory, digest[:2], digest[2:4], f'{digest}{extension}'
+        ).replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        # Модуль media импортирует модели, а модели — это хранилище.
+        from .media import lock_blob
+        with transaction.atomic(savepoint=False):
+            # Под блокировкой файл не удалит параллельный release.
+            lock_blob(name)
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length=max_length)
@@ -0,0 +1,11 @@
+from django import template
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Карточки постов страницы из кэша фрагментов."""
+    return render_cards(posts)
@@ -0,0 +1,17 @@
+from django import template
+
+from posts.thumbnails import responsive_image
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, sizes=DEFAULT_SIZES):
+    """Адаптивная картинка поста только по полям самого поста."""
+    return {
+        'post': post,
+        'image': responsive_image(post),
+        'sizes': sizes,
+    }
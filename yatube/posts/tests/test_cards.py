@@ -0,0 +1,72 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts import cards
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for number in range(3):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self):
+        return Post.objects.for_feed()
+
+    def test_only_misses_are_rendered(self):
+        """Повторный показ страницы берёт карточки из кэша."""
+        with mock.patch.object(
+            cards, 'render_card', wraps=cards.render_card
+        ) as render:
+            first = cards.render_cards(self.feed())
+            self.assertEqual(render.call_count, 3)
+            second = cards.render_cards(self.feed())
+            self.assertEqual(render.call_count, 3)
+        self.assertEqual(
+            [html for _, html in first], [html for _, html in second]
+        )
+        self.assertIn('Пост 2', first[0][1])
+
+    def test_page_is_fetched_with_one_get_many(self):
+        """Карточки страницы читаются одним обращением к кэшу."""
+        cards.render_cards(self.feed())
+        with mock.patch.object(
+            cache, 'get_many', wraps=cache.get_many
+        ) as get_many, mock.patch.object(cache, 'set_many') as set_many:
+            cards.render_cards(self.feed())
+        get_many.assert_called_once()
+        set_many.assert_not_called()
+
+    def test_version_follows_card_inputs(self):
+        """Правка, смена группы и переименование автора меняют ключ."""
+        post = self.feed().first()
+        key = cards.card_key(post)
+        post.text = 'Новый текст'
+        post.save()
+        edited = cards.card_key(self.feed().first())
+        self.assertNotEqual(edited, key)
+        self.group.title = 'Другая группа'
+        self.group.save()
+        regrouped = cards.card_key(self.feed().first())
+        self.assertNotEqual(regrouped, edited)
+        self.author.first_name = 'Лев'
+        self.author.save()
+        self.assertNotEqual(cards.card_key(self.feed().first()), regrouped)
+        html = cards.render_cards(self.feed()[:1])[0][1]
+        self.assertIn('Новый текст', html)
+        self.assertIn('Лев', html)
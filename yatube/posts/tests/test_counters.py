@@ -0,0 +1,58 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        """Счётчики постов и комментариев следуют за записями."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(
+            text='Комментарий', post=post, author=self.reader
+        )
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        Follow.objects.all().delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_reconcile_repairs_drift(self):
+        """Команда сверки чинит разошедшиеся счётчики."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Post.objects.bulk_create([Post(text='Пост 2', author=self.author)])
+        Comment.objects.bulk_create(
+            [Comment(text='Комментарий', post=post, author=self.reader)]
+        )
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+        self.assertIn('пользователей 1, постов 1', out.getvalue())
@@ -0,0 +1,156 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import warnings
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.importer import RECORD_TYPES
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author,
+                group=self.group if number % 2 else None,
+                text=f'Пост номер {number}',
+            )
+            for number in range(10)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def export(self, *args, **options):
+        out = StringIO()
+        call_command('export_yatube', self.directory, *args, stdout=out,
+                     **options)
+        return out.getvalue()
+
+    def read_jsonl(self, pattern):
+        records = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith(pattern):
+                path = os.path.join(self.directory, name)
+                with gzip.open(path, 'rt', encoding='utf-8') as stream:
+                    records.extend(json.loads(line) for line in stream)
+        return records
+
+    def test_gzip_shards_in_pk_order(self):
+        """Записи идут по первичному ключу и делятся на файлы по размеру."""
+        out = self.export(types=['post'], gzip=True, shard_size=200,
+                          batch_size=3)
+        files = sorted(os.listdir(self.directory))
+        self.assertGreater(len(files), 1)
+        self.assertTrue(all(name.endswith('.jsonl.gz') for name in files))
+        self.assertIn(f'post: 10 записей в {len(files)} файлах', out)
+        records = self.read_jsonl('post-')
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.pk for post in self.posts],
+        )
+        self.assertEqual(records[1]['group'], 'group')
+        self.assertIsNone(records[0]['group'])
+        self.assertEqual(records[0]['author'], 'author')
+
+    def test_csv_shards_repeat_header(self):
+        self.export(types=['post'], format='csv', shard_size=150)
+        for name in os.listdir(self.directory):
+            with open(os.path.join(self.directory, name),
+                      encoding='utf-8', newline='') as stream:
+                header = next(csv.reader(stream))
+            self.assertEqual(
+                header, ['id', 'author', 'group', 'text', 'pub_date', 'image']
+            )
+
+    def test_incremental_export_by_watermark(self):
+        """Повторная выгрузка с меткой берёт только новые посты."""
+        watermark = os.path.join(self.directory, 'watermark.json')
+        first = os.path.join(self.directory, 'first')
+        second = os.path.join(self.directory, 'second')
+        call_command('export_yatube', first, '--gzip', types=['post'],
+                     watermark=watermark, stdout=StringIO())
+        with open(watermark) as stream:
+            marks = json.load(stream)
+        self.assertEqual(marks['post'], self.posts[-1].pub_date.isoformat())
+        Post.objects.create(author=self.author, text='Новый пост')
+        call_command('export_yatube', second, '--gzip', types=['post'],
+                     watermark=watermark, stdout=StringIO())
+        with gzip.open(os.path.join(second, 'post.jsonl.gz'), 'rt') as stream:
+            texts = [json.loads(line)['text'] for line in stream]
+        self.assertEqual(texts, [self.posts[-1].text, 'Новый пост'])
+
+    def test_export_round_trip_through_import(self):
+        """Выгрузка загружается обратно командой import_yatube."""
+        self.export()
+        paths = [
+            os.path.join(self.directory, f'{record_type}.jsonl')
+            for record_type in ('user', 'group', 'post', 'comment', 'follow')
+        ]
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        call_command('import_yatube', *paths, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            [post.text for post in self.posts],
+        )
+        self.assertEqual(Comment.objects.get().post_id, self.posts[0].pk)
+        self.assertTrue(Follow.objects.exists())
+
+    def test_full_and_overlapping_incremental_import(self):
+        """Полная и пересекающаяся с ней инкрементальная выгрузки
+        загружаются подряд без дублей и конфликтов ключей."""
+        watermark = os.path.join(self.directory, 'watermark.json')
+        full = os.path.join(self.directory, 'full')
+        delta = os.path.join(self.directory, 'delta')
+        call_command('export_yatube', full, watermark=watermark,
+                     stdout=StringIO())
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        Comment.objects.create(
+            post=new_post, author=self.reader, text='Второй комментарий'
+        )
+        call_command('export_yatube', delta, types=['post', 'comment'],
+                     watermark=watermark, stdout=StringIO())
+        Post.objects.all().delete()
+        for directory in (full, delta):
+            paths = [
+                os.path.join(directory, f'{record_type}.jsonl')
+                for record_type in RECORD_TYPES
+                if os.path.exists(
+                    os.path.join(directory, f'{record_type}.jsonl')
+                )
+            ]
+            out = StringIO()
+            call_command('import_yatube', *paths, stdout=out)
+        self.assertIn('post 1, comment 1', out.getvalue())
+        self.assertIn('уже были в базе: 2', out.getvalue())
+        self.assertEqual(Post.objects.count(), 11)
+        self.assertEqual(
+            sorted(Comment.objects.values_list('text', flat=True)),
+            ['Второй комментарий', 'Комментарий'],
+        )
+        self.assertEqual(Post.objects.get(pk=new_post.pk).comments_count, 1)
+
+    def test_naive_since_is_utc(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            self.export(types=['post'], since='2000-01-01T00:00:00')
+        with open(os.path.join(self.directory, 'post.jsonl')) as stream:
+            self.assertEqual(len(stream.readlines()), 10)
@@ -0,0 +1,134 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.cards import render_cards
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FOLLOW_URL = reverse('posts:follow_index')
+
+
+class FeedCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tolstoy = User.objects.create_user(username='tolstoy')
+        cls.chekhov = User.objects.create_user(username='chekhov')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other_reader = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Проза', slug='prose', description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Поэзия', slug='poetry', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.tolstoy)
+        Follow.objects.create(user=cls.other_reader, author=cls.chekhov)
+        cls.post = Post.objects.create(
+            text='Война и мир', author=cls.tolstoy, group=cls.group
+        )
+        Post.objects.create(text='Вишнёвый сад', author=cls.chekhov)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.other_client = Client()
+        self.other_client.force_login(self.other_reader)
+
+    def page(self, client, url=FOLLOW_URL):
+        return client.get(url).content.decode()
+
+    def test_feeds_are_scoped_by_user(self):
+        """Ленты разных пользователей не делят закэшированный фрагмент."""
+        self.assertIn('Война и мир', self.page(self.reader_client))
+        other = self.page(self.other_client)
+        self.assertIn('Вишнёвый сад', other)
+        self.assertNotIn('Война и мир', other)
+
+    def test_unchanged_feed_is_served_from_cache(self):
+        """Без изменений лента не перерисовывается."""
+        self.page(self.reader_client)
+        with mock.patch(
+            'posts.templatetags.post_cards.render_cards',
+            wraps=render_cards,
+        ) as render:
+            self.page(self.reader_client)
+        render.assert_not_called()
+
+    def test_new_post_resets_followers_feed(self):
+        """Новый пост автора сразу виден подписчику."""
+        self.page(self.reader_client)
+        self.page(self.other_client)
+        Post.objects.create(text='Анна Каренина', author=self.tolstoy)
+        self.assertIn('Анна Каренина', self.page(self.reader_client))
+        with mock.patch(
+            'posts.templatetags.post_cards.render_cards',
+            wraps=render_cards,
+        ) as render:
+            self.page(self.other_client)
+        render.assert_not_called()
+
+    def test_follow_changes_reset_feed(self):
+        """Подписка и отписка сразу меняют ленту."""
+        self.page(self.reader_client)
+        follow = Follow.objects.create(user=self.reader, author=self.chekhov)
+        self.assertIn('Вишнёвый сад', self.page(self.reader_client))
+        follow.delete()
+        self.assertNotIn('Вишнёвый сад', self.page(self.reader_client))
+
+    def test_edits_and_comments_reset_feeds(self):
+        """Правка поста и новый комментарий видны в закэшированных лентах."""
+        group_url = reverse('posts:group_list', args=(self.group.slug,))
+        other_group_url = reverse(
+            'posts:group_list', args=(self.other_group.slug,)
+        )
+        self.page(self.reader_client)
+        self.page(self.reader_client, group_url)
+        self.page(self.reader_client, other_group_url)
+        Comment.objects.create(
+            text='Комментарий', post=self.post, author=self.reader
+        )
+        self.assertIn('Комментариев: 1', self.page(self.reader_client))
+        self.post.text = 'Война и мир, том второй'
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertIn('том второй', self.page(self.reader_client))
+        self.assertNotIn(
+            'Война и мир', self.page(self.reader_client, group_url)
+        )
+        self.assertIn(
+            'том второй', self.page(self.reader_client, other_group_url)
+        )
+
+    def test_comment_does_not_reset_generations(self):
+        """Комментарий меняет счётчик в ленте без сброса генераций."""
+        self.page(self.reader_client)
+        with mock.patch('posts.feed_cache.bump') as bump:
+            Comment.objects.create(
+                text='Комментарий', post=self.post, author=self.reader
+            )
+        bump.assert_not_called()
+        self.assertIn('Комментариев: 1', self.page(self.reader_client))
+
+    def test_hidden_user_fields_keep_feeds(self):
+        """Смена пароля и вход не сбрасывают закэшированные ленты."""
+        with mock.patch('posts.feed_cache.bump') as bump:
+            self.tolstoy.set_password('new-password')
+            self.tolstoy.save()
+            self.tolstoy.save(update_fields=['last_login'])
+            self.group.description = 'Новое описание'
+            self.group.save()
+        bump.assert_not_called()
+
+    def test_renames_reset_all_feeds(self):
+        """Новое имя автора видно в уже закэшированной ленте."""
+        self.page(self.reader_client)
+        self.tolstoy.first_name = 'Лев'
+        self.tolstoy.last_name = 'Толстой'
+        self.tolstoy.save()
+        self.assertIn('Лев Толстой', self.page(self.reader_client))
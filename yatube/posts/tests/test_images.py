@@ -0,0 +1,68 @@
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.images import normalize_image
+
+ORIENTATION = 0x0112
+ROTATED_90 = 6
+
+
+def make_upload(name, size, mode='RGB', fmt='JPEG', exif=None):
+    image = Image.new(mode, size, color='red')
+    output = BytesIO()
+    options = {'exif': exif} if exif is not None else {}
+    image.save(output, fmt, **options)
+    return SimpleUploadedFile(name, output.getvalue(), f'image/{fmt.lower()}')
+
+
+@override_settings(IMAGE_MAX_SIDE=200, IMAGE_MAX_PIXELS=10 ** 6)
+class NormalizeImageTests(SimpleTestCase):
+    def test_downsizes_rotates_and_strips_metadata(self):
+        """Фото вписывается в лимит, поворачивается и теряет EXIF."""
+        exif = Image.Exif()
+        exif[ORIENTATION] = ROTATED_90
+        upload = make_upload('photo.jpeg', (600, 300), exif=exif.tobytes())
+        result = Image.open(normalize_image(upload))
+        self.assertEqual(result.format, 'JPEG')
+        self.assertEqual(result.size, (100, 200))
+        self.assertNotIn('exif', result.info)
+
+    def test_transparency_is_kept_in_png(self):
+        """Картинка с прозрачностью остаётся PNG."""
+        upload = make_upload('logo.png', (50, 50), mode='RGBA', fmt='PNG')
+        normalized = normalize_image(upload)
+        self.assertEqual(normalized.name, 'logo.png')
+        self.assertEqual(Image.open(normalized).mode, 'RGBA')
+
+    def test_rejects_too_many_pixels(self):
+        """Слишком большое по пикселям изображение отклоняется."""
+        upload = make_upload('huge.png', (1001, 1000), fmt='PNG')
+        with self.assertRaises(ValidationError):
+            normalize_image(upload)
+
+    def test_rejects_truncated_image(self):
+        """Обрезанный файл отклоняется ошибкой формы, а не падением."""
+        output = BytesIO()
+        Image.effect_noise((600, 300), 50).convert('RGB').save(output, 'JPEG')
+        truncated = SimpleUploadedFile(
+            'photo.jpeg', output.getvalue()[:20000], 'image/jpeg'
+        )
+        form = PostForm(data={'text': 'Текст'}, files={'image': truncated})
+        self.assertIn('image', form.errors)
+
+    def test_post_form_normalizes_upload(self):
+        """Форма поста сохраняет уже нормализованную картинку."""
+        upload = make_upload('photo.png', (400, 100), fmt='PNG')
+        form = PostForm(data={'text': 'Текст'}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        image = form.cleaned_data['image']
+        self.assertEqual(image.name, 'photo.jpg')
+        self.assertEqual(Image.open(image).size, (200, 50))
+        huge = make_upload('huge.png', (1001, 1000), fmt='PNG')
+        form = PostForm(data={'text': 'Текст'}, files={'image': huge})
+        self.assertIn('image', form.errors)
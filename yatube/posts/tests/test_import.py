@@ -0,0 +1,157 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import search
+from posts.importer import Importer
+from posts.models import Comment, Follow, ImportCheckpoint, Post, User
+
+
+def users_and_posts():
+    yield {'type': 'user', 'username': 'leo', 'first_name': 'Лев'}
+    yield {'type': 'user', 'username': 'fan'}
+    yield {'type': 'group', 'slug': 'prose', 'title': 'Проза'}
+    for number in range(1, 6):
+        yield {
+            'type': 'post', 'id': 100 + number, 'author': 'leo',
+            'group': 'prose', 'text': f'Глава {number} о войне',
+            'pub_date': f'1869-01-0{number}T12:00:00',
+        }
+    yield {'type': 'comment', 'post': 101, 'author': 'fan',
+           'text': 'Прочитал', 'created': '1869-02-01T00:00:00+00:00'}
+    yield {'type': 'follow', 'user': 'fan', 'author': 'leo'}
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_jsonl(self, records, name='dump.jsonl'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            for record in records:
+                if isinstance(record, str):
+                    stream.write(record + '\n')
+                else:
+                    stream.write(json.dumps(record, ensure_ascii=False))
+                    stream.write('\n')
+        return path
+
+    def run_import(self, *args, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_yatube', *args, stdout=out, stderr=err,
+                     **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl(self):
+        """Записи грузятся с датами из источника, затем всё пересчитано."""
+        records = list(users_and_posts())
+        records.insert(3, '{не json')
+        records.append({'type': 'post', 'author': 'ghost', 'text': 'x'})
+        out, err = self.run_import(self.write_jsonl(records), chunk_size=3)
+        self.assertIn('post 5', out)
+        self.assertIn('отклонено записей: 2', out)
+        self.assertIn('dump.jsonl:4: битый JSON', err)
+        self.assertIn('нет пользователя ghost', err)
+        leo = User.objects.get(username='leo')
+        fan = User.objects.get(username='fan')
+        self.assertFalse(leo.has_usable_password())
+        post = Post.objects.get(pk=101)
+        self.assertEqual(
+            post.pub_date, datetime(1869, 1, 1, 12, tzinfo=timezone.utc)
+        )
+        self.assertEqual(post.group.slug, 'prose')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get().created.month, 2)
+        self.assertTrue(Follow.objects.filter(user=fan, author=leo).exists())
+        self.assertEqual(leo.stats.posts_count, 5)
+        self.assertEqual(leo.stats.followers_count, 1)
+        self.assertEqual(fan.timeline.count(), 5)
+        found = search.filter_matching(Post.objects.all(), 'войне')
+        self.assertEqual(found.count(), 5)
+
+    def test_import_gzipped_csv_with_type(self):
+        User.objects.create_user(username='leo')
+        path = os.path.join(self.directory, 'posts.csv.gz')
+        with gzip.open(path, 'wt', encoding='utf-8', newline='') as stream:
+            writer = csv.DictWriter(stream, ('author', 'text', 'group'))
+            writer.writeheader()
+            writer.writerow({'author': 'leo', 'text': 'Строка,\nс переносом'})
+            writer.writerow({'author': 'leo', 'text': 'Вторая'})
+        out, _ = self.run_import(path, type='post')
+        self.assertIn('post 2', out)
+        self.assertEqual(
+            set(Post.objects.values_list('text', flat=True)),
+            {'Строка,\nс переносом', 'Вторая'},
+        )
+        self.assertIsNone(Post.objects.first().group)
+
+    def test_resume_after_failure(self):
+        """После сбоя загрузка продолжается с последней записанной пачки."""
+        path = self.write_jsonl(users_and_posts())
+        with mock.patch.object(
+            Importer, 'create_comments', side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            self.run_import(path, chunk_size=6)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual(checkpoint.position, 6)
+        self.assertEqual(Post.objects.count(), 3)
+        self.run_import(path, chunk_size=6)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 1)
+        out, _ = self.run_import(path, chunk_size=6)
+        self.assertIn('post 0', out)
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_chunk_larger_than_database_batch(self):
+        """Пачка больше лимита параметров SQLite делится на несколько
+        INSERT."""
+        def records():
+            yield {'type': 'user', 'username': 'leo'}
+            for number in range(1, 1201):
+                yield {'type': 'post', 'id': number, 'author': 'leo',
+                       'text': f'Запись {number}'}
+                yield {'type': 'comment', 'post': number, 'author': 'leo',
+                       'text': 'Ответ'}
+        out, _ = self.run_import(self.write_jsonl(records()),
+                                 chunk_size=5000)
+        self.assertIn('post 1200', out)
+        self.assertEqual(Post.objects.count(), 1200)
+        self.assertEqual(Comment.objects.count(), 1200)
+
+    def test_skip_finalize_keeps_search_index_consistent(self):
+        """Индекс поиска пересобирается и без пересчёта, и после сбоя:
+        правка загруженного поста не портит таблицу FTS5."""
+        path = self.write_jsonl(users_and_posts())
+        with mock.patch.object(
+            Importer, 'create_comments', side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            self.run_import(path, chunk_size=6)
+        self.assertEqual(
+            search.filter_matching(Post.objects.all(), 'войне').count(), 3
+        )
+        self.run_import(path, chunk_size=6, skip_finalize=True)
+        found = search.filter_matching(Post.objects.all(), 'войне')
+        self.assertEqual(found.count(), 5)
+        post = Post.objects.get(pk=105)
+        post.text = 'Глава 5 о мире'
+        post.save()
+        self.assertEqual(
+            list(search.filter_matching(Post.objects.all(), 'мире')), [post]
+        )
+        self.assertEqual(
+            search.filter_matching(Post.objects.all(), 'войне').count(), 4
+        )
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts import media
+from posts.media import image_storage
+from posts.models import MediaBlob, Post
+from posts.storage import is_content_name
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+
+    def create_post(self, content, name='meme.gif'):
+        return Post.objects.create(
+            text='Пост',
+            author=self.author,
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые загрузки хранятся одним файлом с общим счётчиком."""
+        first = self.create_post(b'GIF89a same')
+        second = self.create_post(b'GIF89a same', name='copy.GIF')
+        other = self.create_post(b'GIF89a other')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertTrue(is_content_name(first.image.name))
+        digest = os.path.basename(first.image.name)
+        self.assertEqual(
+            first.image.name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}'
+        )
+        self.assertEqual(
+            MediaBlob.objects.get(name=first.image.name).refcount, 2
+        )
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется, когда на него не ссылается ни один пост."""
+        first = self.create_post(b'GIF89a same')
+        second = self.create_post(b'GIF89a same')
+        name = first.image.name
+        storage = image_storage()
+        first.delete()
+        self.assertTrue(storage.exists(name))
+        second.image = SimpleUploadedFile('new.gif', b'GIF89a new')
+        second.save()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertEqual(
+            MediaBlob.objects.get(name=second.image.name).refcount, 1
+        )
+
+    def test_reference_before_deferred_delete_keeps_file(self):
+        """Файл остаётся, если на него сослались до отложенного удаления."""
+        post = self.create_post(b'GIF89a same')
+        name = post.image.name
+        deferred = []
+        with mock.patch.object(
+            media.transaction, 'on_commit', side_effect=deferred.append
+        ):
+            post.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 0)
+        again = self.create_post(b'GIF89a same')
+        for callback in deferred:
+            callback()
+        self.assertEqual(again.image.name, name)
+        self.assertTrue(image_storage().exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+
+    def test_recount_is_set_based(self):
+        """Пересчёт чинит счётчики числом запросов, не зависящим от файлов."""
+        names = [f'posts/ab/cd/{index:064x}.gif' for index in range(50)]
+        Post.objects.bulk_create(
+            Post(text='Пост', author=self.author, image=name)
+            for name in names + names[:10] + ['posts/legacy.gif']
+        )
+        MediaBlob.objects.bulk_create([
+            MediaBlob(name=names[0], refcount=7),
+            MediaBlob(name=f'posts/ab/cd/{"f" * 64}.gif', refcount=1),
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(media.recount_blobs(), len(names))
+        self.assertLessEqual(len(queries), 6)
+        counts = dict(MediaBlob.objects.values_list('name', 'refcount'))
+        self.assertEqual(set(counts), set(names))
+        self.assertEqual(counts[names[0]], 2)
+        self.assertEqual(counts[names[-1]], 1)
+
+    def test_dedupe_command_moves_legacy_files(self):
+        """Команда переносит старые файлы и схлопывает дубликаты."""
+        storage = image_storage()
+        legacy = {
+            'posts/one.gif': b'GIF89a same',
+            'posts/two.gif': b'GIF89a same',
+            'posts/three.gif': b'GIF89a other',
+        }
+        for name, content in legacy.items():
+            super(type(storage), storage).save(name, ContentFile(content))
+            Post.objects.create(text='Пост', author=self.author, image=name)
+        Post.objects.create(
+            text='Пост', author=self.author, image='posts/missing.gif'
+        )
+        out = StringIO()
+        call_command('dedupe_media', batch_size=2, stdout=out)
+        self.assertIn(
+            'Перенесено: 3, из них дубликатов: 1, файлов нет: 1, '
+            'удалено старых файлов: 3', out.getvalue()
+        )
+        names = set(
+            Post.objects.exclude(image='posts/missing.gif').values_list(
+                'image', flat=True
+            )
+        )
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all(is_content_name(name) for name in names))
+        for name in legacy:
+            self.assertFalse(storage.exists(name))
+        self.assertEqual(
+            sorted(MediaBlob.objects.values_list('refcount', flat=True)),
+            [1, 2],
+        )
@@ -0,0 +1,138 @@
+import re
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.timeline import MERGE_STRATEGIES
+
+# Запросы, которым индекс не поможет, и почему.
+EXPECTED_SCANS = (
+    # Список групп для выпадающего меню формы читается целиком.
+    re.compile(r'^SELECT [^;]+ FROM "posts_group"$'),
+    # Результаты полнотекстового поиска сортируются по релевантности.
+    re.compile(r'\bMATCH\b.+\bORDER BY rank\b'),
+    # Склейка выборок тяжёлых авторов в ленте подписок сортирует не
+    # больше страницы строк на автора; сами выборки — те же запросы,
+    # что и в стратегии per_author, и проверяются там.
+    re.compile(r'\bUNION ALL\b'),
+)
+
+
+def bad_steps(sql):
+    """Шаги плана без индекса: полный просмотр таблицы или сортировка.
+
+    Просмотр результата подзапроса (CO-ROUTINE, MATERIALIZE) — не
+    просмотр таблицы: сам подзапрос проверяется своими шагами.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        plan = [row[-1] for row in cursor.fetchall()]
+    subqueries = {
+        step.split(' ', 1)[1] for step in plan
+        if step.startswith(('CO-ROUTINE ', 'MATERIALIZE '))
+    }
+    return [
+        step for step in plan
+        if 'TEMP B-TREE' in step
+        or re.match(r'SCAN \S+$', step)
+        and step != 'SCAN CONSTANT ROW'
+        and step[len('SCAN '):] not in subqueries
+    ]
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц идут по индексам и не сортируют во временных
+    B-деревьях."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed', stdout=StringIO(), users=30, groups=3, posts=200,
+            comments=300, follows=5, image_ratio=0,
+        )
+        cls.reader = User.objects.annotate(
+            total=Count('follower')
+        ).order_by('-total').first()
+        cls.author = User.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        cls.post = Post.objects.annotate(
+            total=Count('comments')
+        ).order_by('-total').first()
+        cls.group = Group.objects.first()
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def assert_indexed(self, method, url, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            if any(pattern.search(sql) for pattern in EXPECTED_SCANS):
+                continue
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(bad_steps(sql), [])
+        return response
+
+    def test_feeds_and_their_next_pages(self):
+        feeds = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:follow_index'),
+        )
+        for url in feeds:
+            page = self.assert_indexed('get', url).context['page_obj']
+            self.assert_indexed('get', f'{url}?after={page.next_cursor}')
+            self.assert_indexed('get', f'{url}?before={page.next_cursor}')
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=1)
+    def test_follow_feed_with_pulled_authors(self):
+        url = reverse('posts:follow_index')
+        for strategy in MERGE_STRATEGIES:
+            with self.subTest(strategy=strategy):
+                with self.settings(TIMELINE_MERGE_STRATEGY=strategy):
+                    response = self.assert_indexed('get', url)
+                    cursor = response.context['page_obj'].next_cursor
+                    self.assert_indexed('get', f'{url}?after={cursor}')
+
+    def test_post_pages(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        comments = self.assert_indexed('get', url).context['comments']
+        self.assert_indexed('get', f'{url}?after={comments.next_cursor}')
+        self.assert_indexed('get', reverse(
+            'posts:post_comments', args=(self.post.pk,)
+        ) + f'?after={comments.next_cursor}')
+        self.assert_indexed(
+            'get', reverse('posts:search') + '?q=' + self.post.text.split()[0]
+        )
+        self.assert_indexed('get', reverse('posts:post_create'))
+
+    def test_writes(self):
+        self.assert_indexed(
+            'post', reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assert_indexed(
+            'post', reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий'},
+        )
+        author = User.objects.exclude(pk=self.reader.pk).exclude(
+            following__user=self.reader
+        ).first()
+        self.assert_indexed(
+            'get', reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assert_indexed(
+            'get', reverse('posts:profile_unfollow', args=(author.username,))
+        )
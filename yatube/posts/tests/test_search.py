@@ -0,0 +1,142 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.search import FTS_TABLE, SearchPaginator
+
+User = get_user_model()
+
+
+def indexed_ids(text):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            'ORDER BY rowid',
+            [f'"{text}"'],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.ranked = Post.objects.create(
+            text='кот кот кот', author=cls.author, group=cls.group
+        )
+        cls.mentioned = Post.objects.create(
+            text='про кота и кот в конце длинного длинного текста',
+            author=cls.other,
+        )
+        cls.unrelated = Post.objects.create(text='собака', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def test_triggers_follow_post_text(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        self.assertEqual(indexed_ids('собака'), [self.unrelated.pk])
+        self.unrelated.text = 'хомяк'
+        self.unrelated.save()
+        self.assertEqual(indexed_ids('собака'), [])
+        self.assertEqual(indexed_ids('хомяк'), [self.unrelated.pk])
+        self.unrelated.delete()
+        self.assertEqual(indexed_ids('хомяк'), [])
+
+    def test_results_are_ranked(self):
+        """Более релевантный пост идёт первым."""
+        page_obj = self.search(q='кот')
+        self.assertEqual(
+            [post.pk for post in page_obj], [self.ranked.pk, self.mentioned.pk]
+        )
+
+    def test_filters(self):
+        """Выдачу можно сузить группой и автором."""
+        page_obj = self.search(q='кот', group='group')
+        self.assertEqual([post.pk for post in page_obj], [self.ranked.pk])
+        page_obj = self.search(q='кот', author='other')
+        self.assertEqual([post.pk for post in page_obj], [self.mentioned.pk])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 во вводе не ломают запрос."""
+        self.assertEqual(list(self.search(q='кот" OR NEAR(')), [])
+        self.assertEqual(list(self.search(q='***')), [])
+
+    def test_cursor_pages(self):
+        """Курсоры обходят выдачу без пропусков и повторов."""
+        Post.objects.bulk_create(
+            Post(text=f'кот {"слово " * i}', author=self.author)
+            for i in range(5)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        paginator = SearchPaginator('кот', 3)
+        page = paginator.get_page()
+        seen = [post.pk for post in page]
+        while page.has_next():
+            page = paginator.get_page(after=page.next_cursor)
+            seen.extend(post.pk for post in page)
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+        previous = paginator.get_page(before=page.previous_cursor)
+        self.assertEqual([post.pk for post in previous], seen[3:6])
+
+    def test_cursor_survives_index_changes(self):
+        """Новые посты меняют rank, но не сдвигают курсор выдачи."""
+        Post.objects.bulk_create(
+            Post(text=f'кот {"слово " * i}', author=self.author)
+            for i in range(5)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        paginator = SearchPaginator('кот', 3)
+        expected = [post.pk for post in SearchPaginator('кот', 10).page(1)]
+        page = paginator.get_page()
+        seen = [post.pk for post in page]
+        Post.objects.create(
+            text='длинный текст без искомого слова ' * 20, author=self.author
+        )
+        while page.has_next():
+            page = paginator.get_page(after=page.next_cursor)
+            seen.extend(post.pk for post in page)
+        self.assertEqual(seen, expected)
+
+    def test_rebuild_command(self):
+        """Команда заново наполняет индекс пачками."""
+        Post.objects.bulk_create([Post(text='попугай', author=self.author)])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+            )
+        out = StringIO()
+        call_command('rebuild_search_index', batch_size=2, stdout=out)
+        self.assertEqual(len(indexed_ids('попугай')), 1)
+        self.assertEqual(indexed_ids('собака'), [self.unrelated.pk])
+        self.assertIn('Проиндексировано постов: 4', out.getvalue())
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке ищет по индексу, а не через LIKE."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кот'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.ranked.pk, self.mentioned.pk},
+        )
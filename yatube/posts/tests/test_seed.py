@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, Sum
+from django.test import TestCase, override_settings
+
+from posts import search
+from posts.models import Comment, Follow, Group, MediaBlob, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SIZES = {
+    'users': 60,
+    'groups': 3,
+    'posts': 300,
+    'comments': 200,
+    'follows': 6,
+    'images': 2,
+    'batch_size': 70,
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        call_command('seed', stdout=StringIO(), **{**SIZES, **options})
+
+    def snapshot(self):
+        return (
+            list(User.objects.order_by('pk').values_list(
+                'username', 'first_name'
+            )),
+            list(Post.objects.order_by('pk').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date',
+                'image',
+            )),
+            list(Follow.objects.order_by('pk').values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def test_sizes_and_derived_data(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertEqual(MediaBlob.objects.count(), 2)
+        self.assertEqual(
+            User.objects.aggregate(total=Sum('stats__posts_count'))['total'],
+            300,
+        )
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comments_count'))['total'],
+            200,
+        )
+
+    def test_follow_graph_is_skewed(self):
+        """Несколько популярных авторов собирают большую часть подписок."""
+        self.seed()
+        followers = sorted(
+            User.objects.annotate(total=Count('following')).values_list(
+                'total', flat=True
+            ),
+            reverse=True,
+        )
+        self.assertGreater(followers[0], 5 * max(followers[30], 1))
+
+    def test_same_seed_gives_same_data(self):
+        self.seed(seed=7)
+        first = self.snapshot()
+        with self.assertRaises(CommandError):
+            self.seed(seed=7)
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed(seed=7)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_skip_rebuild_keeps_search_index(self):
+        """Без пересчёта индекс поиска всё равно собран: правка поста
+        не портит таблицу FTS5."""
+        self.seed(skip_rebuild=True, images=0, image_ratio=0)
+        post = Post.objects.order_by('pk').last()
+        word = post.text.split()[0]
+        found = search.filter_matching(Post.objects.all(), word)
+        self.assertIn(post, found)
+        post.text = 'Переписанный пост'
+        post.save()
+        self.assertEqual(
+            list(search.filter_matching(Post.objects.all(), 'Переписанный')),
+            [post],
+        )
@@ -0,0 +1,164 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from posts.models import Post
+from posts.templatetags.post_images import post_image
+from posts.thumbnails import generate_thumbnails, thumbnail_sizes
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear()
+        author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=author,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def variant_urls(self):
+        self.post.refresh_from_db()
+        return [
+            url for variants in self.post.image_manifest.values()
+            for _, _, url in variants
+        ]
+
+    def test_thumbnails_exist_after_generation(self):
+        """Варианты появляются в манифесте только после рендера."""
+        self.assertEqual(self.variant_urls(), [])
+        self.assertTrue(generate_thumbnails(self.post.image.name))
+        urls = self.variant_urls()
+        self.assertEqual(len(urls), len(thumbnail_sizes(
+            self.post.image.name, self.post.image_width
+        )))
+        storage = Post.image.field.storage
+        for url in urls:
+            self.assertNotEqual(url, self.post.image.url)
+            self.assertTrue(
+                storage.exists(url[len(settings.MEDIA_URL):])
+            )
+
+    def test_concurrent_generation_is_skipped(self):
+        """Изображение, которое уже рендерится, второй раз не берётся."""
+        cache.add(f'thumbnail:lock:{self.post.image.name}', True)
+        self.assertFalse(generate_thumbnails(self.post.image.name))
+        self.assertEqual(self.variant_urls(), [])
+
+    def test_backfill_command(self):
+        """Команда создаёт миниатюры для уже загруженных изображений."""
+        out = StringIO()
+        call_command('generate_thumbnails', workers=0, stdout=out)
+        self.assertIn('Обработано изображений: 1', out.getvalue())
+        self.assertTrue(self.variant_urls())
+        call_command('generate_thumbnails', workers=0, force=True,
+                     stdout=out)
+        self.assertTrue(self.variant_urls())
+
+    def test_responsive_markup(self):
+        """Готовые варианты выводятся через srcset с размерами и заглушкой."""
+        photo = BytesIO()
+        Image.new('RGB', (1400, 700), 'blue').save(photo, 'JPEG')
+        self.post.image = SimpleUploadedFile('photo.jpg', photo.getvalue())
+        self.post.save()
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (1400, 700)
+        )
+        content = self.client.get(url).content.decode()
+        self.assertIn(f'<img src="{self.post.image.url}"', content)
+        self.assertIn('width="1400" height="700"', content)
+        generate_thumbnails(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertTrue(
+            self.post.image_placeholder.startswith('data:image/webp;base64,')
+        )
+        content = self.client.get(url).content.decode()
+        self.assertIn('<source type="image/webp"', content)
+        for width in (320, 640, 960, 1280):
+            self.assertIn(f'.webp {width}w', content)
+            self.assertIn(f'.jpg {width}w', content)
+        self.assertIn('width="1280" height="640"', content)
+        self.assertIn(self.post.image_placeholder, content)
+
+    def test_small_image_is_not_upscaled(self):
+        """Картинка уже 1280 даёт только варианты не шире себя."""
+        photo = BytesIO()
+        Image.new('RGB', (700, 350), 'blue').save(photo, 'JPEG')
+        self.post.image = SimpleUploadedFile('photo.jpg', photo.getvalue())
+        self.post.save()
+        generate_thumbnails(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            [width for width, _, _ in self.post.image_manifest['webp']],
+            [320, 640, 700],
+        )
+        content = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        ).content.decode()
+        self.assertIn('width="700" height="350"', content)
+        self.assertNotIn('960w', content)
+
+    def test_markup_rendered_from_metadata_only(self):
+        """Разметка картинки собирается без KVStore и хранилища."""
+        generate_thumbnails(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            [key for key in self.post.image_manifest], ['webp', 'img']
+        )
+        storage = Post.image.field.storage
+        with mock.patch.object(default.kvstore, 'get') as kvstore_get, \
+                mock.patch.object(storage, 'exists') as exists:
+            content = render_to_string(
+                'posts/includes/post_image.html', post_image(self.post)
+            )
+        kvstore_get.assert_not_called()
+        exists.assert_not_called()
+        width, height, src = self.post.image_manifest['webp'][0]
+        self.assertIn(f'{src} {width}w', content)
+
+    def test_backfill_missing_metadata(self):
+        """С --missing команда берёт только посты без манифеста."""
+        Post.objects.update(image_variants='', image_width=None)
+        out = StringIO()
+        call_command('generate_thumbnails', workers=0, missing=True,
+                     stdout=out)
+        self.assertIn('Обработано изображений: 1', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_width, 2)
+        self.assertTrue(self.post.image_manifest)
+        call_command('generate_thumbnails', workers=0, missing=True,
+                     stdout=out)
+        self.assertIn('Обработано изображений: 0', out.getvalue())
@@ -0,0 +1,162 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import follow_paginator, pull_authors, trim_timelines
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+
+    def timeline_posts(self):
+        return list(
+            self.reader.timeline.values_list('post_id', flat=True)
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.other)
+        self.assertEqual(self.timeline_posts(), [post.pk])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка добавляет посты автора, отписка их убирает."""
+        old = Post.objects.create(text='Старый пост', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.timeline_posts(), [old.pk])
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.timeline_posts(), [])
+
+    @override_settings(TIMELINE_LENGTH=3)
+    def test_timeline_is_capped(self):
+        """Лента хранит не больше TIMELINE_LENGTH постов."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            for i in range(5)
+        ]
+        self.assertEqual(
+            self.timeline_posts(), [post.pk for post in posts[:1:-1]]
+        )
+
+    def test_trim_keeps_posts_with_boundary_date(self):
+        """Посты с датой граничного не теряются при обрезке ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            for i in range(5)
+        ]
+        TimelineEntry.objects.update(pub_date=posts[0].pub_date)
+        with self.settings(TIMELINE_LENGTH=3):
+            trim_timelines([self.reader.pk])
+        self.assertEqual(
+            self.timeline_posts(), [post.pk for post in posts[:1:-1]]
+        )
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_trim_is_one_query_per_batch(self):
+        """Ленты обрезаются пачками одним запросом на пачку, без запроса
+        на каждую строку."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            for i in range(4)
+        ]
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(user=self.reader, post=post, author=self.author,
+                          pub_date=post.pub_date)
+            for post in posts[:2]
+        )
+        with mock.patch('posts.timeline.TRIM_BATCH_SIZE', 1):
+            with self.assertNumQueries(2):
+                trim_timelines([self.reader.pk, self.other.pk])
+        for user in (self.reader, self.other):
+            self.assertEqual(
+                list(user.timeline.values_list('post_id', flat=True)),
+                [post.pk for post in posts[:1:-1]],
+            )
+
+    def test_rebuild_command(self):
+        """Команда пересобирает ленты по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_posts(), [post.pk])
+
+
+@override_settings(TIMELINE_PULL_THRESHOLD=1)
+class HybridTimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.fan, author=cls.star)
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=(self.star, self.author)[i % 2]
+            )
+            for i in range(6)
+        ]
+
+    def test_popular_author_is_not_fanned_out(self):
+        """Посты популярного автора не пишутся в ленты."""
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Лента подписок сливает свою ленту и популярных авторов."""
+        for strategy in ('union', 'per_author'):
+            with self.subTest(strategy=strategy):
+                with self.settings(TIMELINE_MERGE_STRATEGY=strategy):
+                    paginator = follow_paginator(self.reader, 4)
+                    first = paginator.get_page()
+                    second = paginator.get_page(after=first.next_cursor)
+                self.assertEqual(
+                    list(first) + list(second), self.posts[::-1]
+                )
+                self.assertFalse(second.has_next())
+
+    def test_pull_authors_read_follower_counters(self):
+        """Популярные авторы ищутся по счётчикам, без подсчёта подписок."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(pull_authors(), {self.star.pk})
+        self.assertEqual(len(queries), 1)
+        self.assertIn('posts_userstats', queries[0]['sql'])
+        self.assertNotIn('posts_follow', queries[0]['sql'])
+
+    def test_pushed_duplicates_are_merged(self):
+        """Пост, успевший попасть в ленту, не показывается дважды."""
+        TimelineEntry.objects.create(
+            user=self.reader,
+            post=self.posts[0],
+            author=self.star,
+            pub_date=self.posts[0].pub_date,
+        )
+        page = follow_paginator(self.reader, 10).get_page()
+        self.assertEqual(list(page), self.posts[::-1])
@@ -1,16 +1,32 @@
+import shutil
+import tempfile
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post
+from posts.models import Comment, Follow, Group, Post
+from posts.paginator import encode_cursor
+from posts.views import NUM_OF_COMMENTS
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostsPagesTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -182,6 +198,8 @@ class PostsPagesTests(TestCase):
 
     def test_index_cache(self):
         """Кэширование главной страницы работает."""
+        cache.clear()
+        self.authorized_client.get(self.INDEX_URL)
         Post.objects.create(
             text='Test text',
             author=self.user,
@@ -308,3 +326,167 @@ class PaginatorTests(TestCase):
                     len(response_second.context['page_obj']),
                     self.ADDPOSTS
                 )
+
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и предыдущую страницы."""
+        for url in [
+            self.INDEX_URL,
+            self.GROUP_LIST_URL,
+            self.PROFILE_URL
+        ]:
+            with self.subTest(url=url):
+                first = self.author_client.get(url).context['page_obj']
+                self.assertFalse(first.has_previous())
+                self.assertTrue(first.has_next())
+                second = self.author_client.get(
+                    f'{url}?after={first.next_cursor}'
+                ).context['page_obj']
+                self.assertEqual(len(second), self.ADDPOSTS)
+                self.assertTrue(second.has_previous())
+                self.assertFalse(second.has_next())
+                back = self.author_client.get(
+                    f'{url}?before={second.previous_cursor}'
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+                self.assertFalse(back.has_previous())
+
+    def assert_directions_cached_apart(self, url, client=None):
+        """Страницы после курсора и до него не делят запись в кэше."""
+        client = client or self.author_client
+        cache.clear()
+        first = client.get(url).context['page_obj']
+        second = client.get(f'{url}?after={first.next_cursor}')
+        # Курсор глубже первой страницы: у обеих страниц номер 2.
+        post = second.context['page_obj'][1]
+        cursor = encode_cursor(post.pub_date, post.pk)
+        for direction in ('after', 'before'):
+            response = client.get(f'{url}?{direction}={cursor}')
+            with self.subTest(url=url, direction=direction):
+                for post in response.context['page_obj']:
+                    self.assertContains(response, reverse(
+                        'posts:post_detail', args=(post.pk,)
+                    ))
+
+    def test_cached_pages_keep_direction(self):
+        self.assert_directions_cached_apart(self.INDEX_URL)
+        self.assert_directions_cached_apart(self.GROUP_LIST_URL)
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        client = Client()
+        client.force_login(reader)
+        self.assert_directions_cached_apart(
+            reverse('posts:follow_index'), client
+        )
+
+    def test_cursor_page_without_count(self):
+        """Курсорная страница выбирается без COUNT и OFFSET."""
+        first = self.author_client.get(self.INDEX_URL).context['page_obj']
+        with CaptureQueriesContext(connection) as context:
+            self.author_client.get(
+                f'{self.INDEX_URL}?after={first.next_cursor}'
+            )
+        for query in context.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        response = self.author_client.get(f'{self.INDEX_URL}?after=broken')
+        self.assertEqual(
+            len(response.context['page_obj']), self.POSTS_PER_PAGE
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_feed_queries_do_not_grow(self):
+        """Число запросов ленты не зависит от числа постов."""
+        for url in [
+            self.INDEX_URL,
+            self.GROUP_LIST_URL,
+            self.PROFILE_URL
+        ]:
+            with self.subTest(url=url):
+                self.author_client.get(url)
+                cache.clear()
+                with CaptureQueriesContext(connection) as full_page:
+                    self.author_client.get(url)
+                cache.clear()
+                with CaptureQueriesContext(connection) as short_page:
+                    self.author_client.get(f'{url}?page=2')
+                self.assertEqual(len(full_page), len(short_page))
+
+
+class CommentPaginationTests(TestCase):
+    ADDCOMMENTS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(author=cls.author, post=cls.post, text=f'Комментарий {i}')
+            for i in range(NUM_OF_COMMENTS + cls.ADDCOMMENTS)
+        )
+        cls.POST_DETAIL_URL = reverse(
+            'posts:post_detail', args=(cls.post.pk,)
+        )
+        cls.POST_COMMENTS_URL = reverse(
+            'posts:post_comments', args=(cls.post.pk,)
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_first_page_inline_and_rest_in_fragment(self):
+        """Первая страница комментариев на странице поста, остальные —
+        во фрагменте по курсору."""
+        response = self.author_client.get(self.POST_DETAIL_URL)
+        first = response.context['comments']
+        self.assertEqual(len(first), NUM_OF_COMMENTS)
+        self.assertTrue(first.has_next())
+        fragment_url = f'{self.POST_COMMENTS_URL}?after={first.next_cursor}'
+        self.assertContains(response, fragment_url)
+        response = self.author_client.get(fragment_url)
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        rest = response.context['comments']
+        self.assertEqual(len(rest), self.ADDCOMMENTS)
+        self.assertFalse(rest.has_next())
+        self.assertEqual(
+            [comment.pk for comment in [*first, *rest]],
+            list(Comment.objects.order_by('-created', '-pk').values_list(
+                'pk', flat=True
+            )),
+        )
+
+    def test_comments_page_is_one_query(self):
+        """Комментарии выбираются вместе с авторами одним запросом."""
+        first = self.author_client.get(self.POST_DETAIL_URL).context[
+            'comments'
+        ]
+        with CaptureQueriesContext(connection) as context:
+            self.author_client.get(
+                f'{self.POST_COMMENTS_URL}?after={first.next_cursor}'
+            )
+        self.assertEqual(len(context), 1)
+
+    def test_fragment_of_missing_post(self):
+        """Фрагмент комментариев несуществующего поста — 404."""
+        response = self.author_client.get(
+            reverse('posts:post_comments', args=(self.post.pk + 1,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_add_comment_redirects_to_it(self):
+        """После комментария открывается страница с ним."""
+        response = self.author_client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Новый комментарий'},
+        )
+        comment = Comment.objects.get(text='Новый комментарий')
+        self.assertRedirects(
+            response, f'{self.POST_DETAIL_URL}#comment-{comment.pk}'
+        )
+        response = self.author_client.get(self.POST_DETAIL_URL)
+        self.assertIn(comment, response.context['comments'])
+        self.assertContains(response, f'id="comment-{comment.pk}"')
@@ -0,0 +1,169 @@
+import base64
+import json
+from io import BytesIO
+
+from django.core.cache import cache
+from PIL import Image, ImageFilter
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from jobs.queue import enqueue
+
+from . import feed_cache
+from .models import Post
+
+# Ширины адаптивных вариантов картинки поста для srcset.
+VARIANT_WIDTHS = (320, 640, 960, 1280)
+VARIANT_QUALITY = 80
+PLACEHOLDER_SIZE = 16
+
+LOCK_TIMEOUT = 60 * 5
+
+THUMBNAIL_PRIORITY = 10
+
+
+def fallback_format(name):
+    """Формат для браузеров без WebP: PNG сохраняет прозрачность."""
+    return 'PNG' if name.lower().endswith('.png') else 'JPEG'
+
+
+def variant_widths(source_width):
+    """Ширины вариантов не больше исходника.
+
+    Картинка уже самой крупной ширины добавляет свою ширину последним
+    вариантом, чтобы srcset доходил до полного размера.
+    """
+    widths = [width for width in VARIANT_WIDTHS if width < source_width]
+    if source_width < VARIANT_WIDTHS[-1]:
+        widths.append(source_width)
+    return widths
+
+
+def thumbnail_sizes(name, source_width):
+    """Все варианты картинки: каждая ширина в WebP и в запасном формате.
+
+    Варианты не увеличиваются: ``upscale`` у sorl по умолчанию включён
+    и растянул бы маленькую картинку до всех ширин.
+    """
+    return [
+        (str(width), {
+            'format': image_format,
+            'quality': VARIANT_QUALITY,
+            'upscale': False,
+        })
+        for image_format in ('WEBP', fallback_format(name))
+        for width in variant_widths(source_width)
+    ]
+
+
+def inspect_source(source):
+    """Размеры исходника и его крошечная размытая копия в виде data URI."""
+    with source.storage.open(source.name) as content:
+        image = Image.open(content)
+        size = image.size
+        image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        image = image.convert('RGB').filter(ImageFilter.GaussianBlur(1))
+    output = BytesIO()
+    image.save(output, 'WEBP', quality=30)
+    encoded = base64.b64encode(output.getvalue()).decode()
+    return size, f'data:image/webp;base64,{encoded}'
+
+
+def build_manifest(thumbnails):
+    """Компактный JSON вариантов: {"webp"|"img": [[w, h, url], ...]}.
+
+    Варианты одной ширины схлопываются на случай, если два размера
+    дали одну и ту же картинку.
+    """
+    manifest = {}
+    for image_format, thumbnail in thumbnails:
+        key = 'webp' if image_format == 'WEBP' else 'img'
+        manifest.setdefault(key, {})[thumbnail.width] = [
+            thumbnail.width, thumbnail.height, thumbnail.url
+        ]
+    return json.dumps(
+        {
+            key: [variants[width] for width in sorted(variants)]
+            for key, variants in manifest.items()
+        },
+        separators=(',', ':'),
+    )
+
+
+def generate_thumbnails(name):
+    """Рендерит варианты картинки и записывает их описание в посты.
+
+    Блокировка в кэше не даёт двум воркерам рендерить одно и то же
+    изображение одновременно.
+    """
+    lock = f'thumbnail:lock:{name}'
+    if not cache.add(lock, True, LOCK_TIMEOUT):
+        return False
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    try:
+        (width, height), placeholder = inspect_source(source)
+        thumbnails = [
+            (options['format'],
+             default.backend.get_thumbnail(source, geometry, **options))
+            for geometry, options in thumbnail_sizes(name, width)
+        ]
+        store_image_metadata(
+            name,
+            image_width=width,
+            image_height=height,
+            image_placeholder=placeholder,
+            image_variants=build_manifest(thumbnails),
+        )
+    finally:
+        cache.delete(lock)
+    return True
+
+
+def store_image_metadata(name, **fields):
+    """Записывает описание картинки всем постам, которые на неё ссылаются.
+
+    Вместе с ним меняется версия карточки, а ленты с этими постами
+    сбрасываются: в них появляется разметка с вариантами.
+    """
+    posts = Post.objects.filter(image=name).exclude(**fields)
+    changed = list(posts.values_list('author_id', 'group_id'))
+    if not changed:
+        return
+    posts.update(**fields)
+    for author_id, group_id in set(changed):
+        feed_cache.bump_post_feeds(author_id, {group_id})
+
+
+def responsive_image(post):
+    """Разметка вариантов из манифеста поста, без обращений к хранилищу.
+
+    Возвращает None, пока варианты не готовы.
+    """
+    manifest = post.image_manifest
+    if not manifest.get('img') or not manifest.get('webp'):
+        return None
+    width, height, src = manifest['img'][-1]
+    return {
+        'src': src,
+        'width': width,
+        'height': height,
+        'srcset': _srcset(manifest['img']),
+        'webp_srcset': _srcset(manifest['webp']),
+    }
+
+
+def _srcset(variants):
+    return ', '.join(f'{url} {width}w' for width, _, url in variants)
+
+
+def schedule(name):
+    """Ставит рендер вариантов изображения в очередь фоновых задач.
+
+    Задача создаётся в текущей транзакции и выполнится воркером
+    после коммита, даже если процесс, сохранивший пост, перезапустится.
+    """
+    if name:
+        enqueue(
+            generate_thumbnails, args=(name,), priority=THUMBNAIL_PRIORITY
+        )
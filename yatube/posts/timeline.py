@@ -0,0 +1,223 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginator import CursorPaginator, MergedCursorPaginator
+
+PULL_AUTHORS_KEY = 'timeline:pull_authors'
+PULL_AUTHORS_TIMEOUT = 60 * 5
+
+# Сколько лент обрезается одним запросом: держит число параметров
+# ниже лимита SQLite.
+TRIM_BATCH_SIZE = 500
+
+
+def timeline_length():
+    return settings.TIMELINE_LENGTH
+
+
+def pull_authors():
+    """Авторы с числом подписчиков выше TIMELINE_PULL_THRESHOLD.
+
+    Их посты не раскладываются по лентам, а подмешиваются при чтении.
+    Число подписчиков берётся из счётчика ``UserStats`` по индексу, а
+    не подсчётом всей таблицы подписок. Набор кэшируется; автор,
+    опустившийся ниже порога, вернётся в ленты своих подписчиков новыми
+    постами, а старые подтянет rebuild_timelines.
+    """
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(
+            UserStats.objects.filter(
+                followers_count__gt=settings.TIMELINE_PULL_THRESHOLD
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(PULL_AUTHORS_KEY, authors, PULL_AUTHORS_TIMEOUT)
+    return authors
+
+
+def _entries(user_id, posts):
+    return [
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, author_id, pub_date in posts
+    ]
+
+
+def _latest_posts(queryset):
+    return queryset.order_by('-pub_date', '-pk').values_list(
+        'pk', 'author_id', 'pub_date'
+    )[:timeline_length()]
+
+
+def trim_timelines(user_ids):
+    """Оставляет в лентах только последние TIMELINE_LENGTH постов.
+
+    Записи нумеруются внутри каждой ленты по её ключу (дата, пост)
+    оконной функцией за один проход по индексу лент, и удаляются те,
+    чей номер больше длины ленты. Работа растёт линейно с числом и
+    длиной лент, а не с квадратом длины, как у коррелированного
+    подзапроса на каждую строку.
+    """
+    table = connection.ops.quote_name(TimelineEntry._meta.db_table)
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), TRIM_BATCH_SIZE):
+        batch = user_ids[start:start + TRIM_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ('
+                'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+                'PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC'
+                f') AS position FROM {table} '
+                f'WHERE user_id IN ({placeholders})) ranked '
+                'WHERE position > %s)',
+                [*batch, timeline_length()],
+            )
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if post.author_id in pull_authors():
+        return
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    if not follower_ids:
+        return
+    TimelineEntry.objects.bulk_create(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in follower_ids
+    )
+    trim_timelines(follower_ids)
+
+
+def backfill_author(user_id, author_id):
+    """Добавляет в ленту последние посты нового автора из подписок."""
+    if author_id in pull_authors():
+        return
+    posts = _latest_posts(Post.objects.filter(author_id=author_id))
+    TimelineEntry.objects.bulk_create(
+        _entries(user_id, posts), ignore_conflicts=True
+    )
+    trim_timelines([user_id])
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+
+
+def rebuild_timeline(user_id):
+    """Пересобирает ленту пользователя по его подпискам."""
+    posts = _latest_posts(
+        Post.objects.filter(author__following__user_id=user_id).exclude(
+            author_id__in=pull_authors()
+        )
+    )
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        TimelineEntry.objects.bulk_create(_entries(user_id, posts))
+
+
+class TimelineSource(CursorPaginator):
+    """Материализованная лента: строки — записи, на странице — посты."""
+
+    def __init__(self, entries, per_page):
+        super().__init__(entries, per_page, key_field='post_id')
+
+    def item(self, entry):
+        return entry.post
+
+
+class CappedUnionSource(CursorPaginator):
+    """Посты нескольких авторов одним запросом.
+
+    Каждый автор даёт не больше ``limit`` строк своим диапазоном по
+    индексу (автор, дата) — ветка ``UNION ALL``; общий порядок наводится
+    только на отобранных строках, а не на всех постах этих авторов.
+    """
+
+    def __init__(self, object_list, author_ids, per_page):
+        super().__init__(object_list, per_page)
+        self.author_ids = author_ids
+
+    def fetch(self, limit, key=None, older=True, offset=0):
+        arms, params = [], []
+        for author_id in self.author_ids:
+            arm = self._ordered(descending=older).filter(author_id=author_id)
+            if key is not None:
+                arm = arm.filter(self._range(key, older))
+            sql, arm_params = arm.values('pk')[
+                :offset + limit
+            ].query.sql_with_params()
+            arms.append(f'SELECT * FROM ({sql})')
+            params.extend(arm_params)
+        # Через extra, а не pk__in=RawSQL(...): Django взял бы выборку в
+        # лишние скобки, и SQLite прочёл бы её как скалярный подзапрос.
+        union = ' UNION ALL '.join(arms)
+        posts = self._ordered(descending=older).extra(
+            where=[f'posts_post.id IN ({union})'], params=params,
+        )
+        return list(posts[offset:offset + limit])
+
+
+def _union_sources(author_ids, per_page):
+    """Посты всех популярных авторов одной выборкой."""
+    return [CappedUnionSource(Post.objects.for_feed(), author_ids, per_page)]
+
+
+def _per_author_sources(author_ids, per_page):
+    """Отдельная выборка на каждого популярного автора."""
+    return [
+        CursorPaginator(
+            Post.objects.for_feed().filter(author_id=author_id), per_page
+        )
+        for author_id in author_ids
+    ]
+
+
+MERGE_STRATEGIES = {
+    'union': _union_sources,
+    'per_author': _per_author_sources,
+}
+
+
+def follow_paginator(user, per_page):
+    """Лента подписок: своя лента плюс посты популярных авторов."""
+    timeline = TimelineSource(user.timeline.for_feed(), per_page)
+    authors = pull_authors()
+    if not authors:
+        return timeline
+    followed = list(
+        user.follower.filter(author_id__in=authors).values_list(
+            'author_id', flat=True
+        )
+    )
+    if not followed:
+        return timeline
+    try:
+        sources = MERGE_STRATEGIES[settings.TIMELINE_MERGE_STRATEGY]
+    except KeyError:
+        raise ImproperlyConfigured(
+            'TIMELINE_MERGE_STRATEGY должна быть одной из: '
+            f'{", ".join(MERGE_STRATEGIES)}'
+        )
+    return MergedCursorPaginator(
+        [timeline, *sources(followed, per_page)], per_page
+    )
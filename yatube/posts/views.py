@@ -1,19 +1,48 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from core.query_budget import query_budget
+
+from .counters import get_user_stats
+from .feed_cache import follow_feed_context, group_feed_context
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Group, Post, User
+from .paginator import CursorPaginator
+from .search import search_paginator
+from .timeline import follow_paginator
 
 NUM_OF_POSTS = 10
+NUM_OF_COMMENTS = 20
+
+
+def get_page_obj(request, post_list):
+    return paginate(request, CursorPaginator(post_list, NUM_OF_POSTS))
+
 
+def get_comments_page(request, post_id):
+    """Страница комментариев поста, от новых к старым, с авторами."""
+    comments = Comment.objects.for_detail().filter(post_id=post_id)
+    return paginate(request, CursorPaginator(
+        comments, NUM_OF_COMMENTS, date_field='created'
+    ))
+
+
+def paginate(request, paginator):
+    return paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
 
+
+@query_budget(3)
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.order_by('-pub_date')
-    paginator = Paginator(post_list, NUM_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = get_page_obj(request, post_list)
     title = 'Это главная страница проекта Yatube'
     context = {
         'page_obj': page_obj,
@@ -22,29 +51,30 @@ def index(request):
     return render(request, template, context)
 
 
+@query_budget(4)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, NUM_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    page_obj = get_page_obj(request, post_list)
     title = f'Записи сообщества { group.title }'
     context = {
         'title': title,
         'group': group,
         'page_obj': page_obj,
+        **group_feed_context(group, page_obj),
     }
     return render(request, template, context)
 
 
+@query_budget(5)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, NUM_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    post_count = post_list.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    post_list = author.posts.for_feed()
+    page_obj = get_page_obj(request, post_list)
+    stats = get_user_stats(author)
     following = (
         request.user.is_authenticated
         and request.user.follower.filter(author=author).exists()
@@ -52,17 +82,19 @@ def profile(request, username):
     context = {
         'author': author,
         'page_obj': page_obj,
-        'post_count': post_count,
+        'post_count': stats.posts_count,
+        'stats': stats,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(4)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_count = post.author.posts.count()
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
+    post_count = get_user_stats(post.author).posts_count
     form = CommentForm()
-    comments = post.comments.all()
+    comments = get_comments_page(request, post.pk)
     context = {
         'post': post,
         'post_count': post_count,
@@ -72,6 +104,39 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(1)
+def post_comments(request, post_id):
+    """Следующая страница комментариев HTML-фрагментом для подгрузки."""
+    comments = get_comments_page(request, post_id)
+    # Пост проверяется только для пустой страницы: у непустой он есть.
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404('Пост не найден')
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@query_budget(7)
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        page_obj = paginate(request, search_paginator(
+            form.cleaned_data['q'],
+            NUM_OF_POSTS,
+            group=form.cleaned_data['group'],
+            author=form.cleaned_data['author'],
+        ))
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(3)
 @login_required
 def post_create(request):
     form = PostForm(
@@ -81,7 +146,8 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
         return redirect('posts:profile', post.author.username)
     context = {
         'form': form,
@@ -122,18 +188,23 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
+        # Новый комментарий самый свежий, он на первой странице.
+        url = reverse('posts:post_detail', args=(post_id,))
+        return redirect(f'{url}#comment-{comment.pk}')
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(4)
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, NUM_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(
+        request, follow_paginator(request.user, NUM_OF_POSTS)
+    )
     context = {
         'page_obj': page_obj,
+        **follow_feed_context(request.user, page_obj),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -142,7 +213,8 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
@@ -151,5 +223,6 @@ def profile_unfollow(request, username):
     follow_author = get_object_or_404(User, username=username)
     data_follow = request.user.follower.filter(author=follow_author)
     if data_follow.exists():
-        data_follow.delete()
+        with transaction.atomic():
+            data_follow.delete()
     return redirect('posts:profile', username=username)
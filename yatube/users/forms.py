@@ -1,10 +1,42 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
+from django.core.mail import send_mail
+from django.template import loader
+
+from jobs.queue import enqueue
 
 User = get_user_model()
 
+EMAIL_PRIORITY = 20
+
 
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо для сброса пароля отправляется фоновой задачей.
+
+    Шаблоны рендерятся в запросе, а соединение с почтовым сервером
+    и повторы при его ошибках остаются воркеру.
+    """
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = loader.render_to_string(subject_template_name, context)
+        subject = ''.join(subject.splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_message = None
+        if html_email_template_name is not None:
+            html_message = loader.render_to_string(
+                html_email_template_name, context
+            )
+        enqueue(
+            send_mail,
+            args=(subject, body, from_email, [to_email]),
+            kwargs={'html_message': html_message},
+            priority=EMAIL_PRIORITY,
+        )
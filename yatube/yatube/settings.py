@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -19,17 +20,110 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
-CACHES = {
-    'default': {
+# 'locmem' — свой кэш в памяти каждого процесса; 'shared' — один файл
+# SQLite на всех воркеров хоста (core.cache_backends.SQLiteCache), с
+# вытеснением давно не читанных записей сверх MAX_BYTES.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'shared': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'yatube-cache.sqlite3'),
+        ),
+        'OPTIONS': {
+            'MAX_BYTES': 64 * 1024 * 1024,
+        },
+    },
 }
 
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
+# Сколько последних постов хранится в ленте подписок пользователя.
+TIMELINE_LENGTH = 1000
+
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении: 'per_author' — отдельной выборкой по индексу
+# на каждого такого автора, 'union' — одним запросом из тех же выборок,
+# склеенных через UNION ALL.
+TIMELINE_PULL_THRESHOLD = 10000
+TIMELINE_MERGE_STRATEGY = 'per_author'
+
+# Сколько секунд хранится отрисованная карточка поста в ленте.
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+# Сколько секунд хранится фрагмент ленты подписок или группы. Фрагменты
+# сбрасываются генерациями при изменениях, так что срок может быть долгим.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
+# Загруженные картинки постов больше IMAGE_MAX_PIXELS отклоняются,
+# остальные вписываются в IMAGE_MAX_SIDE по большей стороне и
+# пересохраняются без метаданных с качеством JPEG IMAGE_QUALITY.
+IMAGE_MAX_PIXELS = 50 * 10 ** 6
+IMAGE_MAX_SIDE = 2560
+IMAGE_QUALITY = 85
+
+# Миниатюры рендерит стандартный бэкенд sorl, но только в фоновых
+# задачах posts.thumbnails.generate_thumbnails; шаблоны берут варианты
+# из манифеста поста, а пока его нет, показывают исходное изображение.
+THUMBNAIL_BACKEND = 'sorl.thumbnail.base.ThumbnailBackend'
+
+# Очередь фоновых задач в базе данных, её разбирает manage.py runworker.
+# Без запущенного воркера письма сброса пароля и варианты картинок не
+# создаются, см. README. JOBS_EAGER=1 в окружении выполняет задачи сразу
+# после коммита в том же процессе, для разработки без воркера.
+# Задача, которую воркер не завершил за JOBS_VISIBILITY_TIMEOUT секунд,
+# снова становится доступной; повторы после ошибок идут с паузой
+# JOBS_RETRY_BACKOFF * 2 ** (попытка - 1), но не больше
+# JOBS_RETRY_BACKOFF_MAX. Выполненные задачи хранятся JOBS_KEEP_DONE.
+JOBS_EAGER = os.getenv('JOBS_EAGER', '') == '1'
+JOBS_WORKERS = 4
+JOBS_POLL_INTERVAL = 1
+JOBS_VISIBILITY_TIMEOUT = 60 * 5
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_BACKOFF_MAX = 60 * 60
+JOBS_KEEP_DONE = 60 * 60 * 24 * 7
+
+# Метрики запросов для /metrics/ (core.middleware.MetricsMiddleware).
+# Каждый процесс копит их в памяти и раз в METRICS_FLUSH_INTERVAL секунд
+# прибавляет к общему для воркеров хоста файлу METRICS_LOCATION.
+# Включаются переменной окружения METRICS_ENABLED=1.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '') == '1'
+METRICS_LOCATION = os.getenv(
+    'METRICS_LOCATION',
+    os.path.join(tempfile.gettempdir(), 'yatube-metrics.sqlite3'),
+)
+METRICS_FLUSH_INTERVAL = 10
+
+# Сводка SQL-запросов по отпечаткам (core.middleware.QueryStatsMiddleware)
+# для manage.py querystats и админки. Запросы дольше
+# QUERYSTATS_SLOW_THRESHOLD секунд сохраняются с планом и местом вызова,
+# хранятся последние QUERYSTATS_KEEP_SLOW из них. Включается переменной
+# окружения QUERYSTATS_ENABLED=1.
+QUERYSTATS_ENABLED = os.getenv('QUERYSTATS_ENABLED', '') == '1'
+QUERYSTATS_SLOW_THRESHOLD = 0.1
+QUERYSTATS_FLUSH_INTERVAL = 10
+QUERYSTATS_KEEP_SLOW = 1000
+
+# Персонал может снять профиль cProfile любого запроса, добавив к адресу
+# ?_profile=1 или заголовок X-Profile: 1 (core.middleware.ProfileMiddleware).
+# Профили смотрят в админке, хранятся последние PROFILE_KEEP.
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_KEEP = 200
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -53,16 +147,20 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'jobs.apps.JobsConfig',
     'debug_toolbar',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryStatsMiddleware',
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',